@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+多窗口代理编排模块
+在一个进程内同时驱动 N 个游戏窗口：每个窗口独立运行截图/编码阶段，
+推理/执行阶段由共享的有界工作线程池按公平顺序处理
+"""
+
+import os
+import time
+import logging
+import threading
+import traceback
+from typing import Optional, Dict, Any
+
+from config_manager import ConfigManager
+from game_window import GameWindow
+from ai_brain import AIBrain
+from template_matcher import TemplateMatcher
+from smart_agent import SmartAgent
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'agent_orchestrator.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('agent_orchestrator')
+
+
+class WindowState:
+    """单个窗口的状态机状态"""
+    IDLE = "idle"                    # 已添加，未启动
+    WAITING_FRAME = "waiting_frame"  # 截图阶段运行中，暂无待推理帧
+    QUEUED = "queued"                # 有待推理帧，等待空闲的推理线程
+    INFERRING = "inferring"          # 推理/执行中（每个窗口同时最多一帧在推理，保证历史与动作顺序）
+    ERROR = "error"                  # 上一次推理出错
+    STOPPED = "stopped"              # 已停止
+
+    TRANSITIONS = {
+        IDLE: {WAITING_FRAME, STOPPED},
+        WAITING_FRAME: {QUEUED, STOPPED},
+        QUEUED: {INFERRING, WAITING_FRAME, STOPPED},
+        INFERRING: {WAITING_FRAME, QUEUED, ERROR, STOPPED},
+        ERROR: {WAITING_FRAME, QUEUED, STOPPED},
+        STOPPED: {WAITING_FRAME},
+    }
+
+
+class _WindowQueue:
+    """为 UI 消息附加窗口名的队列包装"""
+
+    def __init__(self, ui_queue, window_name: str):
+        self.ui_queue = ui_queue
+        self.window_name = window_name
+
+    def put(self, message: Dict[str, Any]):
+        message = dict(message)
+        message["window"] = self.window_name
+        message["title"] = f"[{self.window_name}] {message.get('title', '')}"
+        self.ui_queue.put(message)
+
+
+class WindowEntry:
+    """
+    编排器中的单个窗口
+    """
+
+    def __init__(self, name: str, agent: SmartAgent):
+        self.name = name
+        self.agent = agent
+        self.state = WindowState.IDLE
+        self.capture_thread: Optional[threading.Thread] = None
+        self.last_served = 0.0
+        self.served_count = 0
+        self.action_count = 0
+        self.error_count = 0
+        self.consecutive_errors = 0
+        self.queue_wait_total = 0.0
+        self.started_at = 0.0
+
+    def set_state(self, state: str) -> bool:
+        """按状态机切换状态，非法切换会被拒绝并记录"""
+        if state == self.state:
+            return True
+        if state not in WindowState.TRANSITIONS.get(self.state, set()):
+            logger.warning(f"[{self.name}] 非法状态切换: {self.state} -> {state}")
+            return False
+        self.state = state
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        slot = self.agent.frame_slot
+        return {
+            "state": self.state,
+            "served": self.served_count,
+            "actions": self.action_count,
+            "actions_per_minute": self.action_count / elapsed * 60 if elapsed > 0 else 0.0,
+            "errors": self.error_count,
+            "dropped_replaced": slot.replaced_count,
+            "dropped_stale": slot.stale_count,
+            "average_queue_wait": self.queue_wait_total / self.served_count if self.served_count else 0.0,
+            "interval": self.agent.scheduler.current_interval,
+            "scheduler_state": self.agent.scheduler.state
+        }
+
+
+class AgentOrchestrator:
+    """
+    多窗口代理编排器
+
+    - 每个窗口一个 SmartAgent，只运行其截图/编码阶段（线程）
+    - 所有窗口共享一个模型客户端（连接池）、一个响应缓存和一份模板，短期记忆按窗口独立
+    - 推理/执行由 max_workers 个共享工作线程处理，同一窗口同时只有一帧在推理
+    - 公平调度：在有待推理帧的窗口中，优先服务最久未被服务的窗口
+    - 背压：每个窗口只保留最新一帧（LatestFrameSlot），截图线程在帧被取走前阻塞；
+      帧在池中的排队等待反馈给该窗口的调度器，端点变慢时自动拉长截图间隔；
+      排队过久的帧在推理前按帧龄丢弃
+    - 系统光标是全局资源，所有窗口的鼠标动作共用一把锁串行执行
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, ui_queue: Optional[Any] = None,
+                 max_consecutive_errors: int = 5):
+        """
+        Args:
+            max_workers: 推理工作线程数，None 时读取配置 agent.orchestrator.max_workers
+            ui_queue: 共享 UI 消息队列，消息会附带窗口名
+            max_consecutive_errors: 单窗口连续出错达到该次数后停止该窗口
+        """
+        self.config_manager = ConfigManager()
+        if max_workers is None:
+            max_workers = int(self.config_manager.get("agent.orchestrator.max_workers", 2))
+        self.max_workers = max(1, max_workers)
+        self.ui_queue = ui_queue
+        self.max_consecutive_errors = max_consecutive_errors
+
+        # 共享资源：各窗口的 AIBrain 通过 shared 使用同一个客户端与响应缓存（同一个缓存文件只有一个写入方）
+        self.ai_brain = AIBrain()
+        self.template_matcher = TemplateMatcher.from_config(self.config_manager)
+
+        self.windows: Dict[str, WindowEntry] = {}
+        self.running = False
+        self._cond = threading.Condition()
+        self._action_lock = threading.Lock()
+        self._workers = []
+        self._busy_workers = 0
+
+    def add_window(self, hwnd: Optional[int] = None, name: Optional[str] = None,
+                   game_window: Optional[GameWindow] = None) -> Optional[str]:
+        """
+        添加一个窗口
+
+        Args:
+            hwnd: 窗口句柄
+            name: 窗口名（用于日志和统计），默认使用窗口标题或句柄
+            game_window: 已初始化的 GameWindow（如回放帧源），提供时忽略 hwnd
+
+        Returns:
+            窗口名，初始化失败返回 None
+        """
+        if game_window is None:
+            game_window = GameWindow()
+            if not game_window.init_hwnd(hwnd):
+                logger.error(f"无法初始化窗口: {hwnd}")
+                return None
+
+        name = name or game_window.window_title or str(hwnd)
+        if name in self.windows:
+            name = f"{name}#{len(self.windows)}"
+
+        agent_queue = _WindowQueue(self.ui_queue, name) if self.ui_queue else None
+        agent = SmartAgent(ui_queue=agent_queue, game_window=game_window,
+                           ai_brain=AIBrain(shared=self.ai_brain), template_matcher=self.template_matcher)
+        agent.action_lock = self._action_lock
+
+        entry = WindowEntry(name, agent)
+        agent.frame_slot.on_put = lambda slot, entry=entry: self._on_frame_ready(entry)
+
+        with self._cond:
+            self.windows[name] = entry
+        if self.running:
+            self._start_window(entry)
+
+        logger.info(f"已添加窗口: {name}")
+        return name
+
+    def remove_window(self, name: str):
+        """停止并移除一个窗口"""
+        with self._cond:
+            entry = self.windows.pop(name, None)
+        if entry:
+            self._stop_window(entry)
+
+    def start(self):
+        """启动所有窗口与推理线程池"""
+        if self.running:
+            return
+        self.running = True
+        for entry in list(self.windows.values()):
+            self._start_window(entry)
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"inference-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"编排器已启动: {len(self.windows)} 个窗口, {self.max_workers} 个推理线程")
+
+    def stop(self):
+        """停止所有窗口与推理线程池"""
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        for entry in list(self.windows.values()):
+            self._stop_window(entry)
+        for worker in self._workers:
+            worker.join(timeout=2)
+        self._workers = []
+        logger.info("编排器已停止")
+
+    def _start_window(self, entry: WindowEntry):
+        agent = entry.agent
+        agent.running = True
+        agent.change_detector.reset()
+        agent.scheduler.reset()
+        entry.started_at = time.time()
+        entry.consecutive_errors = 0
+        with self._cond:
+            entry.set_state(WindowState.WAITING_FRAME)
+        entry.capture_thread = agent.start_capture()
+
+    def _stop_window(self, entry: WindowEntry):
+        agent = entry.agent
+        agent.running = False
+        agent.frame_slot.clear()
+        with self._cond:
+            entry.set_state(WindowState.STOPPED)
+        if entry.capture_thread is not None:
+            entry.capture_thread.join(timeout=2)
+            entry.capture_thread = None
+        agent.ai_brain.flush_cache()
+
+    def _on_frame_ready(self, entry: WindowEntry):
+        """截图阶段放入新帧（在截图线程中回调）"""
+        with self._cond:
+            if entry.state == WindowState.WAITING_FRAME or entry.state == WindowState.ERROR:
+                entry.set_state(WindowState.QUEUED)
+                self._cond.notify()
+
+    def _next_entry(self) -> Optional[WindowEntry]:
+        """公平选择下一个要服务的窗口：最久未被服务者优先"""
+        with self._cond:
+            while self.running:
+                candidates = [e for e in self.windows.values() if e.state == WindowState.QUEUED]
+                if candidates:
+                    entry = min(candidates, key=lambda e: e.last_served)
+                    entry.set_state(WindowState.INFERRING)
+                    self._busy_workers += 1
+                    return entry
+                self._cond.wait(0.5)
+            return None
+
+    def _worker_loop(self):
+        while self.running:
+            entry = self._next_entry()
+            if entry is None:
+                continue
+
+            next_state = WindowState.WAITING_FRAME
+            try:
+                packet = entry.agent.frame_slot.get(timeout=0)
+                if packet is not None:
+                    queue_wait = time.time() - packet.encoded_at
+                    entry.queue_wait_total += queue_wait
+                    entry.agent.scheduler.record_backlog(queue_wait)
+
+                    analysis = entry.agent.process_packet(packet)
+                    entry.served_count += 1
+                    if analysis and analysis.get("action_type") == "click":
+                        entry.action_count += 1
+                entry.consecutive_errors = 0
+            except Exception as e:
+                entry.error_count += 1
+                entry.consecutive_errors += 1
+                next_state = WindowState.ERROR
+                logger.error(f"[{entry.name}] 推理出错: {e}\n{traceback.format_exc()}")
+            finally:
+                with self._cond:
+                    self._busy_workers -= 1
+                    entry.last_served = time.time()
+                    if entry.consecutive_errors >= self.max_consecutive_errors:
+                        logger.error(f"[{entry.name}] 连续出错 {entry.consecutive_errors} 次，停止该窗口")
+                        entry.agent.running = False
+                        entry.set_state(WindowState.STOPPED)
+                    elif entry.state != WindowState.STOPPED:
+                        entry.set_state(next_state)
+                        # 推理期间截图阶段已准备好下一帧
+                        if entry.agent.frame_slot.has_packet():
+                            entry.set_state(WindowState.QUEUED)
+                    self._cond.notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取编排器与各窗口的统计信息"""
+        with self._cond:
+            windows = {name: entry.get_stats() for name, entry in self.windows.items()}
+            queued = sum(1 for e in self.windows.values() if e.state == WindowState.QUEUED)
+            busy = self._busy_workers
+        return {
+            "workers": self.max_workers,
+            "busy_workers": busy,
+            "queued_windows": queued,
+            "windows": windows
+        }
+
+
+if __name__ == "__main__":
+    print("多窗口代理编排模块")
+    print("使用示例:")
+    print("""
+    from agent_orchestrator import AgentOrchestrator
+
+    orchestrator = AgentOrchestrator(max_workers=3)
+    orchestrator.add_window(hwnd_a, name="account-a")
+    orchestrator.add_window(hwnd_b, name="account-b")
+    orchestrator.start()
+    ...
+    print(orchestrator.get_stats())
+    orchestrator.stop()
+    """)
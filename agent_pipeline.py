@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+代理流水线组件
+截图/编码阶段与推理/执行阶段之间通过容量为 1 的"最新帧槽"交接，
+推理第 N 帧时并行准备第 N+1 帧，过期帧显式丢弃
+"""
+
+import time
+import threading
+from typing import Optional, Callable
+
+import numpy as np
+
+
+class FramePacket:
+    """
+    在流水线阶段之间传递的一帧数据
+    """
+
+    __slots__ = ("seq", "frame", "image_base64", "captured_at", "encoded_at", "context")
+
+    def __init__(self, seq: int, frame: np.ndarray, image_base64: str, captured_at: float, context=None):
+        self.seq = seq
+        self.frame = frame
+        self.image_base64 = image_base64
+        self.captured_at = captured_at
+        self.encoded_at = time.time()
+        # FrameContext：随帧传递到推理阶段，OCR 兜底等复用同一帧
+        self.context = context
+
+    @property
+    def age(self) -> float:
+        """距截图时刻的秒数"""
+        return time.time() - self.captured_at
+
+
+class LatestFrameSlot:
+    """
+    容量为 1 的帧槽
+
+    生产者 put 时若上一帧尚未被取走，则直接替换（旧帧计入 replaced）；
+    消费者 get 取走后生产者才会被唤醒去准备下一帧，避免白白截图/编码
+    """
+
+    def __init__(self, on_put: Optional[Callable[["LatestFrameSlot"], None]] = None):
+        """
+        Args:
+            on_put: 新帧放入后的回调（在锁外调用），供外部调度器感知待处理帧
+        """
+        self._packet: Optional[FramePacket] = None
+        self._cond = threading.Condition()
+        self.on_put = on_put
+        self.put_count = 0
+        self.replaced_count = 0
+        self.stale_count = 0
+
+    def put(self, packet: FramePacket):
+        """放入新帧，替换尚未消费的旧帧"""
+        with self._cond:
+            if self._packet is not None:
+                self.replaced_count += 1
+            self._packet = packet
+            self.put_count += 1
+            self._cond.notify_all()
+        if self.on_put is not None:
+            self.on_put(self)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[FramePacket]:
+        """取走当前帧，超时返回 None"""
+        with self._cond:
+            if self._packet is None:
+                self._cond.wait(timeout)
+            packet = self._packet
+            self._packet = None
+            if packet is not None:
+                self._cond.notify_all()
+            return packet
+
+    def has_packet(self) -> bool:
+        """是否有待处理帧"""
+        with self._cond:
+            return self._packet is not None
+
+    def wait_consumed(self, timeout: Optional[float] = None) -> bool:
+        """生产者等待当前帧被取走，返回是否已被取走"""
+        with self._cond:
+            if self._packet is not None:
+                self._cond.wait(timeout)
+            return self._packet is None
+
+    def discard_before(self, timestamp: float) -> bool:
+        """丢弃截图时间早于 timestamp 的待处理帧，返回是否有帧被丢弃"""
+        with self._cond:
+            if self._packet is not None and self._packet.captured_at < timestamp:
+                self._packet = None
+                self.stale_count += 1
+                self._cond.notify_all()
+                return True
+            return False
+
+    def mark_stale(self):
+        """记录一次由消费者判定的过期丢弃"""
+        with self._cond:
+            self.stale_count += 1
+
+    def clear(self):
+        """清空帧槽并唤醒等待者"""
+        with self._cond:
+            self._packet = None
+            self._cond.notify_all()
@@ -1,210 +1,527 @@
+import io
+import re
+import json
 import base64
+import threading
 import traceback
-from typing import Dict, Any, Optional, List
+import numpy as np
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from config_manager import ConfigManager
+from response_cache import ResponseCache
+from stream_parser import StreamingActionParser
+from history_manager import HistoryManager
+from frame_encoder import image_mime_type
+from tracing import tracer
+from performance_monitor import performance_monitor
+
+DEFAULT_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3"
+
+# Seed 1.8 专用提示词
+SEED_SYSTEM_PROMPT = """
+            你是一个基于视觉的高级 GUI 智能体 (Agent)，可以直接操控游戏界面。
+            
+            # 任务
+            分析当前画面，判断当前游戏状态，并给出下一步操作建议。
+            
+            # 输出格式 (必须严格遵守 JSON)
+            {
+                "action": "click",  // 可选: click, wait, swipe, input
+                "target": [0.5, 0.5], // [x, y] 归一化坐标 (0.0-1.0)，左上角为[0,0]。如果不需要操作则为 null
+                "confidence": 0.95, // 置信度
+                "thought": "简短的思考过程，比如：检测到战斗结束，需要点击确认按钮。"
+            }
+            
+            # 注意事项
+            1. 优先寻找高亮的、可交互的 UI 元素。
+            2. 坐标必须精准，指向按钮的中心点。
+            3. 如果画面在加载中，action 返回 "wait"。
+            4. 字段按上面的顺序输出，先给出 action 和 target，最后再写 thought。
+            """
 
 class AIBrain:
-    def __init__(self):
+    def __init__(self, shared: Optional["AIBrain"] = None):
+        """
+        Args:
+            shared: 与之共享 HTTP 客户端和响应缓存的实例（多窗口时每个窗口一个 AIBrain，历史记录各自独立）
+        """
+        self._shared = shared
         self.config_manager = ConfigManager()
         self.api_key = self.config_manager.get("ai.api_key", "")
         self.model = self.config_manager.get("ai.model", "doubao-pro")
         self.temperature = self.config_manager.get("ai.temperature", 0.7)
         self.endpoint_id = self.config_manager.get("ai.endpoint_id", "")
+        self.base_url = self._configured_base_url()
+        # 上传图像的 MIME 类型，与帧编码器的输出格式一致
+        self.image_mime = image_mime_type(self.config_manager.get("vision.encoder.format", "jpeg"))
+        # 流式模式：action / target 解析完成即返回，其余内容在后台接收
+        self.streaming = self.config_manager.get("ai.streaming", False)
+        
+        # 复用同一个客户端（保留 HTTP 连接池与 TLS 会话），配置变化时重建；共享实例时使用对方的客户端
+        self._client = None
+        self._client_lock = threading.Lock()
+        # 各客户端正在进行的请求数；被替换时仍在使用的旧客户端等最后一个请求结束后再关闭
+        self._client_users: Dict[int, int] = {}
+        self._retired_clients: Dict[int, Any] = {}
         
         # 短期记忆：保存最近的历史记录
         self.history: List[Dict[str, Any]] = []
-        self.max_history = 3  # 最大保留轮数
+        self.max_history = int(self.config_manager.get("ai.history.max_turns", 3))  # 最大保留轮数
+        # 历史压缩：旧轮次降级为缩略图/文本摘要，并按 token 预算裁剪
+        self.history_manager = HistoryManager(
+            strategy=self.config_manager.get("ai.history.strategy", "full"),
+            token_budget=int(self.config_manager.get("ai.history.token_budget", 0)),
+            thumbnail_size=int(self.config_manager.get("ai.history.thumbnail_size", 320)),
+            thumbnail_quality=int(self.config_manager.get("ai.history.thumbnail_quality", 60)),
+            image_mime=self.image_mime
+        )
+        
+        # 感知哈希响应缓存：相似画面复用之前的动作结果（默认关闭，需在配置中开启）
+        self.response_cache = None
+        # 上一步的画面哈希：画面完全未变说明上次的动作没有生效，不能再重放缓存
+        self._last_frame_hash: Optional[int] = None
+        if shared is not None:
+            # 同一个缓存文件只能有一个写入方，否则各自写盘会互相覆盖
+            self.response_cache = shared.response_cache
+        elif self.config_manager.get("ai.cache.enabled", False):
+            self.response_cache = ResponseCache(
+                path=self.config_manager.get_user_data_path("ai_response_cache.json"),
+                max_entries=int(self.config_manager.get("ai.cache.max_entries", 512)),
+                ttl_seconds=float(self.config_manager.get("ai.cache.ttl_seconds", 86400)),
+                max_distance=int(self.config_manager.get("ai.cache.max_distance", 6)),
+                min_confidence=float(self.config_manager.get("ai.cache.min_confidence", 0.6))
+            )
+        
+        # 设置界面或手动编辑 config.json 后实时生效，无需重启代理
+        self.config_manager.subscribe(self._on_config_changed, "ai")
     
-    def _get_openai_client(self):
-        """获取OpenAI兼容客户端"""
+    def _configured_base_url(self) -> str:
+        """API 地址（子类可覆盖）"""
+        return self.config_manager.get("ai.base_url", DEFAULT_BASE_URL)
+    
+    def _create_client(self):
+        """创建OpenAI兼容客户端，失败返回 None"""
         try:
             from openai import OpenAI
-            client = OpenAI(
+            return OpenAI(
                 api_key=self.api_key,
-                base_url="https://ark.cn-beijing.volces.com/api/v3"
+                base_url=self.base_url
             )
-            return client
-        except Exception as e:
+        except Exception:
+            return None
+    
+    def _client_expired(self, client) -> bool:
+        """当前客户端是否已不能继续使用（子类按需覆盖）"""
+        return False
+    
+    def _close_client(self, client):
+        """关闭客户端，释放连接池"""
+        try:
+            client.close()
+        except Exception:
+            pass
+    
+    def _retire_client_locked(self):
+        """摘下当前客户端（调用方持有 _client_lock）
+        
+        Returns:
+            可以立即关闭的旧客户端；没有客户端或仍有请求在使用时返回 None（最后一个请求结束时关闭）
+        """
+        client, self._client = self._client, None
+        if client is None:
+            return None
+        if self._client_users.get(id(client)):
+            self._retired_clients[id(client)] = client
             return None
+        return client
     
-    def analyze(self, image_base64: str, system_prompt: str = "") -> Dict[str, Any]:
+    def _acquire_client(self):
+        """获取客户端并登记一次使用（首次调用时创建，之后复用），用完须调用 _release_client"""
+        if self._shared is not None:
+            return self._shared._acquire_client()
+        expired = None
+        with self._client_lock:
+            if self._client is not None and self._client_expired(self._client):
+                expired = self._retire_client_locked()
+            if self._client is None:
+                self._client = self._create_client()
+            client = self._client
+            if client is not None:
+                self._client_users[id(client)] = self._client_users.get(id(client), 0) + 1
+        if expired is not None:
+            self._close_client(expired)
+        return client
+    
+    def _release_client(self, client):
+        """结束一次使用；已被替换的旧客户端在最后一个请求结束后关闭"""
+        if self._shared is not None:
+            return self._shared._release_client(client)
+        with self._client_lock:
+            users = self._client_users.get(id(client), 0) - 1
+            if users > 0:
+                self._client_users[id(client)] = users
+                return
+            self._client_users.pop(id(client), None)
+            retired = self._retired_clients.pop(id(client), None)
+        if retired is not None:
+            self._close_client(retired)
+    
+    def _reset_client(self):
+        """配置变化后替换客户端：下次调用时重建，旧客户端空闲时立即关闭，否则等在途请求结束后关闭"""
+        with self._client_lock:
+            client = self._retire_client_locked()
+        if client is not None:
+            self._close_client(client)
+    
+    def _build_messages(self, image_base64: str, final_system_prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> List[Dict]:
+        """构建消息（包含按 token 预算压缩后的历史记录）"""
+        system_message = {"role": "system", "content": final_system_prompt}
+        current_message = {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "请分析当前游戏画面，识别关键元素，并提供操作建议。"},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{self.image_mime};base64,{image_base64}"
+                    }
+                }
+            ]
+        }
+        # 系统提示与当前画面必须发送，历史只能使用剩余预算
+        reserved_tokens = self.history_manager.estimate([system_message, current_message])[0]
+        return [
+            system_message,
+            # 添加历史记录
+            *self._format_history(history, reserved_tokens),
+            current_message
+        ]
+    
+    @staticmethod
+    def _build_raw_response(response, response_content: str) -> Dict[str, Any]:
+        """构建原始响应"""
+        return {
+            "model": response.model,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            },
+            "content": response_content
+        }
+    
+    @staticmethod
+    @tracer.traced("ai.parse")
+    def _parse_content(response_content: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """尝试从模型回复中解析动作 JSON
+        
+        Returns:
+            (解析结果, 错误信息)，解析失败时保留原始文本作为 thought
+        """
+        try:
+            # 使用正则表达式提取 JSON，容错处理
+            match = re.search(r'\{.*\}', response_content, re.DOTALL)
+            if match:
+                json_str = match.group()
+                parsed_data = json.loads(json_str)
+            else:
+                # 清理可能的 Markdown 标记
+                clean_content = response_content.replace("```json", "").replace("```", "").strip()
+                parsed_data = json.loads(clean_content)
+            return parsed_data, None
+        except json.JSONDecodeError:
+            # 如果模型没返回 JSON，保留原始文本作为 thought
+            return {
+                "thought": response_content,
+                "action": None,
+                "target": None,
+                "confidence": 0.0
+            }, "JSON解析失败"
+    
+    def _lookup_cache(self, image_base64: str, frame: Optional[np.ndarray], final_system_prompt: str,
+                      history: Optional[List[Dict[str, Any]]] = None, use_cache: bool = True,
+                      previous_hash: Optional[int] = None) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """查询响应缓存
+        
+        Args:
+            use_cache: False 时只计算哈希（结果仍会写入缓存），不查询
+            previous_hash: 上一步的画面哈希，与本帧相同时不查询
+        
+        Returns:
+            (画面哈希, 命中时的返回结果)，未启用缓存或哈希失败时哈希为 None
+        """
+        if self.response_cache is None:
+            return None, None
+        frame_hash = self._frame_hash(image_base64, frame)
+        if frame_hash is None:
+            return None, None
+        if not use_cache or frame_hash == previous_hash:
+            # 强制重新分析（画面静止超时）或画面与上一步相同：重放缓存只会重复没有生效的动作
+            return frame_hash, None
+        cached = self.response_cache.get(frame_hash, final_system_prompt)
+        if cached is None:
+            performance_monitor.increment("llm_cache_misses")
+            return frame_hash, None
+        performance_monitor.increment("llm_cache_hits")
+        self._add_to_history(image_base64, cached["content"], history)
+        return frame_hash, {
+            "success": True,
+            "data": dict(cached["data"]),
+            "raw_response": {
+                "model": cached["model"],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                "content": cached["content"]
+            },
+            "error": None,
+            "cached": True
+        }
+    
+    def _finish_analysis(self, image_base64: str, frame_hash: Optional[int], final_system_prompt: str,
+                         response, response_content: str, history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """记录历史、解析回复并写入缓存，构建返回结果"""
+        # 保存到历史记录
+        self._add_to_history(image_base64, response_content, history)
+        
+        raw_response = self._build_raw_response(response, response_content)
+        return self._complete_result(frame_hash, final_system_prompt, raw_response)
+    
+    @staticmethod
+    def _record_usage(raw_response: Dict[str, Any]):
+        """把一次成功的模型调用及其 token 用量计入性能监控"""
+        performance_monitor.increment("llm_calls", status="success")
+        usage = raw_response.get("usage") or {}
+        for token_type in ("prompt", "completion"):
+            tokens = usage.get(f"{token_type}_tokens") or 0
+            if tokens:
+                performance_monitor.increment("llm_tokens", tokens, type=token_type)
+    
+    @staticmethod
+    def _record_prompt_stats(prompt_stats: Dict[str, int]):
+        """把一次实际发出的请求的估算 prompt token 数与上传字节数计入性能监控"""
+        performance_monitor.increment("llm_requests")
+        performance_monitor.increment("llm_estimated_prompt_tokens", prompt_stats["estimated_prompt_tokens"])
+        performance_monitor.increment("llm_upload_bytes", prompt_stats["prompt_bytes"])
+    
+    def _complete_result(self, frame_hash: Optional[int], final_system_prompt: str, raw_response: Dict[str, Any]) -> Dict[str, Any]:
+        """解析完整回复并写入缓存，构建返回结果"""
+        self._record_usage(raw_response)
+        response_content = raw_response["content"]
+        parsed_data, error = self._parse_content(response_content)
+        
+        # 写入响应缓存（置信度过低的结果由缓存自行忽略）
+        if error is None and frame_hash is not None and isinstance(parsed_data, dict):
+            self.response_cache.put(frame_hash, final_system_prompt, parsed_data, response_content, raw_response["model"])
+        
+        return {
+            "success": True,
+            "data": parsed_data,
+            "raw_response": raw_response,
+            "error": error
+        }
+    
+    @staticmethod
+    def _error_result(error: str) -> Dict[str, Any]:
+        """构建失败结果（包含traceback）"""
+        performance_monitor.increment("llm_calls", status="error")
+        return {
+            "success": False,
+            "data": None,
+            "raw_response": None,
+            "error": error,
+            "traceback": traceback.format_exc()
+        }
+    
+    @tracer.traced("ai.analyze")
+    def analyze(self, image_base64: str, system_prompt: str = "", frame: Optional[np.ndarray] = None,
+                stream: Optional[bool] = None, on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+                use_cache: bool = True) -> Dict[str, Any]:
         """分析图像和提示，返回AI分析结果
         
         Args:
             image_base64: Base64编码的图像数据
             system_prompt: 系统提示
-            
+            frame: 原始图像数组（可选），用于计算缓存哈希，不传则从 image_base64 解码
+            stream: 是否使用流式模式，None 时读取配置 ai.streaming
+            on_complete: 流式模式下提前返回后，完整回复接收完毕时的回调（在后台线程中调用）
+            use_cache: False 时跳过缓存查询，必定调用模型（如画面静止超时后的强制重新分析）
+        
         Returns:
-            包含分析结果的字典，包括raw_response字段
+            包含分析结果的字典，包括raw_response字段；命中缓存时 cached 为 True；
+            流式模式提前返回时 partial 为 True，data 中的 thought 可能不完整；
+            实际发出请求时 prompt_stats 给出估算的 token 数与上传字节数
         """
         try:
-            client = self._get_openai_client()
-            if not client:
-                return {
-                    "success": False,
-                    "data": None,
-                    "raw_response": None,
-                    "error": "无法初始化AI客户端",
-                    "traceback": traceback.format_exc()
-                }
-            
-            # Seed 1.8 专用提示词
-            seed_system_prompt = """
-            你是一个基于视觉的高级 GUI 智能体 (Agent)，可以直接操控游戏界面。
-            
-            # 任务
-            分析当前画面，判断当前游戏状态，并给出下一步操作建议。
-            
-            # 输出格式 (必须严格遵守 JSON)
-            {
-                "thought": "简短的思考过程，比如：检测到战斗结束，需要点击确认按钮。",
-                "action": "click",  // 可选: click, wait, swipe, input
-                "target": [0.5, 0.5], // [x, y] 归一化坐标 (0.0-1.0)，左上角为[0,0]。如果不需要操作则为 null
-                "confidence": 0.95 // 置信度
-            }
-            
-            # 注意事项
-            1. 优先寻找高亮的、可交互的 UI 元素。
-            2. 坐标必须精准，指向按钮的中心点。
-            3. 如果画面在加载中，action 返回 "wait"。
-            """
-            
             # 构建系统提示
-            default_system_prompt = seed_system_prompt
-            final_system_prompt = system_prompt or default_system_prompt
+            final_system_prompt = system_prompt or SEED_SYSTEM_PROMPT
             
-            # 构建消息（包含历史记录）
-            messages = [
-                {"role": "system", "content": final_system_prompt},
-                # 添加历史记录
-                *self._format_history(),
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "请分析当前游戏画面，识别关键元素，并提供操作建议。"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ]
+            # 查询响应缓存
+            frame_hash, cached_result = self._lookup_cache(image_base64, frame, final_system_prompt,
+                                                           use_cache=use_cache, previous_hash=self._last_frame_hash)
+            self._last_frame_hash = frame_hash
+            if cached_result is not None:
+                return cached_result
             
-            # 调用AI API
-            response = client.chat.completions.create(
-                model=self.endpoint_id or "ep-20260121003412-mhhgl",
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=2000
-            )
+            client = self._acquire_client()
+            if not client:
+                return self._error_result("无法初始化AI客户端")
             
-            # 获取响应内容
-            response_content = response.choices[0].message.content
+            # 流式模式提前返回时，由后台接收线程在读完后释放客户端
+            handed_off = False
+            try:
+                messages = self._build_messages(image_base64, final_system_prompt)
+                # 请求体估算指标：token 数与上传字节数
+                prompt_stats = self.history_manager.get_stats(messages)
+                self._record_prompt_stats(prompt_stats)
             
-            # 保存到历史记录
-            self._add_to_history(image_base64, response_content)
+                use_stream = self.streaming if stream is None else stream
+                if use_stream:
+                    result = self._analyze_stream(client, messages, image_base64, frame_hash, final_system_prompt, on_complete)
+                    handed_off = result.get("partial", False)
+                    result["prompt_stats"] = prompt_stats
+                    return result
             
-            # 构建原始响应
-            raw_response = {
-                "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                "content": response_content
-            }
+                # 调用AI API
+                with tracer.span("ai.request", estimated_prompt_tokens=prompt_stats["estimated_prompt_tokens"]):
+                    response = client.chat.completions.create(
+                        model=self.endpoint_id or "ep-20260121003412-mhhgl",
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=2000
+                    )
             
-            # 尝试解析 JSON
-            import json
-            import re
-            try:
-                # 使用正则表达式提取 JSON，容错处理
-                match = re.search(r'\{.*\}', response_content, re.DOTALL)
-                if match:
-                    json_str = match.group()
-                    parsed_data = json.loads(json_str)
-                else:
-                    # 清理可能的 Markdown 标记
-                    clean_content = response_content.replace("```json", "").replace("```", "").strip()
-                    parsed_data = json.loads(clean_content)
-                
-                # 构建返回结果
-                result = {
-                    "success": True,
-                    "data": parsed_data,
-                    "raw_response": raw_response,
-                    "error": None
-                }
-            except json.JSONDecodeError:
-                # 如果模型没返回 JSON，保留原始文本作为 thought
-                result = {
-                    "success": True,
-                    "data": {
-                        "thought": response_content,
-                        "action": None,
-                        "target": None,
-                        "confidence": 0.0
-                    },
-                    "raw_response": raw_response,
-                    "error": "JSON解析失败"
-                }
+                # 获取响应内容
+                response_content = response.choices[0].message.content
             
-            return result
+                result = self._finish_analysis(image_base64, frame_hash, final_system_prompt, response, response_content)
+                result["prompt_stats"] = prompt_stats
+                return result
+            finally:
+                if not handed_off:
+                    self._release_client(client)
         except Exception as e:
             # 捕获异常并包含traceback
-            error_traceback = traceback.format_exc()
-            return {
-                "success": False,
-                "data": None,
-                "raw_response": None,
-                "error": str(e),
-                "traceback": error_traceback
+            return self._error_result(str(e))
+    
+    @staticmethod
+    def _can_act_early(fields: Dict[str, Any]) -> bool:
+        """已解析的字段是否足以行动；没有坐标的非 wait 动作需要完整 thought 做 OCR 兜底"""
+        return fields.get("action") == "wait" or fields.get("target") is not None
+    
+    @staticmethod
+    def _consume_chunk(chunk, parser: StreamingActionParser, state: Dict[str, Any]):
+        """处理一个流式分块：累积文本、记录模型名与用量"""
+        if getattr(chunk, "model", None):
+            state["model"] = chunk.model
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            state["usage"] = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
             }
+        if chunk.choices:
+            parser.feed(chunk.choices[0].delta.content or "")
+    
+    @staticmethod
+    def _stream_raw_response(parser: StreamingActionParser, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": state["model"],
+            "usage": state["usage"] or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            "content": parser.text
+        }
+    
+    def _analyze_stream(self, client, messages: List[Dict], image_base64: str, frame_hash: Optional[int],
+                        final_system_prompt: str, on_complete: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """流式调用：action / target 完整后立即返回，剩余内容交给后台线程接收"""
+        model = self.endpoint_id or "ep-20260121003412-mhhgl"
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=2000,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parser = StreamingActionParser()
+        state = {"model": model, "usage": None}
+        chunks = iter(stream)
+        
+        for chunk in chunks:
+            self._consume_chunk(chunk, parser, state)
+            if parser.ready and self._can_act_early(parser.fields):
+                break
+        else:
+            # 未能提前行动：按完整回复处理
+            self._add_to_history(image_base64, parser.text)
+            return self._complete_result(frame_hash, final_system_prompt, self._stream_raw_response(parser, state))
+        
+        # 先用已解析字段占位历史，后台接收完毕后替换为完整回复，保证下一轮请求的历史顺序
+        history_item = self._add_to_history(image_base64, json.dumps(parser.fields, ensure_ascii=False))
+        threading.Thread(
+            target=self._drain_stream,
+            args=(client, chunks, parser, state, history_item, frame_hash, final_system_prompt, on_complete),
+            daemon=True
+        ).start()
+        
+        data = dict(parser.fields)
+        data.setdefault("thought", "")
+        data.setdefault("confidence", 0.0)
+        return {
+            "success": True,
+            "data": data,
+            "raw_response": self._stream_raw_response(parser, state),
+            "error": None,
+            "partial": True
+        }
+    
+    def _drain_stream(self, client, chunks, parser: StreamingActionParser, state: Dict[str, Any], history_item: Dict[str, Any],
+                      frame_hash: Optional[int], final_system_prompt: str,
+                      on_complete: Optional[Callable[[Dict[str, Any]], None]]):
+        """后台接收流式回复的剩余部分，结束后释放客户端"""
+        try:
+            for chunk in chunks:
+                self._consume_chunk(chunk, parser, state)
+            history_item["ai_response"] = parser.text
+            result = self._complete_result(frame_hash, final_system_prompt, self._stream_raw_response(parser, state))
+        except Exception as e:
+            result = self._error_result(str(e))
+        finally:
+            self._release_client(client)
+        if on_complete:
+            try:
+                on_complete(result)
+            except Exception:
+                pass
+    
+    def _build_advice_messages(self, context: str) -> List[Dict]:
+        """构建建议请求的消息"""
+        return [
+            {"role": "system", "content": "你是一个游戏辅助AI，根据上下文提供详细的操作建议。"},
+            {"role": "user", "content": context}
+        ]
     
     def get_advice(self, context: str) -> Dict[str, Any]:
         """获取AI建议"""
         try:
-            client = self._get_openai_client()
+            client = self._acquire_client()
             if not client:
-                return {
-                    "success": False,
-                    "data": None,
-                    "raw_response": None,
-                    "error": "无法初始化AI客户端",
-                    "traceback": traceback.format_exc()
-                }
-            
-            # 构建消息
-            messages = [
-                {"role": "system", "content": "你是一个游戏辅助AI，根据上下文提供详细的操作建议。"},
-                {"role": "user", "content": context}
-            ]
+                return self._error_result("无法初始化AI客户端")
             
             # 调用AI API
-            response = client.chat.completions.create(
-                model=self.endpoint_id or "ep-20240125173242-2m2qh",
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=1000
-            )
+            try:
+                response = client.chat.completions.create(
+                    model=self.endpoint_id or "ep-20240125173242-2m2qh",
+                    messages=self._build_advice_messages(context),
+                    temperature=self.temperature,
+                    max_tokens=1000
+                )
+            finally:
+                self._release_client(client)
             
             # 获取响应内容
             response_content = response.choices[0].message.content
             
-            # 构建原始响应
-            raw_response = {
-                "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                "content": response_content
-            }
-            
+            raw_response = self._build_raw_response(response, response_content)
+            self._record_usage(raw_response)
             return {
                 "success": True,
                 "data": {
@@ -214,62 +531,79 @@ class AIBrain:
                 "error": None
             }
         except Exception as e:
-            error_traceback = traceback.format_exc()
-            return {
-                "success": False,
-                "data": None,
-                "raw_response": None,
-                "error": str(e),
-                "traceback": error_traceback
-            }
+            return self._error_result(str(e))
+    
+    def _frame_hash(self, image_base64: str, frame: Optional[np.ndarray]) -> Optional[int]:
+        """计算缓存用的画面哈希，失败时返回 None（跳过缓存）"""
+        try:
+            if frame is None:
+                from PIL import Image
+                with Image.open(io.BytesIO(base64.b64decode(image_base64))) as img:
+                    frame = np.array(img.convert("RGB"))
+            return self.response_cache.frame_hash(frame)
+        except Exception:
+            return None
+    
+    def flush_cache(self):
+        """把响应缓存写盘"""
+        if self.response_cache is not None:
+            self.response_cache.save()
     
     def update_config(self):
         """更新配置"""
+        client_settings = (self.api_key, self.base_url)
         self.api_key = self.config_manager.get("ai.api_key", "")
         self.model = self.config_manager.get("ai.model", "doubao-pro")
         self.temperature = self.config_manager.get("ai.temperature", 0.7)
         self.endpoint_id = self.config_manager.get("ai.endpoint_id", "")
+        self.base_url = self._configured_base_url()
+        self.streaming = self.config_manager.get("ai.streaming", False)
+        self.max_history = int(self.config_manager.get("ai.history.max_turns", 3))
+        self.history_manager.strategy = self.config_manager.get("ai.history.strategy", "full")
+        self.history_manager.token_budget = int(self.config_manager.get("ai.history.token_budget", 0))
+        # API Key 或地址变化时替换客户端（旧客户端在在途请求结束后关闭）；共享客户端由其所有者负责
+        if self._shared is None and (self.api_key, self.base_url) != client_settings:
+            self._reset_client()
+    
+    def _on_config_changed(self, keys: List[str]):
+        """配置变更回调（ai.*）"""
+        self.update_config()
     
-    def _format_history(self) -> List[Dict]:
+    def _format_history(self, history: Optional[List[Dict[str, Any]]] = None, reserved_tokens: int = 0) -> List[Dict]:
         """将历史记录格式化为消息列表
         
+        Args:
+            history: 历史记录列表，默认使用 self.history
+            reserved_tokens: 历史之外的消息已占用的 token 数
+        
         Returns:
-            格式化的历史消息列表
+            格式化的历史消息列表（按策略与 token 预算压缩）
         """
-        formatted = []
-        for item in self.history:
-            # 用户消息（包含图片）
-            user_content = [
-                {"type": "text", "text": "[历史] 请分析游戏画面。"},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{item['image_base64']}"
-                    }
-                }
-            ]
-            formatted.append({"role": "user", "content": user_content})
-            
-            # AI 回复
-            formatted.append({"role": "assistant", "content": item['ai_response']})
-        
-        return formatted
+        return self.history_manager.format(self.history if history is None else history, reserved_tokens)
     
-    def _add_to_history(self, image_base64: str, ai_response: str):
+    def _add_to_history(self, image_base64: str, ai_response: str, history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """添加记录到历史，保持最大长度
         
         Args:
             image_base64: 用户输入的图片 base64
             ai_response: AI 的回复内容
+            history: 历史记录列表，默认使用 self.history
+        
+        Returns:
+            新添加的历史记录项
         """
-        self.history.append({
+        history = self.history if history is None else history
+        item = {
             "image_base64": image_base64,
             "ai_response": ai_response
-        })
+        }
+        history.append(item)
         
         # 保持历史记录在限制范围内
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        if len(history) > self.max_history:
+            history.pop(0)
+        
+        return item
     
     def clear_history(self):
         """清空历史记录"""
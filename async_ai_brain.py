@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+异步 AI 大脑模块
+基于 AsyncOpenAI 的 AIBrain 变体：整个实例只持有一个带连接池的客户端，
+通过信号量限制并发请求数，支持单请求超时与取消
+"""
+
+import asyncio
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+from ai_brain import AIBrain, SEED_SYSTEM_PROMPT
+
+
+class AsyncAIBrain(AIBrain):
+    """
+    异步 AI 大脑
+
+    - 复用 AIBrain 的配置、提示词、解析、历史与响应缓存逻辑
+    - 一个 AsyncOpenAI 客户端，所有请求共享 HTTP 连接池与 TLS 会话
+    - max_concurrency 限制同时在途的请求数
+    - history_key 区分不同窗口的短期记忆，多个窗口可共用一个实例
+    - base_url 可指向本地 OpenAI 兼容的模拟服务（见 tools/mock_openai_server.py）
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, request_timeout: Optional[float] = None,
+                 base_url: Optional[str] = None):
+        """
+        Args:
+            max_concurrency: 最大并发请求数，None 时读取配置 ai.max_concurrency
+            request_timeout: 单请求超时（秒），None 时读取配置 ai.request_timeout
+            base_url: 覆盖配置中的 API 地址
+        """
+        self._base_url_override = base_url
+        # 异步客户端的连接池与信号量都绑定创建时的事件循环
+        self._client_loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        super().__init__()
+        if max_concurrency is None:
+            max_concurrency = int(self.config_manager.get("ai.max_concurrency", 4))
+        if request_timeout is None:
+            request_timeout = float(self.config_manager.get("ai.request_timeout", 30.0))
+        self.max_concurrency = max(1, max_concurrency)
+        self.request_timeout = request_timeout
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._histories: Dict[str, List[Dict[str, Any]]] = {}
+        self._last_frame_hashes: Dict[str, Optional[int]] = {}
+        self.in_flight = 0
+
+    def _configured_base_url(self) -> str:
+        """构造时指定的 base_url 优先，配置重新加载后保持不变"""
+        return self._base_url_override or super()._configured_base_url()
+
+    def _create_client(self):
+        """创建异步客户端（在事件循环内调用），失败返回 None"""
+        try:
+            from openai import AsyncOpenAI
+            # 超时与重试由本类控制，客户端不再自动重试
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0
+            )
+        except Exception:
+            return None
+        self._client_loops[id(client)] = asyncio.get_running_loop()
+        return client
+
+    def _client_expired(self, client) -> bool:
+        """客户端的连接池属于其他（可能已结束的）事件循环时不能再使用"""
+        return self._client_loops.get(id(client)) is not asyncio.get_running_loop()
+
+    def _close_client(self, client):
+        """在客户端所属的事件循环上关闭它；该循环已结束时连接随循环一起释放"""
+        loop = self._client_loops.pop(id(client), None)
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(client.close())
+        else:
+            # 配置监视线程中触发的重建
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，在新的事件循环（如再次 asyncio.run）中使用时重建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _get_history(self, history_key: str) -> List[Dict[str, Any]]:
+        return self._histories.setdefault(history_key, [])
+
+    async def _create_completion(self, timeout: Optional[float], **kwargs):
+        """在并发限制与超时控制下调用接口"""
+        async with self._get_semaphore():
+            client = self._acquire_client()
+            if not client:
+                raise RuntimeError("无法初始化AI客户端")
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(
+                    client.chat.completions.create(**kwargs),
+                    timeout=timeout if timeout is not None else self.request_timeout
+                )
+            finally:
+                self.in_flight -= 1
+                self._release_client(client)
+
+    async def analyze(self, image_base64: str, system_prompt: str = "", frame: Optional[np.ndarray] = None,
+                      history_key: str = "default", timeout: Optional[float] = None,
+                      use_cache: bool = True) -> Dict[str, Any]:
+        """异步分析图像，返回结构与 AIBrain.analyze 相同
+
+        Args:
+            image_base64: Base64编码的图像数据
+            system_prompt: 系统提示
+            frame: 原始图像数组（可选），用于计算缓存哈希
+            history_key: 短期记忆的分组键（如窗口名）
+            timeout: 本次请求超时（秒），None 使用 request_timeout
+            use_cache: False 时跳过缓存查询，必定调用模型
+
+        Returns:
+            包含分析结果的字典；超时返回 success=False。任务被取消时抛出 CancelledError
+        """
+        history = self._get_history(history_key)
+        try:
+            final_system_prompt = system_prompt or SEED_SYSTEM_PROMPT
+
+            # 哈希计算、缓存查询与写盘都是同步操作，放到线程中执行，不阻塞其他并发请求
+            frame_hash, cached_result = await asyncio.to_thread(
+                self._lookup_cache, image_base64, frame, final_system_prompt, history, use_cache,
+                self._last_frame_hashes.get(history_key))
+            self._last_frame_hashes[history_key] = frame_hash
+            if cached_result is not None:
+                return cached_result
+
+            messages = self._build_messages(image_base64, final_system_prompt, history)
+            prompt_stats = self.history_manager.get_stats(messages)
+            self._record_prompt_stats(prompt_stats)
+            response = await self._create_completion(
+                timeout,
+                model=self.endpoint_id or "ep-20260121003412-mhhgl",
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=2000
+            )
+            response_content = response.choices[0].message.content
+
+            result = await asyncio.to_thread(self._finish_analysis, image_base64, frame_hash, final_system_prompt,
+                                             response, response_content, history)
+            result["prompt_stats"] = prompt_stats
+            return result
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            return self._error_result(f"请求超时 ({timeout if timeout is not None else self.request_timeout}秒)")
+        except Exception as e:
+            return self._error_result(str(e))
+
+    async def get_advice(self, context: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """异步获取AI建议"""
+        try:
+            response = await self._create_completion(
+                timeout,
+                model=self.endpoint_id or "ep-20240125173242-2m2qh",
+                messages=self._build_advice_messages(context),
+                temperature=self.temperature,
+                max_tokens=1000
+            )
+            response_content = response.choices[0].message.content
+            raw_response = self._build_raw_response(response, response_content)
+            self._record_usage(raw_response)
+            return {
+                "success": True,
+                "data": {
+                    "advice": response_content
+                },
+                "raw_response": raw_response,
+                "error": None
+            }
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            return self._error_result(f"请求超时 ({timeout if timeout is not None else self.request_timeout}秒)")
+        except Exception as e:
+            return self._error_result(str(e))
+
+    async def analyze_many(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """并发分析多帧，结果按输入顺序返回
+
+        Args:
+            requests: 每项为 analyze 的关键字参数字典（至少包含 image_base64）
+        """
+        return await asyncio.gather(*(self.analyze(**req) for req in requests))
+
+    def clear_history(self, history_key: Optional[str] = None):
+        """清空历史记录，history_key 为 None 时清空全部"""
+        if history_key is None:
+            self._histories = {}
+            self.history = []
+        else:
+            self._histories.pop(history_key, None)
+
+    def get_history_count(self, history_key: str = "default") -> int:
+        """获取指定分组的历史记录数量"""
+        return len(self._histories.get(history_key, []))
+
+    async def aclose(self):
+        """关闭客户端，释放连接池（仍有请求在途时在其结束后关闭）"""
+        with self._client_lock:
+            client = self._retire_client_locked()
+        if client is not None:
+            self._client_loops.pop(id(client), None)
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+        await asyncio.to_thread(self.flush_cache)
+        return False
@@ -1,7 +1,199 @@
 # -*- coding: utf-8 -*-
 import json
 import os
+import copy
+import time
+import types
 import logging
+import weakref
+import tempfile
+import threading
+
+_MISSING = object()
+
+
+def _flatten(data, prefix="", out=None):
+    """把嵌套字典展开为 {"a.b.c": 值}（列表视为叶子）"""
+    out = {} if out is None else out
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            _flatten(value, path, out)
+        else:
+            out[path] = value
+    return out
+
+
+def _changed_keys(old, new):
+    """两份配置之间值发生变化（含新增、删除）的键路径"""
+    old_flat, new_flat = _flatten(old or {}), _flatten(new or {})
+    return sorted(k for k in set(old_flat) | set(new_flat) if old_flat.get(k, _MISSING) != new_flat.get(k, _MISSING))
+
+
+class _ConfigStore:
+    """
+    进程内共享的配置存储（每个配置文件一份）
+    - 配置常驻内存，按 check_interval 节流检查文件 mtime / 大小，变化时才重新解析
+    - get 的结果（含环境变量覆盖）按键缓存，重新加载时清空
+    - 订阅者在配置变化时收到变化的键列表；有订阅者时后台线程轮询文件，外部编辑也能实时生效
+    - 回调总是在配置监视线程中调用：无论变化是由哪个线程的 get / save 发现的，都先排队再由监视线程派发
+    """
+    def __init__(self, path, defaults, check_interval=1.0):
+        self.path = path
+        self.defaults = defaults
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.RLock()
+        self._data = None
+        self._stamp = None
+        self._bad_stamp = None
+        self._checked_at = 0.0
+        self._values = {}
+        self._subscribers = []  # [(前缀, 回调或弱引用)]
+        self._watcher = None
+        self._pending_changes = set()
+        self._wake = threading.Event()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _read(self):
+        """解析配置文件；文件不存在时返回默认配置，读取或解析失败时返回 None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return copy.deepcopy(self.defaults)
+        except Exception as e:
+            logging.warning(f"读取配置文件失败，沿用上次加载的配置: {e}")
+            return None
+
+    def refresh(self, force=False):
+        """文件变化时重新加载；返回是否重新加载了"""
+        now = time.monotonic()
+        if not force and self._data is not None and now - self._checked_at < self.check_interval:
+            return False
+        stamp = self._stat()
+        with self._lock:
+            self._checked_at = now
+            if not force and self._data is not None and stamp in (self._stamp, self._bad_stamp):
+                return False
+            data = self._read()
+            if data is None:
+                # 文件写到一半或内容损坏：保留上次成功加载的配置，_stamp 不变，文件再次变化时重试
+                self._bad_stamp = stamp
+                if self._data is not None:
+                    return False
+                data = copy.deepcopy(self.defaults)
+            old, self._data = self._data, data
+            self._stamp = stamp
+            self._values.clear()
+            self.reloads += 1
+            new = self._data
+        if old is not None:
+            self._notify(_changed_keys(old, new))
+        return True
+
+    def get(self, key_path, default=None):
+        self.refresh()
+        value = self._values.get(key_path, _MISSING)
+        if value is _MISSING and key_path not in self._values:
+            with self._lock:
+                # 环境变量覆盖配置文件，如 ai.api_key -> AI_API_KEY
+                value = os.environ.get(key_path.upper().replace('.', '_'), _MISSING)
+                if value is _MISSING:
+                    value = self._data
+                    try:
+                        for k in key_path.split("."):
+                            value = value[k]
+                    except (KeyError, TypeError):
+                        value = _MISSING
+                self._values[key_path] = value
+        return default if value is _MISSING else value
+
+    def snapshot(self):
+        """当前配置的深拷贝"""
+        self.refresh()
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def replace(self, config_data):
+        """配置已写入文件后更新内存中的副本并通知订阅者"""
+        with self._lock:
+            old, self._data = self._data, copy.deepcopy(config_data)
+            self._stamp = self._stat()
+            self._checked_at = time.monotonic()
+            self._values.clear()
+            new = self._data
+        self._notify(_changed_keys(old, new))
+
+    def subscribe(self, callback, prefix=""):
+        # 绑定方法只保存弱引用，订阅者对象被回收后自动退订（内置类型的方法如 list.append 不支持弱引用，直接保存）
+        ref = weakref.WeakMethod(callback) if isinstance(callback, types.MethodType) else callback
+        with self._lock:
+            self._subscribers.append((prefix, ref))
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+                self._watcher.start()
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(prefix, ref) for prefix, ref in self._subscribers
+                                 if self._resolve(ref) not in (None, callback)]
+
+    @staticmethod
+    def _resolve(ref):
+        return ref() if isinstance(ref, weakref.WeakMethod) else ref
+
+    def _watch(self):
+        while True:
+            # 有排队的变更时立即醒来派发，否则按 check_interval 轮询文件
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            with self._lock:
+                self._subscribers = [(prefix, ref) for prefix, ref in self._subscribers if self._resolve(ref) is not None]
+                if not self._subscribers:
+                    self._watcher = None
+                    self._pending_changes.clear()
+                    return
+            self.refresh()
+            self._dispatch()
+
+    def _notify(self, changed):
+        """把变化的键排队，由监视线程派发"""
+        if not changed:
+            return
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._pending_changes.update(changed)
+        self._wake.set()
+
+    def _dispatch(self):
+        with self._lock:
+            changed, self._pending_changes = sorted(self._pending_changes), set()
+            subscribers = list(self._subscribers)
+        if not changed:
+            return
+        for prefix, ref in subscribers:
+            callback = self._resolve(ref)
+            if callback is None:
+                continue
+            keys = [k for k in changed if not prefix or k == prefix or k.startswith(prefix + ".")]
+            if keys:
+                try:
+                    callback(keys)
+                except Exception as e:
+                    logging.error(f"配置变更回调出错: {e}")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
 
 class ConfigManager:
     """
@@ -26,7 +218,91 @@ class ConfigManager:
                 "api_key": "",
                 "endpoint_id": "",
                 "model": "doubao-pro-4k",
-                "temperature": 0.7
+                "temperature": 0.7,
+                "base_url": "https://ark.cn-beijing.volces.com/api/v3",
+                "max_concurrency": 4,
+                "request_timeout": 30.0,
+                "streaming": False,
+                "history": {
+                    "max_turns": 3,
+                    "strategy": "full",
+                    "token_budget": 0,
+                    "thumbnail_size": 320,
+                    "thumbnail_quality": 60
+                },
+                "cache": {
+                    "enabled": False,
+                    "max_entries": 512,
+                    "ttl_seconds": 86400,
+                    "max_distance": 6,
+                    "min_confidence": 0.6
+                }
+            },
+            "vision": {
+                "encoder": {
+                    "preset": "balanced",
+                    "format": "jpeg"
+                },
+                "ocr_cache": {
+                    "max_entries": 16,
+                    "max_age": 10.0
+                },
+                "ocr": {
+                    "tiled": False,
+                    "tile_size": [480, 270],
+                    "tile_overlap": 48,
+                    "pool_size": 2,
+                    "intra_op_threads": 2,
+                    "checkout_timeout": 30.0,
+                    "warmup": False,
+                    "warmup_sessions": 1
+                },
+                "templates": {
+                    "enabled": False,
+                    "directory": "",
+                    "buttons": [],
+                    "threshold": 0.85,
+                    "scales": [0.8, 0.9, 1.0, 1.1, 1.2],
+                    "coarse_factor": 0.5,
+                    "color_tolerance": 40.0,
+                    "use_index": True
+                }
+            },
+            "agent": {
+                "pipeline": {
+                    "max_frame_age": 2.0,
+                    "action_settle": 0.3
+                },
+                "orchestrator": {
+                    "max_workers": 2
+                },
+                "scheduler": {
+                    "min_interval": 0.05,
+                    "max_interval": 5.0,
+                    "base_interval": 0.2,
+                    "wait_backoff": 2.0,
+                    "static_backoff": 1.5,
+                    "latency_ratio": 0.25
+                },
+                "frame_gate": {
+                    "enabled": True,
+                    "method": "luma",
+                    "threshold": 2.0,
+                    "masks": [],
+                    "max_static_seconds": 30.0
+                }
+            },
+            "performance": {
+                "sample_interval": 1.0,
+                "tracing": {
+                    "enabled": False,
+                    "max_events": 200000
+                },
+                "metrics": {
+                    "enabled": False,
+                    "host": "127.0.0.1",
+                    "port": 9464
+                }
             },
             "debug": {
                 "enabled": False,
@@ -34,9 +310,15 @@ class ConfigManager:
             }
         }
         
-        # 初始化：确保目录存在并加载配置
-        self._ensure_user_data_dir()
-        self._ensure_config_exists()
+        # 同一配置文件在进程内只有一份内存存储，多次创建 ConfigManager 不会重复读取文件
+        with _stores_lock:
+            self._store = _stores.get(self.config_path)
+            if self._store is None:
+                # 初始化：确保目录存在并加载配置
+                self._ensure_user_data_dir()
+                self._ensure_config_exists()
+                self._store = _ConfigStore(self.config_path, self.default_config)
+                _stores[self.config_path] = self._store
 
     def _ensure_user_data_dir(self):
         """确保 user_data 目录存在"""
@@ -50,57 +332,79 @@ class ConfigManager:
     def _ensure_config_exists(self):
         """确保配置文件存在，不存在则创建默认配置"""
         if not os.path.exists(self.config_path):
-            self.save_config(self.default_config)
+            self._write(self.default_config)
 
-    def load_config(self):
-        """加载配置"""
+    def _write(self, config_data):
+        """写入同目录下的临时文件后用 os.replace 原子替换，读取方不会读到写了一半的文件"""
+        temp_path = None
         try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return self.default_config
-
-    def save_config(self, config_data):
-        """保存配置"""
-        try:
-            with open(self.config_path, "w", encoding="utf-8") as f:
+            fd, temp_path = tempfile.mkstemp(prefix=".config.", suffix=".tmp", dir=self.user_data_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
                 json.dump(config_data, f, indent=4, ensure_ascii=False)
+            os.replace(temp_path, self.config_path)
             return True
         except Exception as e:
             logging.error(f"保存配置失败: {e}")
             return False
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load_config(self):
+        """加载配置（返回内存副本，修改后需 save_config）"""
+        return self._store.snapshot()
+
+    def save_config(self, config_data):
+        """保存配置，成功后立即更新内存存储并通知订阅者"""
+        if not self._write(config_data):
+            return False
+        self._store.replace(config_data)
+        return True
+
+    def reload(self):
+        """强制重新读取配置文件（同时刷新环境变量覆盖）"""
+        self._store.refresh(force=True)
 
     def get(self, key_path, default=None):
-        """获取配置值，支持 'ai.api_key' 格式"""
-        config = self.load_config()
-        keys = key_path.split(".")
-        value = config
-        try:
-            for k in keys:
-                value = value[k]
-            # 增加环境变量覆盖
-            env_key = key_path.upper().replace('.', '_') # 如 AI_API_KEY
-            return os.environ.get(env_key, value)
-        except (KeyError, TypeError):
-            # 即使配置文件中不存在，也尝试从环境变量获取
-            env_key = key_path.upper().replace('.', '_')
-            return os.environ.get(env_key, default)
+        """获取配置值，支持 'ai.api_key' 格式；环境变量（如 AI_API_KEY）优先
+        
+        值来自内存存储，不读取文件；返回的列表/字典不要原地修改
+        """
+        return self._store.get(key_path, default)
 
     def set(self, key_path, value):
         """设置配置值"""
+        return self.set_many({key_path: value})
+
+    def set_many(self, values):
+        """一次设置多个配置值（只写一次文件、只通知一次）"""
         config = self.load_config()
-        keys = key_path.split(".")
-        current = config
-        
-        # 遍历到倒数第二层
-        for k in keys[:-1]:
-            if k not in current:
-                current[k] = {}
-            current = current[k]
-        
-        # 设置值
-        current[keys[-1]] = value
+        for key_path, value in values.items():
+            keys = key_path.split(".")
+            current = config
+            
+            # 遍历到倒数第二层
+            for k in keys[:-1]:
+                if k not in current:
+                    current[k] = {}
+                current = current[k]
+            
+            # 设置值
+            current[keys[-1]] = value
         return self.save_config(config)
+
+    def subscribe(self, callback, prefix=""):
+        """订阅配置变化
+        
+        Args:
+            callback: 回调，参数为变化的键路径列表；绑定方法只保存弱引用
+            prefix: 只关心该前缀下的键，如 "ai"、"agent.scheduler"
+        """
+        self._store.subscribe(callback, prefix)
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        self._store.unsubscribe(callback)
     
     def get_user_data_path(self, filename):
         """获取 user_data 目录下文件的完整路径"""
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+帧上下文模块
+一次截图在整个步骤中只有一个 FrameContext：携带原始图像、各种编码结果与 OCR 结果，
+模型推理、OCR 兜底和坐标换算都基于同一帧，不再各自重新截图
+"""
+
+import time
+import threading
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+
+from ocr_cache import OCRResult, find_best
+
+
+class FrameContext:
+    """
+    一帧截图及其派生数据（按需计算并缓存，线程安全）
+    """
+
+    def __init__(self, frame: np.ndarray, captured_at: Optional[float] = None, seq: int = 0,
+                 hwnd: Optional[int] = None):
+        """
+        Args:
+            frame: RGB numpy 图像（窗口客户区）
+            captured_at: 截图时间戳，默认当前时间
+            seq: 帧序号
+            hwnd: 来源窗口句柄
+        """
+        self.frame = frame
+        self.captured_at = captured_at if captured_at is not None else time.time()
+        self.seq = seq
+        self.hwnd = hwnd
+        # 帧差门控因画面静止超时强制放行的帧，分析时不使用响应缓存
+        self.forced = False
+        self._encodings: Dict[str, str] = {}
+        self._ocr_results: Optional[List[OCRResult]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """帧尺寸 (宽, 高)"""
+        return self.frame.shape[1], self.frame.shape[0]
+
+    def set_encoding(self, key: str, image_base64: str):
+        """记录一种已完成的编码（如流水线截图阶段预先编码的结果）"""
+        with self._lock:
+            self._encodings[key] = image_base64
+
+    def get_encoding(self, key: str) -> Optional[str]:
+        """获取已缓存的编码，不存在返回 None"""
+        return self._encodings.get(key)
+
+    def encode(self, encoder, key: str = "ai") -> str:
+        """
+        用指定编码器编码本帧（同一 key 只编码一次）
+
+        Args:
+            encoder: FrameEncoder 实例
+            key: 编码结果的名称
+        """
+        with self._lock:
+            image_base64 = self._encodings.get(key)
+            if image_base64 is None:
+                image_base64 = encoder.encode_base64(self.frame)
+                self._encodings[key] = image_base64
+            return image_base64
+
+    def ocr_results(self, vision) -> List[OCRResult]:
+        """
+        本帧的 OCR 结果（首次调用时识别，之后复用）
+
+        Args:
+            vision: 提供 recognize(image) 的 VisionCore
+        """
+        with self._lock:
+            if self._ocr_results is None:
+                self._ocr_results = vision.recognize(self.frame)
+            return self._ocr_results
+
+    def find_texts(self, vision, texts: List[str], confidence_threshold: float = 0.5) -> Optional[Tuple[str, Tuple[int, int, float]]]:
+        """
+        在本帧中按顺序查找多个候选文字，返回第一个找到的
+
+        Returns:
+            (候选文字, (x, y, confidence))，坐标为帧内像素坐标；都未找到返回 None
+        """
+        results = self.ocr_results(vision)
+        for text in texts:
+            match = find_best(results, text, confidence_threshold)
+            if match:
+                return text, match[:3]
+        return None
+
+    def normalize(self, x: float, y: float) -> Tuple[float, float]:
+        """帧内像素坐标 -> 归一化坐标 (0.0-1.0)"""
+        width, height = self.size
+        return x / width, y / height
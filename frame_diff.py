@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+帧差检测模块
+比较连续截图的缩略亮度图或感知哈希，画面没有实质变化时跳过视觉模型调用
+"""
+
+import os
+import time
+import logging
+import cv2
+import numpy as np
+from typing import Optional, List, Tuple
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'frame_diff.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('frame_diff')
+
+# 归一化矩形区域 (x1, y1, x2, y2)，取值 0.0-1.0
+Region = Tuple[float, float, float, float]
+
+
+def to_luma_thumbnail(image: np.ndarray, size: Tuple[int, int] = (64, 36)) -> np.ndarray:
+    """
+    将 RGB 图像缩小为亮度缩略图
+
+    Args:
+        image: RGB 图像数组
+        size: 缩略图尺寸 (宽, 高)
+
+    Returns:
+        uint8 灰度缩略图
+    """
+    if image.ndim == 3:
+        # 先缩小再转灰度，转换的像素量更少
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def apply_masks(luma: np.ndarray, masks: Optional[List[Region]]) -> np.ndarray:
+    """
+    把被屏蔽的区域填为 0（如时钟、动态背景等不影响决策的区域）
+
+    Args:
+        luma: 灰度图
+        masks: 归一化矩形列表
+
+    Returns:
+        屏蔽后的灰度图（masks 为空时返回原图）
+    """
+    if not masks:
+        return luma
+    masked = luma.copy()
+    h, w = masked.shape[:2]
+    for x1, y1, x2, y2 in masks:
+        masked[int(y1 * h):int(np.ceil(y2 * h)), int(x1 * w):int(np.ceil(x2 * w))] = 0
+    return masked
+
+
+def dhash(image: np.ndarray, hash_size: int = 8, masks: Optional[List[Region]] = None) -> int:
+    """
+    计算差值感知哈希 (dHash)
+
+    Args:
+        image: RGB 或灰度图像
+        hash_size: 哈希边长，结果为 hash_size * hash_size 位
+        masks: 计算前屏蔽的归一化区域
+
+    Returns:
+        整数形式的哈希值
+    """
+    luma = to_luma_thumbnail(image, (hash_size + 1, hash_size))
+    luma = apply_masks(luma, masks)
+    bits = (luma[:, 1:] > luma[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希值之间的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class FrameChangeDetector:
+    """
+    帧变化检测器
+
+    与上一次"被分析"的参考帧比较（而不是上一次截图），避免缓慢渐变累积后仍被判定为无变化
+    """
+
+    def __init__(self, method: str = "luma", threshold: float = 2.0,
+                 masks: Optional[List[Region]] = None, max_static_seconds: float = 30.0,
+                 thumbnail_size: Tuple[int, int] = (64, 36)):
+        """
+        Args:
+            method: "luma" 比较缩略亮度图的平均绝对差 (0-255)，"dhash" 比较感知哈希汉明距离
+            threshold: 变化阈值，大于该值视为画面已变化
+            masks: 忽略的归一化区域列表
+            max_static_seconds: 画面静止超过该时长时强制放行一次（防止点击未生效时永远不再分析），0 表示不强制
+            thumbnail_size: luma 模式使用的缩略图尺寸
+        """
+        if method not in ("luma", "dhash"):
+            raise ValueError(f"未知的帧差检测方法: {method}")
+        self.method = method
+        self.threshold = threshold
+        self.masks = masks or []
+        self.max_static_seconds = max_static_seconds
+        self.thumbnail_size = thumbnail_size
+
+        self._reference = None
+        self._reference_time = 0.0
+        self.last_score = 0.0
+        # 最近一次放行是否为静止超时后的强制分析（画面其实没有变化）
+        self.last_forced = False
+        self.checked_count = 0
+        self.skipped_count = 0
+
+    def _signature(self, image: np.ndarray):
+        if self.method == "dhash":
+            return dhash(image, masks=self.masks)
+        return apply_masks(to_luma_thumbnail(image, self.thumbnail_size), self.masks)
+
+    def _distance(self, a, b) -> float:
+        if self.method == "dhash":
+            return float(hamming_distance(a, b))
+        return float(np.mean(cv2.absdiff(a, b)))
+
+    def has_changed(self, image: np.ndarray) -> bool:
+        """
+        判断画面相对参考帧是否发生了有意义的变化
+
+        返回 True 时当前帧成为新的参考帧
+
+        Args:
+            image: RGB 图像数组
+
+        Returns:
+            是否需要分析当前帧
+        """
+        self.checked_count += 1
+        signature = self._signature(image)
+        now = time.time()
+        self.last_forced = False
+
+        if self._reference is None:
+            changed = True
+            self.last_score = float("inf")
+        else:
+            self.last_score = self._distance(signature, self._reference)
+            changed = self.last_score > self.threshold
+            if not changed and self.max_static_seconds and now - self._reference_time >= self.max_static_seconds:
+                logger.debug(f"画面静止超过 {self.max_static_seconds} 秒，强制分析")
+                changed = True
+                self.last_forced = True
+
+        if changed:
+            self._reference = signature
+            self._reference_time = now
+        else:
+            self.skipped_count += 1
+        return changed
+
+    def reset(self):
+        """清除参考帧，下一帧必定被判定为变化"""
+        self._reference = None
+        self._reference_time = 0.0
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        return {
+            "checked": self.checked_count,
+            "skipped": self.skipped_count,
+            "skip_rate": self.skipped_count / self.checked_count if self.checked_count else 0.0,
+            "last_score": self.last_score
+        }
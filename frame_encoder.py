@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+帧编码模块
+把 RGB 帧一次性缩放并编码为 JPEG / WebP / PNG（及其 base64），供 SmartAgent 与 VisionCore 共用。
+使用 OpenCV 完成缩放与编码，中间缓冲区按尺寸复用
+"""
+
+import base64
+import threading
+from typing import Optional, Dict, Any, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# 缩放滤波器
+RESIZE_FILTERS = {
+    "nearest": cv2.INTER_NEAREST,
+    "bilinear": cv2.INTER_LINEAR,
+    "area": cv2.INTER_AREA,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4,
+}
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png",
+}
+
+# 质量预设：fast 追求速度，balanced 为默认，quality 接近旧的 LANCZOS + JPEG 85 画质
+QUALITY_PRESETS = {
+    "fast": {"resize": "bilinear", "quality": 75},
+    "balanced": {"resize": "area", "quality": 85},
+    "quality": {"resize": "lanczos", "quality": 90},
+}
+
+
+def image_mime_type(output_format: str) -> str:
+    """输出格式对应的 MIME 类型"""
+    return MIME_TYPES.get(output_format, "image/jpeg")
+
+
+class FrameEncoder:
+    """
+    帧编码器
+
+    - 最长边超过 max_size 时按比例缩小（不放大）
+    - 缩放与 RGB -> BGR 转换写入复用的缓冲区，尺寸变化时才重新分配
+    - 线程安全：同一实例可被多个线程调用
+    """
+
+    def __init__(self, max_size: int = 1024, output_format: str = "jpeg", quality: int = 85,
+                 resize: str = "area", png_compression: int = 1):
+        """
+        Args:
+            max_size: 最大边长（像素），0 表示不缩放
+            output_format: 输出格式 jpeg / webp / png
+            quality: JPEG / WebP 质量（1-100）
+            resize: 缩放滤波器，见 RESIZE_FILTERS
+            png_compression: PNG 压缩级别（0-9），越小越快
+        """
+        if output_format not in MIME_TYPES:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        if resize not in RESIZE_FILTERS:
+            raise ValueError(f"不支持的缩放滤波器: {resize}")
+        self.max_size = max_size
+        self.output_format = output_format
+        self.quality = quality
+        self.resize = resize
+        self.png_compression = png_compression
+
+        self._lock = threading.Lock()
+        self._resized: Optional[np.ndarray] = None
+        self._bgr: Optional[np.ndarray] = None
+        self.encode_count = 0
+        self.bytes_total = 0
+
+    @classmethod
+    def from_preset(cls, preset: str = "balanced", **kwargs) -> "FrameEncoder":
+        """按质量预设创建编码器，kwargs 覆盖预设中的参数"""
+        if preset not in QUALITY_PRESETS:
+            raise ValueError(f"未知的质量预设: {preset}")
+        params = dict(QUALITY_PRESETS[preset])
+        params.update(kwargs)
+        return cls(**params)
+
+    @classmethod
+    def from_config(cls, config_manager, max_size: int) -> "FrameEncoder":
+        """按配置 vision.encoder.* 创建编码器"""
+        params = {"max_size": max_size, "output_format": config_manager.get("vision.encoder.format", "jpeg")}
+        resize = config_manager.get("vision.encoder.resize", None)
+        quality = config_manager.get("vision.encoder.quality", None)
+        if resize:
+            params["resize"] = resize
+        if quality:
+            params["quality"] = int(quality)
+        return cls.from_preset(config_manager.get("vision.encoder.preset", "balanced"), **params)
+
+    @property
+    def mime_type(self) -> str:
+        return image_mime_type(self.output_format)
+
+    def target_size(self, width: int, height: int) -> tuple:
+        """计算缩放后的尺寸"""
+        longest = max(width, height)
+        if not self.max_size or longest <= self.max_size:
+            return width, height
+        scale = self.max_size / longest
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    @staticmethod
+    def _buffer(buffer: Optional[np.ndarray], shape: tuple) -> np.ndarray:
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+    def _encode_params(self) -> list:
+        if self.output_format == "jpeg":
+            return [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+        if self.output_format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, int(self.quality)]
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(self.png_compression)]
+
+    def encode(self, image: Union[np.ndarray, Image.Image]) -> bytes:
+        """
+        缩放并编码一帧
+
+        Args:
+            image: RGB numpy 数组或 PIL 图像
+
+        Returns:
+            编码后的图像字节
+        """
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+
+        height, width = image.shape[:2]
+        new_width, new_height = self.target_size(width, height)
+
+        with self._lock:
+            if (new_width, new_height) != (width, height):
+                self._resized = self._buffer(self._resized, (new_height, new_width, 3))
+                cv2.resize(image, (new_width, new_height), dst=self._resized,
+                           interpolation=RESIZE_FILTERS[self.resize])
+                image = self._resized
+
+            self._bgr = self._buffer(self._bgr, image.shape)
+            cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=self._bgr)
+
+            ok, encoded = cv2.imencode(f".{self.output_format}", self._bgr, self._encode_params())
+            if not ok:
+                raise ValueError(f"图像编码失败: {self.output_format}")
+            data = encoded.tobytes()
+            self.encode_count += 1
+            self.bytes_total += len(data)
+        return data
+
+    def encode_base64(self, image: Union[np.ndarray, Image.Image]) -> str:
+        """缩放、编码并转为 base64 字符串"""
+        return base64.b64encode(self.encode(image)).decode("utf-8")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """编码统计"""
+        return {
+            "format": self.output_format,
+            "resize": self.resize,
+            "quality": self.quality,
+            "encoded": self.encode_count,
+            "average_bytes": self.bytes_total / self.encode_count if self.encode_count else 0
+        }
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+"""
+帧源模块 - 可替换的截图后端
+统一 GameWindow / VisionCore 的截图路径，提供 PrintWindow、MSS 与磁盘回放三种实现。
+回放后端不依赖 Windows，可在无界面的 Linux 上以全速驱动 SmartAgent 主循环做性能测试。
+"""
+
+import os
+import time
+import ctypes
+import ctypes.wintypes as wintypes
+import logging
+import threading
+import cv2
+import numpy as np
+from typing import Optional, List
+
+# Windows 专用依赖：回放模式下允许缺失
+try:
+    import win32gui
+except ImportError:
+    win32gui = None
+
+try:
+    from mss import mss
+except ImportError:
+    mss = None
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'frame_source.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('frame_source')
+
+# 回放目录中可识别的帧文件
+REPLAY_IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.npy')
+
+
+class FrameSource:
+    """
+    帧源基类
+
+    所有实现的 grab() 均返回 RGB 格式的 numpy 数组 (H, W, 3)，失败返回 None。
+    截图类实现复用预分配的转换缓冲区，返回的数组在之后若干帧（RGB_BUFFER_COUNT）后会被覆盖
+    """
+
+    name = "base"
+
+    def grab(self) -> Optional[np.ndarray]:
+        """获取一帧"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放资源"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [
+        ("biSize", wintypes.DWORD),
+        ("biWidth", wintypes.LONG),
+        ("biHeight", wintypes.LONG),
+        ("biPlanes", wintypes.WORD),
+        ("biBitCount", wintypes.WORD),
+        ("biCompression", wintypes.DWORD),
+        ("biSizeImage", wintypes.DWORD),
+        ("biXPelsPerMeter", wintypes.LONG),
+        ("biYPelsPerMeter", wintypes.LONG),
+        ("biClrUsed", wintypes.DWORD),
+        ("biClrImportant", wintypes.DWORD),
+    ]
+
+
+BI_RGB = 0
+DIB_RGB_COLORS = 0
+
+# 颜色转换目标缓冲区的轮换数量：返回的帧在之后 RGB_BUFFER_COUNT - 1 次抓取内保持有效。
+# 截图循环每个周期都会抓取（包括被帧差门控丢弃的帧），跨越推理耗时持有的帧必须 copy()
+RGB_BUFFER_COUNT = 3
+
+
+class RGBBufferRing:
+    """
+    cvtColor 目标缓冲区环
+
+    按帧尺寸预分配 count 个 (H, W, 3) 数组轮流作为 cv2.cvtColor 的 dst，尺寸变化时才重新分配。
+    返回的数组会在之后第 count 次转换时被覆盖，需要更长时间持有帧的调用方应自行 copy()
+    """
+
+    def __init__(self, count: int = RGB_BUFFER_COUNT):
+        self.count = max(1, count)
+        self.allocations = 0
+        self._shape = None
+        self._buffers: List[np.ndarray] = []
+        self._index = 0
+
+    def convert(self, src: np.ndarray, code: int) -> np.ndarray:
+        """把 src 按 code 转换为 3 通道图像，写入下一个缓冲区"""
+        shape = (src.shape[0], src.shape[1], 3)
+        if shape != self._shape:
+            self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.count)]
+            self._shape = shape
+            self._index = 0
+            self.allocations += 1
+        dst = self._buffers[self._index]
+        self._index = (self._index + 1) % self.count
+        return cv2.cvtColor(src, code, dst=dst)
+
+    def clear(self):
+        """释放缓冲区"""
+        self._buffers = []
+        self._shape = None
+
+
+def _load_gdi():
+    """加载并声明 GDI 函数签名（64 位句柄需要显式 argtypes/restype）"""
+    user32 = ctypes.windll.user32
+    gdi32 = ctypes.windll.gdi32
+
+    user32.GetWindowDC.argtypes = [wintypes.HWND]
+    user32.GetWindowDC.restype = wintypes.HDC
+    user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+    user32.PrintWindow.argtypes = [wintypes.HWND, wintypes.HDC, wintypes.UINT]
+    user32.PrintWindow.restype = wintypes.BOOL
+
+    gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+    gdi32.CreateCompatibleDC.restype = wintypes.HDC
+    gdi32.CreateCompatibleBitmap.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int]
+    gdi32.CreateCompatibleBitmap.restype = wintypes.HBITMAP
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+    gdi32.DeleteDC.argtypes = [wintypes.HDC]
+    gdi32.GetDIBits.argtypes = [
+        wintypes.HDC, wintypes.HBITMAP, wintypes.UINT, wintypes.UINT,
+        ctypes.c_void_p, ctypes.POINTER(BITMAPINFOHEADER), wintypes.UINT
+    ]
+    gdi32.GetDIBits.restype = ctypes.c_int
+    return user32, gdi32
+
+
+class GDICaptureSession:
+    """
+    长生命周期的 GDI 截图会话
+
+    按窗口尺寸持有窗口 DC、兼容 DC 与位图，并通过 GetDIBits 直接写入预分配的 numpy 缓冲区，
+    BGRA -> RGB 转换同样写入会话持有的目标缓冲区（见 RGBBufferRing），
+    只有窗口尺寸变化时才重建，避免每帧创建/销毁 GDI 对象、GetBitmapBits 的额外拷贝与新数组分配
+    """
+
+    def __init__(self, hwnd: int):
+        self.hwnd = hwnd
+        self.width = 0
+        self.height = 0
+        self.rebuild_count = 0
+        self._user32, self._gdi32 = _load_gdi()
+        self._hwindc = None
+        self._memdc = None
+        self._bitmap = None
+        self._old_bitmap = None
+        self._bmi = BITMAPINFOHEADER()
+        self._buffer: Optional[np.ndarray] = None
+        self.rgb_buffers = RGBBufferRing()
+
+    def _build(self, width: int, height: int):
+        self.release()
+
+        self._hwindc = self._user32.GetWindowDC(self.hwnd)
+        self._memdc = self._gdi32.CreateCompatibleDC(self._hwindc)
+        self._bitmap = self._gdi32.CreateCompatibleBitmap(self._hwindc, width, height)
+        self._old_bitmap = self._gdi32.SelectObject(self._memdc, self._bitmap)
+
+        # 自上而下的 32 位 DIB，行数据与 numpy (H, W, 4) 布局一致
+        self._bmi.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        self._bmi.biWidth = width
+        self._bmi.biHeight = -height
+        self._bmi.biPlanes = 1
+        self._bmi.biBitCount = 32
+        self._bmi.biCompression = BI_RGB
+
+        self._buffer = np.empty((height, width, 4), dtype=np.uint8)
+        self.width = width
+        self.height = height
+        self.rebuild_count += 1
+        logger.debug(f"GDI 截图会话重建: {width}x{height} (第 {self.rebuild_count} 次)")
+
+    def capture(self, width: int, height: int) -> Optional[np.ndarray]:
+        """
+        截取一帧到内部缓冲区
+
+        Args:
+            width: 当前窗口宽度
+            height: 当前窗口高度
+
+        Returns:
+            BGRA 格式的内部缓冲区（下一次 capture 会覆盖），失败返回 None
+        """
+        if width != self.width or height != self.height or self._memdc is None:
+            self._build(width, height)
+
+        # 使用 PrintWindow (Flag 2) 截取后台画面，失败则尝试旧版 Flag 0
+        result = self._user32.PrintWindow(self.hwnd, self._memdc, 2)
+        if result == 0:
+            result = self._user32.PrintWindow(self.hwnd, self._memdc, 0)
+        if result == 0:
+            # DC 可能已失效（窗口销毁/重建），释放后下次重新创建
+            self.release()
+            return None
+
+        lines = self._gdi32.GetDIBits(
+            self._memdc, self._bitmap, 0, height,
+            self._buffer.ctypes.data_as(ctypes.c_void_p),
+            ctypes.byref(self._bmi), DIB_RGB_COLORS
+        )
+        if lines != height:
+            return None
+        return self._buffer
+
+    def capture_rgb(self, width: int, height: int) -> Optional[np.ndarray]:
+        """截取一帧并转换为 RGB（写入轮换的目标缓冲区），失败返回 None"""
+        bgra = self.capture(width, height)
+        if bgra is None:
+            return None
+        return self.rgb_buffers.convert(bgra, cv2.COLOR_BGRA2RGB)
+
+    def release(self):
+        """释放所有 GDI 资源"""
+        if self._memdc:
+            if self._old_bitmap:
+                self._gdi32.SelectObject(self._memdc, self._old_bitmap)
+            self._gdi32.DeleteDC(self._memdc)
+        if self._bitmap:
+            self._gdi32.DeleteObject(self._bitmap)
+        if self._hwindc:
+            self._user32.ReleaseDC(self.hwnd, self._hwindc)
+        self._hwindc = None
+        self._memdc = None
+        self._bitmap = None
+        self._old_bitmap = None
+        self.width = 0
+        self.height = 0
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+class PrintWindowFrameSource(FrameSource):
+    """
+    使用 PrintWindow API 截取窗口（支持后台窗口）
+
+    内部复用 GDICaptureSession，窗口尺寸不变时不再重复创建 GDI 对象
+    """
+
+    name = "printwindow"
+
+    def __init__(self, hwnd: int, client_area: bool = True):
+        """
+        Args:
+            hwnd: 目标窗口句柄
+            client_area: True 按客户区尺寸截图，False 按整个窗口尺寸截图
+        """
+        self.hwnd = hwnd
+        self.client_area = client_area
+        self._session: Optional[GDICaptureSession] = None
+        self._lock = threading.Lock()
+
+    def _get_size(self):
+        if self.client_area:
+            left, top, right, bottom = win32gui.GetClientRect(self.hwnd)
+        else:
+            left, top, right, bottom = win32gui.GetWindowRect(self.hwnd)
+        return right - left, bottom - top
+
+    def grab(self) -> Optional[np.ndarray]:
+        with self._lock:
+            try:
+                w, h = self._get_size()
+                if w <= 0 or h <= 0:
+                    return None
+
+                if self._session is None:
+                    self._session = GDICaptureSession(self.hwnd)
+
+                rgb = self._session.capture_rgb(w, h)
+                if rgb is None:
+                    logger.error("PrintWindow API 调用失败")
+                return rgb
+
+            except Exception as e:
+                logger.error(f"PrintWindow 截图失败: {e}")
+                return None
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.release()
+                self._session = None
+
+
+class MSSFrameSource(FrameSource):
+    """
+    使用 MSS 截取屏幕区域（要求窗口在前台）
+    """
+
+    name = "mss"
+
+    def __init__(self, hwnd: Optional[int] = None, monitor_index: int = 1):
+        """
+        Args:
+            hwnd: 目标窗口句柄，为 None 时截取整个显示器
+            monitor_index: hwnd 为 None 时使用的显示器编号（1 为主屏幕）
+        """
+        self.hwnd = hwnd
+        self.monitor_index = monitor_index
+        self._rgb_buffers = RGBBufferRing()
+
+    def grab(self) -> Optional[np.ndarray]:
+        try:
+            with mss() as sct:
+                if self.hwnd:
+                    left, top, right, bottom = win32gui.GetWindowRect(self.hwnd)
+                    w = right - left
+                    h = bottom - top
+                    if w <= 0 or h <= 0:
+                        return None
+                    monitor = {"left": left, "top": top, "width": w, "height": h}
+                else:
+                    monitor = sct.monitors[self.monitor_index]
+
+                # MSS 返回 BGRA，直接包装其缓冲区（不拷贝）转换为 RGB
+                shot = sct.grab(monitor)
+                img = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+                return self._rgb_buffers.convert(img, cv2.COLOR_BGRA2RGB)
+
+        except Exception as e:
+            logger.error(f"MSS 截图失败: {e}")
+            return None
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    回放帧源：从录制目录（图片/npy 序列）或视频文件读取帧
+
+    不依赖 Windows API，用于离线基准测试与压测
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, loop: bool = True, fps: Optional[float] = None, preload: bool = False):
+        """
+        Args:
+            path: 录制目录或视频文件路径
+            loop: 播放结束后是否从头循环
+            fps: 回放帧率，None 表示不限速（全速）
+            preload: 是否预先把目录中的帧全部解码到内存（排除磁盘 I/O 对测量的影响）
+        """
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self.preload = preload
+        self.frame_index = 0
+        self._lock = threading.Lock()
+        self._last_grab = 0.0
+        self._files: List[str] = []
+        self._frames: List[np.ndarray] = []
+        self._video = None
+        self._rgb_buffers = RGBBufferRing()
+
+        if os.path.isdir(path):
+            self._files = sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith(REPLAY_IMAGE_EXTS)
+            )
+            if not self._files:
+                raise ValueError(f"回放目录中没有可用的帧: {path}")
+            if preload:
+                self._frames = [self._read_file(f) for f in self._files]
+        elif os.path.isfile(path):
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f"无法打开回放视频: {path}")
+        else:
+            raise FileNotFoundError(f"回放路径不存在: {path}")
+
+        logger.info(f"回放帧源已加载: {path}")
+
+    def __len__(self):
+        if self._video is not None:
+            return int(self._video.get(cv2.CAP_PROP_FRAME_COUNT))
+        return len(self._files)
+
+    @staticmethod
+    def _read_file(file_path: str) -> Optional[np.ndarray]:
+        if file_path.lower().endswith('.npy'):
+            return np.load(file_path)
+        from PIL import Image
+        with Image.open(file_path) as img:
+            return np.array(img.convert("RGB"))
+
+    def _throttle(self):
+        if not self.fps:
+            return
+        interval = 1.0 / self.fps
+        wait = self._last_grab + interval - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_grab = time.perf_counter()
+
+    def _next_video_frame(self) -> Optional[np.ndarray]:
+        ok, frame = self._video.read()
+        if not ok and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+        if not ok:
+            return None
+        return self._rgb_buffers.convert(frame, cv2.COLOR_BGR2RGB)
+
+    def _next_file_frame(self) -> Optional[np.ndarray]:
+        if self.frame_index >= len(self._files):
+            if not self.loop:
+                return None
+            self.frame_index = 0
+        index = self.frame_index
+        self.frame_index += 1
+        if self._frames:
+            return self._frames[index]
+        return self._read_file(self._files[index])
+
+    def grab(self) -> Optional[np.ndarray]:
+        with self._lock:
+            self._throttle()
+            try:
+                if self._video is not None:
+                    return self._next_video_frame()
+                return self._next_file_frame()
+            except Exception as e:
+                logger.error(f"回放读取失败: {e}")
+                return None
+
+    def reset(self):
+        """回到第一帧"""
+        with self._lock:
+            self.frame_index = 0
+            if self._video is not None:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+class FrameRecorder(FrameSource):
+    """
+    录制包装器：透传内部帧源的同时把帧保存到目录，生成的目录可直接交给 ReplayFrameSource 回放
+    """
+
+    name = "recorder"
+
+    def __init__(self, source: FrameSource, output_dir: str, every_n: int = 1):
+        """
+        Args:
+            source: 被包装的帧源
+            output_dir: 录制输出目录
+            every_n: 每 N 帧保存一帧
+        """
+        self.source = source
+        self.output_dir = output_dir
+        self.every_n = max(1, every_n)
+        self.frame_count = 0
+        self.saved_count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def grab(self) -> Optional[np.ndarray]:
+        img = self.source.grab()
+        if img is None:
+            return None
+        self.frame_count += 1
+        if self.frame_count % self.every_n == 0:
+            try:
+                from PIL import Image
+                file_path = os.path.join(self.output_dir, f"frame_{self.frame_count:06d}.png")
+                Image.fromarray(np.ascontiguousarray(img)).save(file_path)
+                self.saved_count += 1
+            except Exception as e:
+                logger.error(f"录制帧保存失败: {e}")
+        return img
+
+    def close(self):
+        self.source.close()
+
+
+def create_frame_source(kind: str, hwnd: Optional[int] = None, **kwargs) -> FrameSource:
+    """
+    按名称创建帧源
+
+    Args:
+        kind: "printwindow" / "mss" / "replay"
+        hwnd: 窗口句柄（printwindow / mss 使用）
+        **kwargs: 传给具体实现的参数，replay 需要 path
+
+    Returns:
+        FrameSource 实例
+    """
+    if kind == PrintWindowFrameSource.name:
+        return PrintWindowFrameSource(hwnd, **kwargs)
+    if kind == MSSFrameSource.name:
+        return MSSFrameSource(hwnd, **kwargs)
+    if kind == ReplayFrameSource.name:
+        return ReplayFrameSource(**kwargs)
+    raise ValueError(f"未知的帧源类型: {kind}")
@@ -4,23 +4,40 @@ import ctypes
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
 except Exception:
-    ctypes.windll.user32.SetProcessDPIAware()
+    try:
+        ctypes.windll.user32.SetProcessDPIAware()
+    except Exception:
+        pass  # 非 Windows 环境（回放模式）
+
+# Windows 专用依赖：回放模式下允许缺失
+try:
+    import win32gui
+except ImportError:
+    win32gui = None
 
-import win32gui
-import win32ui
-import win32con
 import numpy as np
 import logging
 import cv2
-from mss import mss
+from typing import Optional
+from frame_source import FrameSource, PrintWindowFrameSource, MSSFrameSource
 
 class GameWindow:
-    def __init__(self):
+    def __init__(self, frame_source: Optional[FrameSource] = None):
         self.hwnd = None # 主窗口句柄
         self.render_hwnd = None # 实际渲染的子窗口句柄
         self.window_title = ""
         self.width = 0
         self.height = 0
+        # 外部指定的帧源（如回放），设置后优先于默认的 PrintWindow/MSS 截图路径
+        self.frame_source = frame_source
+        self._printwindow_source = None
+        self._mss_source = None
+
+    def set_frame_source(self, frame_source: Optional[FrameSource]):
+        """替换帧源，传入 None 恢复默认截图路径"""
+        if self.frame_source is not None and self.frame_source is not frame_source:
+            self.frame_source.close()
+        self.frame_source = frame_source
 
     def get_all_windows(self):
         """获取所有可见窗口"""
@@ -103,9 +120,12 @@ class GameWindow:
 
     def snapshot(self):
         """
-        截图方法：优先对渲染子窗口使用 PrintWindow
-        如果检测到黑屏/白屏，自动切换到 MSS 屏幕截图
+        截图方法：若设置了外部帧源则直接使用，否则优先对渲染子窗口使用 PrintWindow
+        如果 PrintWindow 失败或检测到黑屏/白屏，自动切换到 MSS 屏幕截图
         """
+        if self.frame_source is not None:
+            return self.frame_source.grab()
+
         # 优先使用子窗口，没有则用主窗口
         target_hwnd = self.render_hwnd if self.render_hwnd else self.hwnd
         
@@ -115,8 +135,8 @@ class GameWindow:
             img = self._capture_with_printwindow(target_hwnd)
             
             # 检测是否为纯色图片（黑屏/白屏）
-            if img is not None and self._is_solid_color(img):
-                logging.warning("检测到黑屏/白屏，切换到 MSS 屏幕截图模式")
+            if img is None or self._is_solid_color(img):
+                logging.warning("PrintWindow 失败或检测到黑屏/白屏，切换到 MSS 屏幕截图模式")
                 img = self._capture_with_mss(target_hwnd)
             
             return img
@@ -127,66 +147,18 @@ class GameWindow:
     
     def _capture_with_printwindow(self, target_hwnd):
         """使用 PrintWindow API 截取窗口"""
-        try:
-            left, top, right, bottom = win32gui.GetClientRect(target_hwnd)
-            w = right - left
-            h = bottom - top
-            
-            if w <= 0 or h <= 0: return None
-
-            hwindc = win32gui.GetWindowDC(target_hwnd)
-            srcdc = win32ui.CreateDCFromHandle(hwindc)
-            memdc = srcdc.CreateCompatibleDC()
-            
-            bmp = win32ui.CreateBitmap()
-            bmp.CreateCompatibleBitmap(srcdc, w, h)
-            memdc.SelectObject(bmp)
-            
-            # 使用 PrintWindow (Flag 2) 截取后台画面
-            result = ctypes.windll.user32.PrintWindow(target_hwnd, memdc.GetSafeHdc(), 2)
-            
-            # 如果失败，尝试旧版 Flag 0
-            if result == 0:
-                ctypes.windll.user32.PrintWindow(target_hwnd, memdc.GetSafeHdc(), 0)
-            
-            bmp_str = bmp.GetBitmapBits(True)
-            img = np.frombuffer(bmp_str, dtype='uint8')
-            img.shape = (h, w, 4)
-            
-            win32gui.DeleteObject(bmp.GetHandle())
-            memdc.DeleteDC()
-            srcdc.DeleteDC()
-            win32gui.ReleaseDC(target_hwnd, hwindc)
-
-            return img[:, :, :3][..., ::-1]
-            
-        except Exception as e:
-            logging.error(f"PrintWindow 截图失败: {e}")
-            return None
+        if self._printwindow_source is None or self._printwindow_source.hwnd != target_hwnd:
+            # 句柄变化时释放旧的 GDI 截图会话
+            if self._printwindow_source is not None:
+                self._printwindow_source.close()
+            self._printwindow_source = PrintWindowFrameSource(target_hwnd)
+        return self._printwindow_source.grab()
     
     def _capture_with_mss(self, target_hwnd):
         """使用 MSS 库截取屏幕指定区域（要求窗口在前台）"""
-        try:
-            # 获取窗口在屏幕上的位置
-            rect = win32gui.GetWindowRect(target_hwnd)
-            left, top, right, bottom = rect
-            w = right - left
-            h = bottom - top
-            
-            if w <= 0 or h <= 0: return None
-            
-            with mss() as sct:
-                monitor = {"left": left, "top": top, "width": w, "height": h}
-                screenshot = sct.grab(monitor)
-                img = np.array(screenshot)
-                # MSS 返回的是 BGRA，转换为 BGR
-                if img.shape[-1] == 4:
-                    img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-                return img
-                
-        except Exception as e:
-            logging.error(f"MSS 截图失败: {e}")
-            return None
+        if self._mss_source is None or self._mss_source.hwnd != target_hwnd:
+            self._mss_source = MSSFrameSource(target_hwnd)
+        return self._mss_source.grab()
     
     def _is_solid_color(self, img: np.ndarray, threshold: float = 10.0) -> bool:
         """检测图片是否为纯色（方差极低）
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+对话历史压缩模块
+控制每次请求重放的历史轮次大小：旧轮次可降级为缩略图或纯文本摘要，
+并按 token 预算裁剪，同时估算请求的 token 数和上传字节数
+"""
+
+import io
+import re
+import json
+import base64
+import math
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from PIL import Image
+
+# 每个轮次的压缩级别
+LEVEL_FULL = 0       # 原图
+LEVEL_THUMBNAIL = 1  # 缩略图
+LEVEL_TEXT = 2       # 纯文本摘要
+LEVEL_DROPPED = 3    # 不发送
+
+# 视觉模型按 28x28 像素块计 token（14px patch，2x2 合并），另加少量图片标记开销
+IMAGE_PATCH_SIZE = 28
+IMAGE_TOKEN_OVERHEAD = 4
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    """粗略估算文本 token 数：非 ASCII 字符（中文）约 1 token/字，ASCII 约 4 字符/token"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + math.ceil((len(text) - non_ascii) / 4)
+
+
+@lru_cache(maxsize=32)
+def image_size_from_base64(image_base64: str) -> Tuple[int, int]:
+    """读取 base64 图像的尺寸（只解析文件头，结果缓存，同一帧反复估算不重复解码）"""
+    with Image.open(io.BytesIO(base64.b64decode(image_base64))) as img:
+        return img.size
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """估算一张图像的 token 数"""
+    return math.ceil(width / IMAGE_PATCH_SIZE) * math.ceil(height / IMAGE_PATCH_SIZE) + IMAGE_TOKEN_OVERHEAD
+
+
+class HistoryManager:
+    """
+    历史记录的格式化与 token 预算控制
+
+    策略:
+        full      - 所有历史轮次发送原图（默认，与旧版本的请求相同）
+        thumbnail - 历史轮次发送缩略图
+        text      - 历史轮次只发送文本摘要（动作、坐标、简短思考）
+        hybrid    - 最近一轮发送缩略图，更早的轮次只发送文本摘要
+
+    token_budget > 0 时，整个请求（系统提示 + 历史 + 当前画面）的估算 token 数超出预算，
+    从最旧的轮次开始逐级降级（原图 -> 缩略图 -> 文本 -> 丢弃），当前画面始终保留
+    """
+
+    STRATEGIES = ("full", "thumbnail", "text", "hybrid")
+
+    def __init__(self, strategy: str = "full", token_budget: int = 0, thumbnail_size: int = 320,
+                 thumbnail_quality: int = 60, summary_chars: int = 60, image_mime: str = "image/jpeg"):
+        """
+        Args:
+            strategy: 压缩策略，见类说明
+            token_budget: 单次请求的 token 预算，0 表示不限制
+            thumbnail_size: 缩略图最长边（像素）
+            thumbnail_quality: 缩略图 JPEG 质量
+            summary_chars: 文本摘要中保留的思考字数
+            image_mime: 历史原图的 MIME 类型（缩略图始终为 JPEG）
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"不支持的历史策略: {strategy}")
+        self.strategy = strategy
+        self.token_budget = token_budget
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+        self.summary_chars = summary_chars
+        self.image_mime = image_mime
+
+    def _initial_levels(self, count: int) -> List[int]:
+        """按策略给出各轮次（从旧到新）的初始级别"""
+        if self.strategy == "full":
+            return [LEVEL_FULL] * count
+        if self.strategy == "thumbnail":
+            return [LEVEL_THUMBNAIL] * count
+        if self.strategy == "text":
+            return [LEVEL_TEXT] * count
+        return [LEVEL_TEXT] * (count - 1) + [LEVEL_THUMBNAIL] if count else []
+
+    def _thumbnail(self, item: Dict[str, Any]) -> str:
+        """生成（并缓存到历史项中）缩略图 base64"""
+        thumb = item.get("thumbnail_base64")
+        if thumb is None:
+            with Image.open(io.BytesIO(base64.b64decode(item["image_base64"]))) as img:
+                img = img.convert("RGB")
+                img.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.LANCZOS)
+                buffer = io.BytesIO()
+                img.save(buffer, format="JPEG", quality=self.thumbnail_quality)
+            thumb = base64.b64encode(buffer.getvalue()).decode("utf-8")
+            item["thumbnail_base64"] = thumb
+        return thumb
+
+    def _summary(self, ai_response: str) -> str:
+        """把模型回复压缩为一行文本摘要"""
+        data = None
+        match = re.search(r'\{.*\}', ai_response or "", re.DOTALL)
+        if match:
+            try:
+                data = json.loads(match.group())
+            except json.JSONDecodeError:
+                data = None
+        if not isinstance(data, dict):
+            return (ai_response or "")[:self.summary_chars]
+        thought = str(data.get("thought") or "")
+        if len(thought) > self.summary_chars:
+            thought = thought[:self.summary_chars] + "..."
+        return f"动作: {data.get('action')}, 坐标: {data.get('target')}, 思考: {thought}"
+
+    def _format_turn(self, item: Dict[str, Any], level: int) -> List[Dict]:
+        """按级别格式化一个历史轮次"""
+        if level == LEVEL_DROPPED:
+            return []
+        if level == LEVEL_TEXT:
+            return [
+                {"role": "user", "content": "[历史] 请分析游戏画面。（图像已省略）"},
+                {"role": "assistant", "content": self._summary(item["ai_response"])}
+            ]
+        if level == LEVEL_FULL:
+            image_base64, mime = item["image_base64"], self.image_mime
+        else:
+            image_base64, mime = self._thumbnail(item), "image/jpeg"
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "[历史] 请分析游戏画面。"},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime};base64,{image_base64}"
+                        }
+                    }
+                ]
+            },
+            {"role": "assistant", "content": item["ai_response"]}
+        ]
+
+    def format(self, history: List[Dict[str, Any]], reserved_tokens: int = 0) -> List[Dict]:
+        """
+        将历史记录格式化为消息列表，并按预算降级
+
+        Args:
+            history: 历史记录（从旧到新）
+            reserved_tokens: 历史之外的消息（系统提示、当前画面）已占用的 token 数
+
+        Returns:
+            格式化的历史消息列表
+        """
+        levels = self._initial_levels(len(history))
+        turns = [self._format_turn(item, level) for item, level in zip(history, levels)]
+
+        if self.token_budget > 0:
+            costs = [self.estimate(turn)[0] for turn in turns]
+            total = reserved_tokens + sum(costs)
+            index = 0
+            while total > self.token_budget and index < len(history):
+                if levels[index] == LEVEL_DROPPED:
+                    index += 1
+                    continue
+                # 最旧的轮次先降级
+                levels[index] += 1
+                turns[index] = self._format_turn(history[index], levels[index])
+                new_cost = self.estimate(turns[index])[0]
+                total += new_cost - costs[index]
+                costs[index] = new_cost
+
+        return [message for turn in turns for message in turn]
+
+    def estimate(self, messages: List[Dict]) -> Tuple[int, int]:
+        """
+        估算消息列表的 token 数和上传字节数
+
+        Returns:
+            (token 数, 字节数)
+        """
+        tokens = 0
+        size = 0
+        for message in messages:
+            tokens += MESSAGE_TOKEN_OVERHEAD
+            content = message.get("content")
+            if isinstance(content, str):
+                tokens += estimate_text_tokens(content)
+                size += len(content.encode("utf-8"))
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    tokens += estimate_text_tokens(part["text"])
+                    size += len(part["text"].encode("utf-8"))
+                elif part.get("type") == "image_url":
+                    url = part["image_url"]["url"]
+                    size += len(url)
+                    try:
+                        width, height = image_size_from_base64(url.split(",", 1)[1])
+                        tokens += estimate_image_tokens(width, height)
+                    except Exception:
+                        # 无法解析尺寸时按 base64 长度粗略估算
+                        tokens += len(url) // 100
+        return tokens, size
+
+    def get_stats(self, messages: List[Dict]) -> Dict[str, int]:
+        """请求体的估算指标"""
+        tokens, size = self.estimate(messages)
+        return {"estimated_prompt_tokens": tokens, "prompt_bytes": size}
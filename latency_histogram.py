@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+延迟直方图模块
+对数分桶的固定内存直方图：记录 O(1)，相对误差不超过 precision，
+同布局的直方图可直接合并（多窗口、多时段汇总），用于报告 p50/p90/p99/max 尾延迟
+"""
+
+import math
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+
+class LatencyHistogram:
+    """
+    对数分桶延迟直方图（单位：秒）
+
+    - 桶 i 覆盖 [min_value * g^i, min_value * g^(i+1))，g = 1 + precision
+    - 小于 min_value 的值计入第 0 桶，大于 max_value 的值计入最后一桶（max 仍记录真实值，落在最后一桶的百分位取 max）
+    - 百分位取桶的几何中点，相对误差约 precision / 2
+    - 线程安全
+    """
+
+    def __init__(self, min_value: float = 1e-5, max_value: float = 600.0, precision: float = 0.02):
+        """
+        Args:
+            min_value: 可分辨的最小延迟（秒）
+            max_value: 可分辨的最大延迟（秒）
+            precision: 相邻桶边界的相对增长，决定精度与桶数
+        """
+        if min_value <= 0 or max_value <= min_value or precision <= 0:
+            raise ValueError("需要 0 < min_value < max_value 且 precision > 0")
+        self.min_value = min_value
+        self.max_value = max_value
+        self.precision = precision
+        self._log_growth = math.log1p(precision)
+        self.bucket_count = int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 1
+        self._buckets = [0] * self.bucket_count
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(self.bucket_count - 1, int(math.log(value / self.min_value) / self._log_growth))
+
+    def _bucket_value(self, index: int) -> float:
+        """桶的代表值（几何中点）"""
+        return self.min_value * math.exp((index + 0.5) * self._log_growth)
+
+    def record(self, value: float, count: int = 1):
+        """记录一次（或 count 次相同的）延迟"""
+        value = max(0.0, float(value))
+        index = self._index(value)
+        with self._lock:
+            self._buckets[index] += count
+            self.count += count
+            self.total += value * count
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def same_layout(self, other: "LatencyHistogram") -> bool:
+        return (self.min_value, self.max_value, self.precision) == (other.min_value, other.max_value, other.precision)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """把 other 的计数并入本直方图（布局必须相同），返回 self"""
+        if not self.same_layout(other):
+            raise ValueError("直方图布局不同，无法合并")
+        snapshot = other.snapshot()
+        with self._lock:
+            for index, bucket in enumerate(snapshot._buckets):
+                if bucket:
+                    self._buckets[index] += bucket
+            self.count += snapshot.count
+            self.total += snapshot.total
+            self.min = min(self.min, snapshot.min)
+            self.max = max(self.max, snapshot.max)
+        return self
+
+    def snapshot(self, reset: bool = False) -> "LatencyHistogram":
+        """
+        复制当前状态
+
+        Args:
+            reset: 复制后清空本直方图（按时段统计时使用，复制与清空是原子的）
+        """
+        copy = LatencyHistogram(self.min_value, self.max_value, self.precision)
+        with self._lock:
+            copy._buckets = list(self._buckets)
+            copy.count, copy.total, copy.min, copy.max = self.count, self.total, self.min, self.max
+            if reset:
+                self._clear()
+        return copy
+
+    def _clear(self):
+        self._buckets = [0] * self.bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def reset(self):
+        """清空"""
+        with self._lock:
+            self._clear()
+
+    def percentile(self, q: float) -> float:
+        """
+        百分位延迟
+
+        Args:
+            q: 0-100
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            if q >= 100:
+                return self.max
+            rank = max(1, int(math.ceil(self.count * q / 100.0)))
+            seen = 0
+            for index, bucket in enumerate(self._buckets):
+                seen += bucket
+                if seen >= rank:
+                    if index == self.bucket_count - 1:
+                        # 最后一桶只收超出 max_value 的值，没有可用的代表值，取观测到的最大值
+                        return self.max
+                    # 代表值不超出实际观测到的范围
+                    return min(self.max, max(self.min, self._bucket_value(index)))
+            return self.max
+
+    def upper_bound(self, index: int) -> float:
+        """桶的上界，最后一桶（超出 max_value 的值）为 +Inf"""
+        if index >= self.bucket_count - 1:
+            return math.inf
+        return self.min_value * math.exp((index + 1) * self._log_growth)
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """
+        (上界, 累计计数) 列表，只列出非空桶，末尾总是 (+Inf, count)
+
+        桶边界只由布局决定，同布局的直方图（不同进程、不同机器）导出的边界一致，可以按桶相加
+        """
+        with self._lock:
+            buckets = list(self._buckets)
+        result = []
+        seen = 0
+        for index, bucket in enumerate(buckets[:-1]):
+            if bucket:
+                seen += bucket
+                result.append((self.upper_bound(index), seen))
+        result.append((math.inf, seen + buckets[-1]))
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Any]:
+        """{"count", "mean", "p50", "p90", "p99", "max"}（秒）"""
+        result = {"count": self.count, "mean": self.mean}
+        for q in percentiles:
+            result[f"p{q:g}"] = self.percentile(q)
+        result["max"] = self.max
+        return result
+
+
+def merge_histograms(histograms: Sequence[LatencyHistogram]) -> Optional[LatencyHistogram]:
+    """合并多个同布局直方图为一个新直方图，列表为空时返回 None"""
+    if not histograms:
+        return None
+    merged = histograms[0].snapshot()
+    for histogram in histograms[1:]:
+        merged.merge(histogram)
+    return merged
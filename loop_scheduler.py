@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+自适应循环调度器
+根据上一个动作类型、画面变化率和近期模型延迟动态调整截图轮询间隔，替代固定的 1 秒休眠
+"""
+
+import threading
+from collections import deque
+from typing import Optional
+
+
+class AdaptiveScheduler:
+    """
+    自适应轮询间隔
+
+    - click 之后的若干帧使用最小间隔，尽快捕捉界面切换
+    - 连续 wait 按 wait_backoff 指数退避（长加载画面少调用模型）
+    - 画面连续静止（帧差门控跳过）按 static_backoff 退避，画面一变立即恢复
+    - 间隔不低于 (近期模型延迟 + 推理排队等待) 的 latency_ratio 倍，避免截图远快于模型消化速度；
+      多窗口共享推理池时，排队等待由编排器通过 record_backlog 反馈，形成背压
+    - 结果始终限制在 [min_interval, max_interval]
+    - 每次决策的原因记录在 state 中：burst（点击后连拍）、idle（wait / 静止退避）、
+      backpressure（受模型延迟与排队限制）、active（默认间隔）
+    """
+
+    STATES = ("burst", "idle", "backpressure", "active")
+
+    def __init__(self, min_interval: float = 0.05, max_interval: float = 5.0, base_interval: float = 0.2,
+                 wait_backoff: float = 2.0, static_backoff: float = 1.5, click_burst: int = 3,
+                 latency_ratio: float = 0.25, latency_alpha: float = 0.3):
+        """
+        Args:
+            min_interval: 最小间隔（秒）
+            max_interval: 最大间隔（秒）
+            base_interval: 无特殊情况时的默认间隔（秒）
+            wait_backoff: 连续 wait 时的退避倍数
+            static_backoff: 连续静止帧的退避倍数
+            click_burst: 点击后保持最小间隔的截图次数
+            latency_ratio: 间隔相对模型延迟的下限比例，0 表示不考虑延迟
+            latency_alpha: 模型延迟指数滑动平均系数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.base_interval = base_interval
+        self.wait_backoff = wait_backoff
+        self.static_backoff = static_backoff
+        self.click_burst = click_burst
+        self.latency_ratio = latency_ratio
+        self.latency_alpha = latency_alpha
+
+        self._lock = threading.Lock()
+        self._burst_left = 0
+        self._wait_streak = 0
+        self._static_streak = 0
+        self._frames = 0
+        self._changed_frames = 0
+        self.latency_ewma: Optional[float] = None
+        self.backlog_ewma: Optional[float] = None
+        self.current_interval = base_interval
+        self.state = "active"
+        self.interval_history = deque(maxlen=100)
+
+    def configure(self, **params):
+        """
+        修改调度参数（配置热更新时调用，与 next_interval 互斥）
+
+        Args:
+            params: min_interval / max_interval / base_interval / wait_backoff / static_backoff / latency_ratio 等
+        """
+        with self._lock:
+            for name, value in params.items():
+                if not hasattr(self, name):
+                    raise AttributeError(f"未知的调度参数: {name}")
+                setattr(self, name, value)
+
+    def record_action(self, action: Optional[str]):
+        """
+        记录一次模型决策
+
+        Args:
+            action: 模型给出的动作（"click" / "wait" / None 等）
+        """
+        with self._lock:
+            if action == "click":
+                self._burst_left = self.click_burst
+                self._wait_streak = 0
+            elif action == "wait":
+                self._wait_streak += 1
+                self._burst_left = 0
+            else:
+                self._wait_streak = 0
+
+    def record_frame(self, changed: bool):
+        """记录一次截图的帧差结果"""
+        with self._lock:
+            self._frames += 1
+            if changed:
+                self._changed_frames += 1
+                self._static_streak = 0
+            else:
+                self._static_streak += 1
+
+    def record_latency(self, seconds: float):
+        """记录一次模型调用耗时（缓存命中不应记录）"""
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = seconds
+            else:
+                self.latency_ewma = self.latency_alpha * seconds + (1 - self.latency_alpha) * self.latency_ewma
+
+    def record_backlog(self, seconds: float):
+        """记录一帧在共享推理池中的排队等待时间"""
+        with self._lock:
+            if self.backlog_ewma is None:
+                self.backlog_ewma = seconds
+            else:
+                self.backlog_ewma = self.latency_alpha * seconds + (1 - self.latency_alpha) * self.backlog_ewma
+
+    def next_interval(self) -> float:
+        """
+        计算下一次截图前的等待时间
+
+        Returns:
+            间隔秒数
+        """
+        with self._lock:
+            if self._burst_left > 0:
+                self._burst_left -= 1
+                interval = self.min_interval
+                state = "burst"
+            else:
+                interval = self.base_interval
+                state = "active"
+                if self._wait_streak:
+                    interval *= self.wait_backoff ** min(self._wait_streak, 10)
+                    state = "idle"
+                if self._static_streak:
+                    interval *= self.static_backoff ** min(self._static_streak, 10)
+                    state = "idle"
+                pressure = (self.latency_ewma or 0.0) + (self.backlog_ewma or 0.0)
+                if self.latency_ratio and pressure and pressure * self.latency_ratio > interval:
+                    interval = pressure * self.latency_ratio
+                    state = "backpressure"
+
+            interval = min(max(interval, self.min_interval), self.max_interval)
+            self.current_interval = interval
+            self.state = state
+            self.interval_history.append(interval)
+            return interval
+
+    @property
+    def change_rate(self) -> float:
+        """截图中画面发生变化的比例"""
+        return self._changed_frames / self._frames if self._frames else 0.0
+
+    def reset(self):
+        """恢复初始状态"""
+        with self._lock:
+            self._burst_left = 0
+            self._wait_streak = 0
+            self._static_streak = 0
+            self.current_interval = self.base_interval
+            self.state = "active"
+
+    def get_stats(self) -> dict:
+        """获取调度指标"""
+        with self._lock:
+            history = list(self.interval_history)
+        return {
+            "current_interval": self.current_interval,
+            "state": self.state,
+            "average_interval": sum(history) / len(history) if history else self.current_interval,
+            "change_rate": self.change_rate,
+            "latency_ewma": self.latency_ewma or 0.0,
+            "backlog_ewma": self.backlog_ewma or 0.0
+        }
@@ -38,7 +38,11 @@ from config_manager import ConfigManager
 from ai_brain import AIBrain
 from logger_setup import logger, write_log
 from performance_monitor import performance_monitor
+from tracing import tracer
+from metrics_exporter import MetricsExporter
 from ui_components import DraggableWindow, LogPanel
+from ocr_warmup import OCRWarmupService
+from vision_registry import vision_registry
 
 # ============================================================================
 # Phase 3: Log Signals (Signal-driven Cross-thread Communication)
@@ -134,9 +138,12 @@ class SettingsDialog(QDialog):
             self.entry_model.setCurrentIndex(index)
     
     def _save_config(self):
-        self.config.set("ai.api_key", self.entry_key.text().strip())
-        self.config.set("ai.endpoint_id", self.entry_endpoint.text().strip())
-        self.config.set("ai.model", self.entry_model.currentText())
+        # 一次写入并通知订阅者，运行中的代理立即使用新配置
+        self.config.set_many({
+            "ai.api_key": self.entry_key.text().strip(),
+            "ai.endpoint_id": self.entry_endpoint.text().strip(),
+            "ai.model": self.entry_model.currentText()
+        })
         self.accept()
 
 
@@ -163,6 +170,28 @@ class AICmdCenter(QMainWindow):
         # Performance Monitor
         performance_monitor.start_monitoring()
         
+        # Tracing (opt-in): spans are exported as Chrome trace JSON on close; toggling the config applies live
+        tracer.configure(self.config_manager)
+        self.config_manager.subscribe(lambda keys: tracer.configure(self.config_manager), "performance.tracing")
+        
+        # Metrics endpoint (opt-in): OpenMetrics text on http://<host>:<port>/metrics for central scraping
+        self.metrics_exporter = MetricsExporter.from_config(self.config_manager)
+        if self.metrics_exporter:
+            try:
+                self.metrics_exporter.start()
+            except OSError as e:
+                logger.write({"title": f"指标导出服务启动失败: {e}", "type": "ERROR",
+                              "detail": f"监听地址: {self.metrics_exporter.host}:{self.metrics_exporter.requested_port}"})
+                self.metrics_exporter = None
+        
+        # OCR Warm-up (opt-in): load ONNX models in the background before the first OCR fallback
+        self.ocr_warmup = None
+        if self.config_manager.get("vision.ocr.warmup", False):
+            self.ocr_warmup = OCRWarmupService(
+                sessions=int(self.config_manager.get("vision.ocr.warmup_sessions", 1)),
+                on_status=log_signals.log_received.emit
+            )
+        
         # Window Map
         self.window_map = {}
         
@@ -185,6 +214,10 @@ class AICmdCenter(QMainWindow):
         # Initial Load
         self.refresh_game_list()
         self.refresh_window_list()
+        
+        # Start warm-up after signals are connected so readiness reaches the log panel
+        if self.ocr_warmup:
+            self.ocr_warmup.start()
     
     def _setup_ui(self):
         """Setup UI Layout"""
@@ -779,9 +812,15 @@ class AICmdCenter(QMainWindow):
     
     def closeEvent(self, event):
         self.agent.stop()
+        vision_registry.shutdown()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
         report = performance_monitor.stop_monitoring()
         if report:
             self._add_log("性能监控报告已生成", detail=report[:500], type="SYSTEM")
+        if tracer.get_stats()["events"]:
+            trace_path = tracer.save()
+            self._add_log("追踪数据已导出", detail=f"{trace_path}\n可在 ui.perfetto.dev 中打开", type="SYSTEM")
         logger.close()
         event.accept()
 
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+指标导出模块
+在本地 HTTP 端点 /metrics 上以 OpenMetrics 文本格式导出 PerformanceMonitor 的计数器、瞬时值、延迟直方图与资源占用，
+供集中监控系统抓取；也可以直接用 curl / urllib 访问验证
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, List, Tuple
+
+from performance_monitor import PerformanceMonitor, performance_monitor
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'metrics_exporter.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('metrics_exporter')
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "game_agent_"
+
+# 计数器说明（未列出的计数器使用名称本身作为说明）
+COUNTER_HELP = {
+    "agent_steps": "Frames analysed by the agent loop",
+    "agent_actions": "Actions executed by the agent loop",
+    "capture_failures": "Failed window captures",
+    "llm_calls": "Model calls by result status",
+    "llm_tokens": "Model tokens reported by raw_response.usage",
+    "llm_requests": "Model requests sent (cache hits excluded)",
+    "llm_estimated_prompt_tokens": "Estimated prompt tokens of sent requests (system prompt + history + frame)",
+    "llm_upload_bytes": "Request body bytes of sent requests (text + base64 images)",
+    "llm_cache_hits": "Response cache hits (model call skipped)",
+    "llm_cache_misses": "Response cache misses",
+    "ocr_calls": "OCR engine invocations (result cache misses)",
+    "ocr_cache_hits": "OCR result cache hits",
+    "scheduler_decisions": "Adaptive scheduler interval decisions by state (burst, idle, backpressure, active)",
+}
+
+# 瞬时值说明
+GAUGE_HELP = {
+    "loop_interval_seconds": "Capture interval last chosen by the adaptive scheduler",
+}
+
+
+def _escape(value: str) -> str:
+    """标签值转义"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _bound(value: float) -> str:
+    """直方图桶上界 le 的取值（6 位有效数字，同布局的直方图在各机器上输出一致）"""
+    return "+Inf" if math.isinf(value) else format(value, ".6g")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def render_openmetrics(monitor: Optional[PerformanceMonitor] = None) -> str:
+    """
+    把监控器当前状态渲染为 OpenMetrics 文本
+
+    - 计数器: <前缀><名称>_total{标签}
+    - 瞬时值: <前缀><名称>{标签} gauge（如 loop_interval_seconds）
+    - 延迟: <前缀>latency_seconds histogram（对数桶的累计 _bucket{le} + _sum/_count，可跨机器按桶汇总），另有 _max gauge
+    - 资源: CPU、常驻内存、运行时长 gauge
+    """
+    monitor = monitor or performance_monitor
+    lines: List[str] = []
+
+    # 计数器 / 瞬时值按名称分组，每组只输出一次 TYPE / HELP
+    for metric_type, values, help_texts, suffix in (("counter", monitor.get_counters(), COUNTER_HELP, "_total"),
+                                                    ("gauge", monitor.get_gauges(), GAUGE_HELP, "")):
+        families: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {}
+        for (name, labels), value in sorted(values.items()):
+            families.setdefault(name, []).append((labels, value))
+        for name, samples in families.items():
+            family = METRIC_PREFIX + name
+            lines.append(f"# TYPE {family} {metric_type}")
+            lines.append(f"# HELP {family} {help_texts.get(name, name)}")
+            for labels, value in samples:
+                lines.append(f"{family}{suffix}{_labels(labels)} {_number(value)}")
+
+    # 只列出非空桶：省略的桶累计值与前一个桶相同，不丢信息
+    latencies = monitor.snapshot_latencies()
+    family = METRIC_PREFIX + "latency_seconds"
+    lines.append(f"# TYPE {family} histogram")
+    lines.append(f"# HELP {family} Operation latency (capture, encode, llm, ocr, click, step)")
+    for operation, histogram in latencies.items():
+        base = (("operation", operation),)
+        for bound, cumulative in histogram.cumulative_buckets():
+            lines.append(f"{family}_bucket{_labels(base + (('le', _bound(bound)),))} {_number(cumulative)}")
+        lines.append(f"{family}_sum{_labels(base)} {_number(histogram.total)}")
+        lines.append(f"{family}_count{_labels(base)} {_number(histogram.count)}")
+    family = METRIC_PREFIX + "latency_max_seconds"
+    lines.append(f"# TYPE {family} gauge")
+    lines.append(f"# HELP {family} Maximum observed operation latency")
+    for operation, histogram in latencies.items():
+        lines.append(f"{family}{_labels((('operation', operation),))} {_number(histogram.max)}")
+
+    latest = monitor.get_latest_resource_usage()
+    if latest is not None:
+        _, cpu_percent, memory_mb = latest
+        lines.append(f"# TYPE {METRIC_PREFIX}process_cpu_percent gauge")
+        lines.append(f"{METRIC_PREFIX}process_cpu_percent {_number(cpu_percent)}")
+        lines.append(f"# TYPE {METRIC_PREFIX}process_resident_memory_bytes gauge")
+        lines.append(f"# UNIT {METRIC_PREFIX}process_resident_memory_bytes bytes")
+        lines.append(f"{METRIC_PREFIX}process_resident_memory_bytes {_number(memory_mb * 1024 * 1024)}")
+    if monitor.start_time:
+        lines.append(f"# TYPE {METRIC_PREFIX}uptime_seconds gauge")
+        lines.append(f"# UNIT {METRIC_PREFIX}uptime_seconds seconds")
+        lines.append(f"{METRIC_PREFIX}uptime_seconds {_number(time.time() - monitor.start_time)}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """只提供 GET /metrics"""
+
+    monitor: PerformanceMonitor = performance_monitor
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = render_openmetrics(self.monitor).encode("utf-8")
+        except Exception as e:
+            logger.error(f"渲染指标失败: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsExporter:
+    """
+    OpenMetrics HTTP 导出服务
+
+    用法:
+        exporter = MetricsExporter(port=9464)
+        exporter.start()
+        # curl http://127.0.0.1:9464/metrics
+    """
+
+    def __init__(self, monitor: Optional[PerformanceMonitor] = None, host: str = "127.0.0.1", port: int = 9464):
+        """
+        Args:
+            monitor: 导出的性能监控器，默认全局实例
+            host: 监听地址，默认只监听本机
+            port: 监听端口，0 表示随机分配（见 self.port）
+        """
+        self.monitor = monitor or performance_monitor
+        self.host = host
+        self.requested_port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config_manager) -> Optional["MetricsExporter"]:
+        """按配置 performance.metrics.* 创建导出服务，未启用时返回 None"""
+        if not config_manager.get("performance.metrics.enabled", False):
+            return None
+        return cls(host=config_manager.get("performance.metrics.host", "127.0.0.1"),
+                   port=int(config_manager.get("performance.metrics.port", 9464)))
+
+    @property
+    def port(self) -> int:
+        """实际监听的端口"""
+        return self._server.server_address[1] if self._server else self.requested_port
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self) -> "MetricsExporter":
+        """在后台线程中启动 HTTP 服务（重复调用不会重复启动）"""
+        if self._server is not None:
+            return self
+        handler = type("MetricsHandler", (_MetricsHandler,), {"monitor": self.monitor})
+        self._server = ThreadingHTTPServer((self.host, self.requested_port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        logger.info(f"指标导出已启动: {self.url}")
+        return self
+
+    def stop(self):
+        """停止 HTTP 服务"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+# 测试代码：启动导出服务并用普通 HTTP 客户端抓取一次
+if __name__ == "__main__":
+    from urllib.request import urlopen
+
+    monitor = PerformanceMonitor(sample_interval=0.2)
+    monitor.start_monitoring()
+    monitor.increment("agent_steps", window=1234)
+    monitor.increment("agent_actions", window=1234, action="click", source="model")
+    monitor.increment("llm_tokens", 850, type="prompt")
+    monitor.set_gauge("loop_interval_seconds", 0.5, window=1234)
+    monitor.record_latency("llm", 1.25)
+    monitor.record_snapshot(0.012)
+
+    exporter = MetricsExporter(monitor, port=0).start()
+    with urlopen(exporter.url) as response:
+        print(response.headers["Content-Type"])
+        print(response.read().decode("utf-8"))
+    exporter.stop()
+    monitor.stop_monitoring()
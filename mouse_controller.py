@@ -1,9 +1,16 @@
-import win32api
-import win32con
 import ctypes
 import traceback
 import logging
 from typing import Optional
+from tracing import tracer
+
+# Windows 专用依赖：回放模式下允许缺失（点击会失败并返回 False）
+try:
+    import win32api
+    import win32con
+except ImportError:
+    win32api = None
+    win32con = None
 
 # 配置日志
 log_dir = "log"
@@ -25,6 +32,7 @@ class MouseController:
     def __init__(self):
         pass
     
+    @tracer.traced("mouse.click")
     def click(self, window_x: int, window_y: int, hwnd: Optional[int] = None) -> bool:
         """点击指定位置
         
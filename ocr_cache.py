@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 结果缓存模块
+同一帧（按像素内容哈希）只运行一次 RapidOCR，后续对不同文字的查询直接在缓存的结果列表中匹配；
+缓存按帧龄和条目数淘汰
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Optional, List, Tuple, Dict, Any
+
+import numpy as np
+
+# 单条识别结果: (文字, 四点框 [[x, y], ...], 置信度)
+OCRResult = Tuple[str, List[List[float]], float]
+
+
+def frame_key(image: np.ndarray) -> str:
+    """按像素内容计算帧哈希（含尺寸），内容完全相同的帧得到相同的键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(image.shape).encode("ascii"))
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def normalize_results(raw) -> List[OCRResult]:
+    """把 RapidOCR 的输出统一为 (文字, 框, 置信度) 列表，兼容 [box, text, score] 与 [box, (text, score)] 两种格式"""
+    results = []
+    for item in raw or []:
+        if len(item) >= 3:
+            box, text, confidence = item[0], item[1], item[2]
+        else:
+            box, (text, confidence) = item[0], item[1]
+        results.append((str(text), [list(map(float, point)) for point in box], float(confidence)))
+    return results
+
+
+def box_center(box: List[List[float]]) -> Tuple[int, int]:
+    """四点框的中心像素坐标"""
+    box_array = np.array(box)
+    return int(np.mean(box_array[:, 0])), int(np.mean(box_array[:, 1]))
+
+
+def box_bounds(box: List[List[float]]) -> Tuple[int, int, int, int]:
+    """四点框的外接矩形 (x1, y1, x2, y2)"""
+    box_array = np.array(box)
+    return (int(np.min(box_array[:, 0])), int(np.min(box_array[:, 1])),
+            int(np.max(box_array[:, 0])), int(np.max(box_array[:, 1])))
+
+
+def offset_results(results: List[OCRResult], dx: float, dy: float) -> List[OCRResult]:
+    """把裁剪区域内的识别结果平移回原图坐标"""
+    if not dx and not dy:
+        return list(results)
+    return [(text, [[x + dx, y + dy] for x, y in box], confidence) for text, box, confidence in results]
+
+
+def find_best(results: List[OCRResult], target_text: str, confidence_threshold: float = 0.5) -> Optional[Tuple[int, int, float, str]]:
+    """
+    在识别结果中查找包含 target_text 的文字
+
+    Returns:
+        (x, y, confidence, 识别出的文字)，取置信度最高者；未找到返回 None
+    """
+    best = None
+    for text, box, confidence in results:
+        if target_text in text and confidence >= confidence_threshold:
+            if best is None or confidence > best[2]:
+                x, y = box_center(box)
+                best = (x, y, confidence, text)
+    return best
+
+
+def find_fuzzy(results: List[OCRResult], target_text: str, confidence_threshold: float = 0.5,
+               fuzzy_threshold: float = 0.8) -> Optional[Tuple[int, int, float, str, float]]:
+    """
+    模糊匹配文字
+
+    Returns:
+        (x, y, confidence, 识别出的文字, 相似度)，取相似度最高者；未找到返回 None
+    """
+    best = None
+    for text, box, confidence in results:
+        if confidence < confidence_threshold:
+            continue
+        similarity = SequenceMatcher(None, target_text, text).ratio()
+        if similarity >= fuzzy_threshold and (best is None or similarity > best[4]):
+            x, y = box_center(box)
+            best = (x, y, confidence, text, similarity)
+    return best
+
+
+def to_text_list(results: List[OCRResult], confidence_threshold: float = 0.5) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+    """转换为 (text, (x1, y1, x2, y2), confidence) 列表"""
+    return [(text, box_bounds(box), confidence) for text, box, confidence in results if confidence >= confidence_threshold]
+
+
+class OCRResultCache:
+    """
+    帧哈希 -> OCR 结果列表 的缓存
+
+    - 条目超过 max_age 秒视为过期（画面内容相同但可能已是很久之前的状态）
+    - 条目数超过 max_entries 时淘汰最久未使用的条目
+    - 线程安全
+    """
+
+    def __init__(self, max_entries: int = 16, max_age: float = 10.0):
+        """
+        Args:
+            max_entries: 最大缓存帧数
+            max_age: 条目最长保留时间（秒）
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Tuple[float, List[OCRResult]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict_expired(self, now: float):
+        while self._entries:
+            key, (stored_at, _) = next(iter(self._entries.items()))
+            # OrderedDict 按最近使用排序，只能淘汰头部已过期的条目
+            if now - stored_at <= self.max_age:
+                break
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[OCRResult]]:
+        """查询缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self.max_age:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, results: List[OCRResult]):
+        """写入一帧的识别结果"""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, results)
+            self._entries.move_to_end(key)
+            self._evict_expired(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_shared_cache: Optional[OCRResultCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> OCRResultCache:
+    """进程内共享的 OCR 结果缓存（参数读取配置 vision.ocr_cache.*）"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                from config_manager import ConfigManager
+                config = ConfigManager()
+                _shared_cache = OCRResultCache(
+                    max_entries=int(config.get("vision.ocr_cache.max_entries", 16)),
+                    max_age=float(config.get("vision.ocr_cache.max_age", 10.0))
+                )
+    return _shared_cache
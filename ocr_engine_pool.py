@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 引擎池模块
+维护 N 个按需创建的 RapidOCR / onnxruntime 会话，调用方签出一个空闲会话独占使用，
+替代整个进程共用一个引擎加一把全局锁的方式，使 OCR 吞吐随 CPU 核数扩展
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Callable, Dict, Any, List
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'ocr_engine_pool.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('ocr_engine_pool')
+
+
+def process_rss() -> int:
+    """当前进程常驻内存（字节），psutil 不可用时返回 0"""
+    if psutil is None:
+        return 0
+    try:
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+class OCRPoolTimeout(TimeoutError):
+    """在超时时间内没有可用的 OCR 会话"""
+
+
+class PooledSession:
+    """池中的一个 OCR 会话及其使用统计"""
+
+    def __init__(self, index: int, engine, memory_bytes: int = 0):
+        self.index = index
+        self.engine = engine
+        # 创建会话前后的进程内存差（并发创建时为近似值）
+        self.memory_bytes = memory_bytes
+        self.created_at = time.time()
+        self.uses = 0
+        self.busy_seconds = 0.0
+        self._checkout_at = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        alive = time.time() - self.created_at
+        return {
+            "index": self.index,
+            "uses": self.uses,
+            "busy_seconds": self.busy_seconds,
+            "utilization": self.busy_seconds / alive if alive > 0 else 0.0,
+            "memory_mb": self.memory_bytes / 1024 / 1024,
+            "busy": self._checkout_at > 0
+        }
+
+
+class OCREnginePool:
+    """
+    OCR 会话池
+
+    - 会话在首次需要时才创建，最多 size 个
+    - session() 签出一个空闲会话，全部忙碌且已达上限时等待，超过 timeout 抛出 OCRPoolTimeout
+    - 记录每个会话的使用次数与忙碌时间（利用率），以及签出等待时间
+    """
+
+    def __init__(self, size: int = 2, intra_op_threads: Optional[int] = None, checkout_timeout: float = 30.0,
+                 factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            size: 最大会话数
+            intra_op_threads: 每个会话的算子内线程数
+            checkout_timeout: 默认签出超时（秒）
+            factory: 自定义引擎构造函数，默认使用 vision_core.create_ocr_engine
+        """
+        self.size = max(1, size)
+        self.intra_op_threads = intra_op_threads
+        self.checkout_timeout = checkout_timeout
+        self._factory = factory
+
+        self._cond = threading.Condition()
+        self._sessions: List[PooledSession] = []
+        self._idle: List[PooledSession] = []
+        self._creating = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def _create_engine(self):
+        if self._factory is not None:
+            return self._factory()
+        from vision_core import create_ocr_engine
+        return create_ocr_engine(intra_op_num_threads=self.intra_op_threads)
+
+    def _grow(self) -> PooledSession:
+        """创建一个新会话（调用前已在锁内预占名额，创建过程在锁外进行）"""
+        rss_before = process_rss()
+        try:
+            engine = self._create_engine()
+        except Exception:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._creating -= 1
+            session = PooledSession(len(self._sessions), engine, max(0, process_rss() - rss_before))
+            self._sessions.append(session)
+        logger.info(f"OCR 会话 #{session.index} 已创建 ({len(self._sessions)}/{self.size})")
+        return session
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledSession:
+        """签出一个会话，用完必须 release"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.time()
+        deadline = start + timeout
+        grow = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    session = self._idle.pop()
+                    break
+                if len(self._sessions) + self._creating < self.size:
+                    self._creating += 1
+                    grow = True
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise OCRPoolTimeout(f"{timeout:g} 秒内没有可用的 OCR 会话")
+                self._cond.wait(remaining)
+        if grow:
+            session = self._grow()
+
+        with self._cond:
+            self.checkouts += 1
+            self.wait_seconds += time.time() - start
+            session._checkout_at = time.time()
+        return session
+
+    def release(self, session: PooledSession):
+        """归还会话"""
+        with self._cond:
+            session.uses += 1
+            session.busy_seconds += time.time() - session._checkout_at
+            session._checkout_at = 0.0
+            self._idle.append(session)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """
+        签出一个 OCR 引擎的上下文管理器
+
+        用法:
+            with pool.session() as engine:
+                result, _ = engine(image)
+        """
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.engine
+        finally:
+            self.release(pooled)
+
+    def ensure_started(self, count: int = 1):
+        """确保至少已创建 count 个会话（可用于预热）"""
+        count = min(count, self.size)
+        while True:
+            with self._cond:
+                if len(self._sessions) + self._creating >= count:
+                    return
+                self._creating += 1
+            session = self._grow()
+            with self._cond:
+                self._idle.append(session)
+                self._cond.notify()
+
+    @property
+    def live_sessions(self) -> int:
+        """已创建的会话数"""
+        return len(self._sessions)
+
+    @property
+    def memory_bytes(self) -> int:
+        """所有会话创建时占用的内存估计（字节）"""
+        return sum(s.memory_bytes for s in self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取池统计"""
+        with self._cond:
+            sessions = [s.get_stats() for s in self._sessions]
+            idle = len(self._idle)
+            checkouts = self.checkouts
+            return {
+                "size": self.size,
+                "live": len(sessions),
+                "idle": idle,
+                "memory_mb": sum(s["memory_mb"] for s in sessions),
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "average_wait": self.wait_seconds / checkouts if checkouts else 0.0,
+                "sessions": sessions
+            }
+
+
+_shared_pool: Optional[OCREnginePool] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool() -> OCREnginePool:
+    """进程内共享的 OCR 会话池（参数读取配置 vision.ocr.*）"""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_lock:
+            if _shared_pool is None:
+                from config_manager import ConfigManager
+                config = ConfigManager()
+                _shared_pool = OCREnginePool(
+                    size=int(config.get("vision.ocr.pool_size", 2)),
+                    intra_op_threads=int(config.get("vision.ocr.intra_op_threads", 2)),
+                    checkout_timeout=float(config.get("vision.ocr.checkout_timeout", 30.0))
+                )
+    return _shared_pool
@@ -6,9 +6,13 @@ OCR 工具模块 - 基于 RapidOCR (封装 vision_core.py)
 
 import numpy as np
 from PIL import Image
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Hashable
 import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from config_manager import ConfigManager
+from ocr_cache import OCRResult, find_best, find_fuzzy, to_text_list, offset_results
+from tiled_ocr import TiledOCR, crop_roi
 
 log_dir = "log"
 import os
@@ -33,13 +37,24 @@ class OCRTool:
     提供线程安全的文字识别和定位功能
     """
     
-    def __init__(self):
+    def __init__(self, tiled: Optional[bool] = None):
         """
         初始化 OCR 工具
+        
+        Args:
+            tiled: 是否启用分块增量识别（整帧查询只重新识别变化的块），None 时读取配置 vision.ocr.tiled
         """
+        # 只保护初始化与分块状态；识别本身由 OCR 会话池并发执行
         self._lock = threading.Lock()
-        self._ocr_engine = None
         self._initialized = False
+        # 分块状态（上一帧与各块结果）按图像来源分开保存，不同窗口交替调用时不会互相比较
+        self._tiled_ocrs: Dict[Hashable, Tuple[TiledOCR, threading.Lock]] = {}
+        
+        config = ConfigManager()
+        self.tiled = config.get("vision.ocr.tiled", False) if tiled is None else tiled
+        self.tile_size = tuple(config.get("vision.ocr.tile_size", [480, 270]))
+        self.tile_overlap = int(config.get("vision.ocr.tile_overlap", 48))
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
         logger.info("OCR 工具初始化中...")
     
     def _ensure_initialized(self):
@@ -50,9 +65,9 @@ class OCRTool:
             with self._lock:
                 if not self._initialized:
                     try:
-                        from vision_core import VisionCore
-                        # 创建 VisionCore 实例（使用屏幕截图模式）
-                        self._vision_core = VisionCore(hwnd=None)
+                        from vision_registry import vision_registry
+                        # 共享全屏截图模式的 VisionCore（与其他使用者共用 OCR 会话池）
+                        self._vision_core = vision_registry.get_vision(None)
                         # 确保 OCR 引擎初始化
                         self._vision_core._ensure_ocr()
                         self._initialized = True
@@ -64,7 +79,53 @@ class OCRTool:
                         logger.error(f"OCR 引擎初始化失败: {e}")
                         raise
     
-    def find_text(self, image: Image.Image, target_text: str, confidence_threshold: float = 0.5) -> Optional[Tuple[int, int, float]]:
+    def _recognize_uncached(self, crop: np.ndarray) -> List[OCRResult]:
+        """分块识别使用：块结果由 TiledOCR 自己复用，不写入整帧结果缓存"""
+        return self._vision_core.recognize(crop, use_cache=False)
+    
+    def _get_tiled(self, source: Hashable) -> Tuple[TiledOCR, threading.Lock]:
+        """获取（必要时创建）该来源的分块识别状态"""
+        with self._lock:
+            entry = self._tiled_ocrs.get(source)
+            if entry is None:
+                tiled_ocr = TiledOCR(self._recognize_uncached, tile_size=self.tile_size, overlap=self.tile_overlap)
+                entry = self._tiled_ocrs[source] = (tiled_ocr, threading.Lock())
+            return entry
+    
+    def reset_tiled(self, source: Hashable = None):
+        """丢弃某个来源的分块状态（如窗口关闭时）"""
+        with self._lock:
+            self._tiled_ocrs.pop(source, None)
+    
+    def _recognize(self, image: Image.Image, roi: Optional[Tuple[int, int, int, int]] = None,
+                   source: Hashable = None) -> List[OCRResult]:
+        """
+        识别图像中的全部文字（同一帧的结果被缓存，多次查询只运行一次 OCR）
+        
+        Args:
+            image: PIL 图像对象或 numpy 数组
+            roi: 只识别 (x1, y1, x2, y2) 区域，返回的坐标仍为整图坐标
+            source: 图像来源（如窗口句柄），分块模式按来源保存上一帧；不同来源的图像应传入不同的值
+        """
+        self._ensure_initialized()
+        
+        # 转换为 numpy 数组
+        img_array = np.asarray(image)
+        if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
+            img_array = img_array[:, :, :3]
+        
+        if roi is not None:
+            crop, dx, dy = crop_roi(img_array, roi)
+            return offset_results(self._vision_core.recognize(crop), dx, dy)
+        if self.tiled:
+            # 分块模式保存上一帧状态，同一来源需串行更新
+            tiled_ocr, tiled_lock = self._get_tiled(source)
+            with tiled_lock:
+                return tiled_ocr.update(img_array)
+        return self._vision_core.recognize(img_array)
+    
+    def find_text(self, image: Image.Image, target_text: str, confidence_threshold: float = 0.5,
+                  roi: Optional[Tuple[int, int, int, int]] = None, source: Hashable = None) -> Optional[Tuple[int, int, float]]:
         """
         在图像中查找指定文字并返回中心坐标
         
@@ -72,101 +133,57 @@ class OCRTool:
             image: PIL 图像对象
             target_text: 要查找的目标文字
             confidence_threshold: 置信度阈值，默认 0.5
+            roi: 只在 (x1, y1, x2, y2) 区域内查找，默认整图
+            source: 图像来源（如窗口句柄），分块模式按来源增量识别
         
         Returns:
             如果找到，返回 (x, y, confidence) 元组，其中 (x, y) 是中心像素坐标，confidence 是置信度
             如果未找到，返回 None
         """
-        self._ensure_initialized()
-        
-        with self._lock:
-            try:
-                # 转换为 numpy 数组
-                img_array = np.array(image)
-                
-                # 如果图像是 RGBA，转换为 RGB
-                if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
-                    img_array = img_array[:, :, :3]
-                
-                # 调用 OCR
-                result, _ = self._vision_core._ocr_engine(img_array)
-                
-                if not result:
-                    logger.debug(f"未识别到任何文字")
-                    return None
-                
-                # 查找匹配的文字
-                best_match = None
-                best_confidence = 0.0
-                
-                for item in result:
-                    box, (ocr_text, confidence) = item[0], item[1]
-                    
-                    # 检查是否匹配目标文字
-                    if target_text in ocr_text:
-                        if confidence > best_confidence and confidence >= confidence_threshold:
-                            best_confidence = confidence
-                            
-                            # 计算中心坐标
-                            box_array = np.array(box)
-                            center_x = int(np.mean(box_array[:, 0]))
-                            center_y = int(np.mean(box_array[:, 1]))
-                            
-                            best_match = (center_x, center_y, confidence)
-                            logger.info(f"找到文字 '{target_text}' (识别为: '{ocr_text}') 坐标: ({center_x}, {center_y}) 置信度: {confidence:.2f}")
-                
-                if best_match:
-                    return best_match
-                else:
-                    logger.debug(f"未找到文字 '{target_text}' (置信度阈值: {confidence_threshold})")
-                    return None
-                    
-            except Exception as e:
-                logger.error(f"OCR 识别失败: {e}")
+        try:
+            result = self._recognize(image, roi, source)
+            
+            if not result:
+                logger.debug(f"未识别到任何文字")
                 return None
+            
+            # 查找匹配的文字
+            match = find_best(result, target_text, confidence_threshold)
+            if match:
+                center_x, center_y, confidence, ocr_text = match
+                logger.info(f"找到文字 '{target_text}' (识别为: '{ocr_text}') 坐标: ({center_x}, {center_y}) 置信度: {confidence:.2f}")
+                return center_x, center_y, confidence
+            else:
+                logger.debug(f"未找到文字 '{target_text}' (置信度阈值: {confidence_threshold})")
+                return None
+                
+        except Exception as e:
+            logger.error(f"OCR 识别失败: {e}")
+            return None
     
-    def find_all_text(self, image: Image.Image, confidence_threshold: float = 0.5) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+    def find_all_text(self, image: Image.Image, confidence_threshold: float = 0.5,
+                      roi: Optional[Tuple[int, int, int, int]] = None, source: Hashable = None) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
         """
         识别图像中的所有文字
         
         Args:
             image: PIL 图像对象
             confidence_threshold: 置信度阈值，默认 0.5
+            roi: 只识别 (x1, y1, x2, y2) 区域，默认整图
+            source: 图像来源（如窗口句柄），分块模式按来源增量识别
         
         Returns:
             文字列表，每个元素为 (text, (x1, y1, x2, y2), confidence) 元组
         """
-        self._ensure_initialized()
-        
-        with self._lock:
-            try:
-                img_array = np.array(image)
-                
-                if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
-                    img_array = img_array[:, :, :3]
-                
-                result, _ = self._vision_core._ocr_engine(img_array)
-                
-                if not result:
-                    return []
-                
-                text_list = []
-                for item in result:
-                    box, (text, confidence) = item[0], item[1]
-                    
-                    if confidence >= confidence_threshold:
-                        box_array = np.array(box)
-                        x1, y1 = int(np.min(box_array[:, 0])), int(np.min(box_array[:, 1]))
-                        x2, y2 = int(np.max(box_array[:, 0])), int(np.max(box_array[:, 1]))
-                        text_list.append((text, (x1, y1, x2, y2), confidence))
-                
-                return text_list
-                
-            except Exception as e:
-                logger.error(f"OCR 识别失败: {e}")
-                return []
+        try:
+            return to_text_list(self._recognize(image, roi, source), confidence_threshold)
+            
+        except Exception as e:
+            logger.error(f"OCR 识别失败: {e}")
+            return []
     
-    def find_text_fuzzy(self, image: Image.Image, target_text: str, confidence_threshold: float = 0.5, fuzzy_threshold: float = 0.8) -> Optional[Tuple[int, int, float]]:
+    def find_text_fuzzy(self, image: Image.Image, target_text: str, confidence_threshold: float = 0.5, fuzzy_threshold: float = 0.8,
+                        roi: Optional[Tuple[int, int, int, int]] = None, source: Hashable = None) -> Optional[Tuple[int, int, float]]:
         """
         模糊查找文字（支持部分匹配）
         
@@ -175,52 +192,106 @@ class OCRTool:
             target_text: 要查找的目标文字
             confidence_threshold: OCR 置信度阈值，默认 0.5
             fuzzy_threshold: 模糊匹配阈值（0-1），默认 0.8
+            roi: 只在 (x1, y1, x2, y2) 区域内查找，默认整图
+            source: 图像来源（如窗口句柄），分块模式按来源增量识别
         
         Returns:
             如果找到，返回 (x, y, confidence) 元组
             如果未找到，返回 None
         """
+        try:
+            match = find_fuzzy(self._recognize(image, roi, source), target_text, confidence_threshold, fuzzy_threshold)
+            if not match:
+                return None
+            
+            center_x, center_y, confidence, text, similarity = match
+            logger.info(f"模糊匹配 '{target_text}' (识别为: '{text}') 相似度: {similarity:.2f} 坐标: ({center_x}, {center_y})")
+            return center_x, center_y, confidence
+            
+        except Exception as e:
+            logger.error(f"OCR 模糊匹配失败: {e}")
+            return None
+    
+    def _recognize_one(self, img_array: np.ndarray) -> List[OCRResult]:
+        try:
+            return self._vision_core.recognize(img_array)
+        except Exception as e:
+            logger.error(f"批量 OCR 识别失败: {e}")
+            return []
+    
+    def recognize_batch(self, images: List, rois: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> List[List[OCRResult]]:
+        """
+        批量识别多帧或多个裁剪区域，由 OCR 会话池中的多个会话并行处理
+        
+        Args:
+            images: PIL 图像或 numpy 数组列表
+            rois: 与 images 一一对应的识别区域（可为 None），返回的坐标为整图坐标
+        
+        Returns:
+            与输入顺序一致的 (文字, 四点框, 置信度) 列表；单帧失败时对应位置为空列表
+        """
         self._ensure_initialized()
+        if not images:
+            return []
+        rois = rois or [None] * len(images)
+        if len(rois) != len(images):
+            raise ValueError("rois 与 images 的数量不一致")
+        
+        arrays, offsets = [], []
+        for image, roi in zip(images, rois):
+            img_array = np.asarray(image)
+            if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
+                img_array = img_array[:, :, :3]
+            dx = dy = 0
+            if roi is not None:
+                img_array, dx, dy = crop_roi(img_array, roi)
+            arrays.append(img_array)
+            offsets.append((dx, dy))
         
+        if self._batch_executor is None:
+            with self._lock:
+                if self._batch_executor is None:
+                    pool_size = self._vision_core.ocr_pool.size
+                    self._batch_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="ocr-batch")
+        
+        results = self._batch_executor.map(self._recognize_one, arrays)
+        return [offset_results(result, dx, dy) for result, (dx, dy) in zip(results, offsets)]
+    
+    def find_all_text_batch(self, images: List, confidence_threshold: float = 0.5,
+                            rois: Optional[List[Optional[Tuple[int, int, int, int]]]] = None) -> List[List[Tuple[str, Tuple[int, int, int, int], float]]]:
+        """
+        批量识别多张图像中的所有文字
+        
+        Args:
+            images: PIL 图像或 numpy 数组列表
+            confidence_threshold: 置信度阈值，默认 0.5
+            rois: 与 images 一一对应的识别区域（可为 None）
+        
+        Returns:
+            与输入顺序一致的文字列表，每个元素为 (text, (x1, y1, x2, y2), confidence)
+        """
+        return [to_text_list(result, confidence_threshold) for result in self.recognize_batch(images, rois)]
+    
+    def close(self):
+        """关闭批量识别线程池"""
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=True)
+            self._batch_executor = None
+    
+    def get_pool_stats(self) -> dict:
+        """获取 OCR 会话池统计（会话数、签出等待、各会话利用率）"""
+        self._ensure_initialized()
+        return self._vision_core.ocr_pool.get_stats()
+    
+    def get_cache_stats(self) -> dict:
+        """获取 OCR 结果缓存统计（启用分块模式时包含各来源的分块复用统计）"""
+        self._ensure_initialized()
+        stats = self._vision_core.ocr_cache.get_stats()
         with self._lock:
-            try:
-                img_array = np.array(image)
-                
-                if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
-                    img_array = img_array[:, :, :3]
-                
-                result, _ = self._vision_core._ocr_engine(img_array)
-                
-                if not result:
-                    return None
-                
-                from difflib import SequenceMatcher
-                
-                best_match = None
-                best_similarity = 0.0
-                
-                for item in result:
-                    box, (text, confidence) = item[0], item[1]
-                    
-                    if confidence >= confidence_threshold:
-                        # 计算相似度
-                        similarity = SequenceMatcher(None, target_text, text).ratio()
-                        
-                        if similarity >= fuzzy_threshold and similarity > best_similarity:
-                            best_similarity = similarity
-                            
-                            box_array = np.array(box)
-                            center_x = int(np.mean(box_array[:, 0]))
-                            center_y = int(np.mean(box_array[:, 1]))
-                            
-                            best_match = (center_x, center_y, confidence)
-                            logger.info(f"模糊匹配 '{target_text}' (识别为: '{text}') 相似度: {similarity:.2f} 坐标: ({center_x}, {center_y})")
-                
-                return best_match
-                
-            except Exception as e:
-                logger.error(f"OCR 模糊匹配失败: {e}")
-                return None
+            tiled_ocrs = list(self._tiled_ocrs.items())
+        if tiled_ocrs:
+            stats["tiled"] = {str(source): tiled_ocr.get_stats() for source, (tiled_ocr, _) in tiled_ocrs}
+        return stats
 
 
 if __name__ == "__main__":
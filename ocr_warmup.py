@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 预热模块
+在程序启动时于后台线程加载 RapidOCR 模型、创建会话并执行一次空跑推理，
+避免第一次 OCR 兜底时在步骤中途承担数秒的模型加载耗时
+"""
+
+import os
+import time
+import logging
+import threading
+import traceback
+from datetime import datetime
+from typing import Optional, Callable, Dict, Any
+
+import cv2
+import numpy as np
+
+from ocr_engine_pool import OCREnginePool, get_shared_pool
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'ocr_warmup.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('ocr_warmup')
+
+
+def make_warmup_image() -> np.ndarray:
+    """生成带文字的空跑图像，使检测、方向分类和识别模型都被执行"""
+    image = np.full((96, 320, 3), 255, dtype=np.uint8)
+    cv2.putText(image, "WARMUP 0123", (12, 62), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2, cv2.LINE_AA)
+    return image
+
+
+class OCRWarmupService:
+    """
+    OCR 后台预热服务
+
+    状态: idle -> warming -> ready / failed
+    on_status 回调接收 UI 日志格式的字典 {"title", "detail", "type", "time"}，在后台线程中调用
+    """
+
+    IDLE = "idle"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, pool: Optional[OCREnginePool] = None, sessions: int = 1,
+                 on_status: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            pool: 要预热的 OCR 会话池，None 时使用进程内共享会话池
+            sessions: 预热的会话数（不超过池大小）
+            on_status: 状态变化回调（用于向 UI 报告就绪状态）
+        """
+        self.pool = pool if pool is not None else get_shared_pool()
+        self.sessions = max(1, min(sessions, self.pool.size))
+        self.on_status = on_status
+        self.status = self.IDLE
+        self.error: Optional[str] = None
+        self.elapsed = 0.0
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _report(self, title: str, detail: str = "", type: str = "SYSTEM"):
+        if self.on_status:
+            try:
+                self.on_status({"title": title, "detail": detail, "type": type, "time": datetime.now().timestamp()})
+            except Exception:
+                pass
+
+    def start(self) -> threading.Thread:
+        """启动后台预热（重复调用不会重复预热）"""
+        if self._thread is None:
+            self.status = self.WARMING
+            self._thread = threading.Thread(target=self._run, name="ocr-warmup", daemon=True)
+            self._thread.start()
+            self._report("OCR 引擎预热中...", f"后台加载 {self.sessions} 个 OCR 会话")
+        return self._thread
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.pool.ensure_started(self.sessions)
+            # 同时签出多个会话，保证每个会话都执行一次空跑推理
+            image = make_warmup_image()
+            checked_out = []
+            try:
+                for _ in range(self.sessions):
+                    checked_out.append(self.pool.acquire())
+                for pooled in checked_out:
+                    pooled.engine(image)
+            finally:
+                for pooled in checked_out:
+                    self.pool.release(pooled)
+
+            self.elapsed = time.perf_counter() - start
+            self.status = self.READY
+            logger.info(f"OCR 预热完成: {self.sessions} 个会话，耗时 {self.elapsed:.2f}秒")
+            self._report(f"OCR 引擎已就绪 ({self.elapsed:.1f}秒)", f"已预热 {self.sessions} 个 OCR 会话")
+        except Exception as e:
+            self.elapsed = time.perf_counter() - start
+            self.status = self.FAILED
+            self.error = str(e)
+            logger.error(f"OCR 预热失败: {e}")
+            self._report("OCR 引擎预热失败", traceback.format_exc(), type="WARNING")
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """预热是否已成功完成"""
+        return self.status == self.READY
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待预热结束
+
+        Returns:
+            预热成功返回 True；超时或失败返回 False
+        """
+        self._ready.wait(timeout)
+        return self.ready
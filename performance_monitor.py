@@ -8,8 +8,10 @@ import os
 import time
 import psutil
 import logging
+import threading
 from collections import deque
 from datetime import datetime
+from latency_histogram import LatencyHistogram
 
 # 配置日志
 log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log")
@@ -26,24 +28,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger('performance_monitor')
 
+# 按操作类型统计延迟直方图：截图、编码、模型调用、OCR、点击、单步总耗时
+LATENCY_OPERATIONS = ("capture", "encode", "llm", "ocr", "click", "step")
+
 class PerformanceMonitor:
     """
     性能监控器
     监控脚本运行时的性能指标
     """
     
-    def __init__(self, max_history=100):
+    def __init__(self, max_history=100, sample_interval=None):
         """
         初始化性能监控器
         Args:
-            max_history: 保留的历史记录数量
+            max_history: 保留的历史记录数量（各环形缓冲区的容量）
+            sample_interval: 资源采样周期（秒），None 时在开始监控时读取配置 performance.sample_interval
         """
         self.max_history = max_history
+        self.sample_interval = sample_interval
         self.start_time = None
         self.snapshot_times = deque(maxlen=max_history)
         self.touch_times = deque(maxlen=max_history)
+        # 资源使用由采样线程写入环形缓冲区，记录操作时不再采样
         self.memory_usage = deque(maxlen=max_history)
         self.cpu_usage = deque(maxlen=max_history)
+        self.sample_times = deque(maxlen=max_history)
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+        # 各操作的延迟直方图（固定内存，可合并、可按时段快照清零）
+        self.latencies = {operation: LatencyHistogram() for operation in LATENCY_OPERATIONS}
+        # 带标签的计数器：(名称, ((标签, 值), ...)) -> 累计值，供 metrics_exporter 导出
+        self._counters = {}
+        # 带标签的瞬时值（如自适应调度器当前选定的截图间隔），同样供 metrics_exporter 导出
+        self._gauges = {}
+        self._counters_lock = threading.Lock()
         self.snapshot_count = 0
         self.touch_count = 0
         self.error_count = 0
@@ -56,6 +74,7 @@ class PerformanceMonitor:
         开始监控
         """
         self.start_time = time.time()
+        self._start_sampler()
         logger.info(f"开始性能监控，时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     def stop_monitoring(self):
@@ -66,6 +85,7 @@ class PerformanceMonitor:
             logger.warning("性能监控未启动")
             return
         
+        self._stop_sampler()
         end_time = time.time()
         total_time = end_time - self.start_time
         
@@ -84,11 +104,7 @@ class PerformanceMonitor:
         """
         self.snapshot_count += 1
         self.snapshot_times.append(duration)
-        
-        # 记录当前资源使用情况
-        self._record_resource_usage()
-        
-        logger.debug(f"截图操作 #{self.snapshot_count}，耗时：{duration:.3f}秒")
+        self.latencies["capture"].record(duration)
     
     def record_touch(self, duration):
         """
@@ -98,8 +114,98 @@ class PerformanceMonitor:
         """
         self.touch_count += 1
         self.touch_times.append(duration)
-        
-        logger.debug(f"点击操作 #{self.touch_count}，耗时：{duration:.3f}秒")
+        self.latencies["click"].record(duration)
+    
+    def record_latency(self, operation, duration):
+        """
+        记录一次操作延迟
+        Args:
+            operation: 操作类型，见 LATENCY_OPERATIONS（其他名称会新建直方图）
+            duration: 耗时（秒）
+        """
+        histogram = self.latencies.get(operation)
+        if histogram is None:
+            histogram = self.latencies.setdefault(operation, LatencyHistogram())
+        histogram.record(duration)
+    
+    def increment(self, name, value=1, **labels):
+        """
+        累加计数器
+        Args:
+            name: 计数器名称（如 agent_steps、llm_tokens），不含 _total 后缀
+            value: 增量
+            labels: 标签，如 window=hwnd
+        """
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._counters_lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def set_gauge(self, name, value, **labels):
+        """
+        设置瞬时值（覆盖上一次的值）
+        Args:
+            name: 名称（如 loop_interval_seconds）
+            value: 当前值
+            labels: 标签，如 window=hwnd
+        """
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._counters_lock:
+            self._gauges[key] = value
+    
+    def get_gauges(self):
+        """
+        获取全部瞬时值的副本
+        Returns:
+            dict: (名称, ((标签, 值), ...)) -> 当前值
+        """
+        with self._counters_lock:
+            return dict(self._gauges)
+    
+    def get_counters(self):
+        """
+        获取全部计数器的副本
+        Returns:
+            dict: (名称, ((标签, 值), ...)) -> 累计值
+        """
+        with self._counters_lock:
+            return dict(self._counters)
+    
+    def get_counter_total(self, name):
+        """
+        计数器在所有标签组合上的合计
+        Args:
+            name: 计数器名称
+        Returns:
+            累计值，没有记录时为 0
+        """
+        with self._counters_lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+    
+    def snapshot_latencies(self, reset=False):
+        """
+        获取各操作延迟直方图的副本
+        Args:
+            reset: 复制后清零（按时段统计，如每分钟输出一次区间内的尾延迟）
+        Returns:
+            dict: 操作类型 -> LatencyHistogram 副本
+        """
+        return {operation: histogram.snapshot(reset) for operation, histogram in list(self.latencies.items())}
+    
+    def reset_latencies(self):
+        """
+        清空全部延迟直方图
+        """
+        for histogram in list(self.latencies.values()):
+            histogram.reset()
+    
+    def get_latency_summary(self):
+        """
+        获取各操作的延迟分位数
+        Returns:
+            dict: 操作类型 -> {"count", "mean", "p50", "p90", "p99", "max"}（秒），没有记录的操作不列出
+        """
+        return {operation: histogram.summary()
+                for operation, histogram in list(self.latencies.items()) if histogram.count}
     
     def record_error(self, error_type, message):
         """
@@ -121,21 +227,59 @@ class PerformanceMonitor:
         self.warning_count += 1
         logger.warning(f"警告 #{self.warning_count} - {warning_type}: {message}")
     
-    def _record_resource_usage(self):
+    def _start_sampler(self):
+        """
+        启动资源采样线程（已在运行时不重复启动）
+        """
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        if self.sample_interval is None:
+            from config_manager import ConfigManager
+            self.sample_interval = float(ConfigManager().get("performance.sample_interval", 1.0))
+        self._sampler_stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="resource-sampler", daemon=True)
+        self._sampler.start()
+    
+    def _stop_sampler(self):
+        """
+        停止资源采样线程
+        """
+        self._sampler_stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=2)
+            self._sampler = None
+    
+    def _sample_loop(self):
         """
-        记录当前资源使用情况
+        采样线程：每个周期记录一次进程 CPU 与内存使用
         """
         try:
-            # 获取当前进程
             process = psutil.Process()
-            
+            # 首次调用只建立基准；之后 cpu_percent(None) 返回距上次调用的平均值，不会阻塞
+            process.cpu_percent(interval=None)
+        except Exception as e:
+            logger.error(f"资源采样线程启动失败：{e}")
+            return
+        
+        while not self._sampler_stop.wait(self.sample_interval):
+            self._record_resource_usage(process)
+    
+    def _record_resource_usage(self, process):
+        """
+        记录当前资源使用情况（由采样线程调用）
+        Args:
+            process: psutil.Process 实例
+        """
+        try:
             # 获取内存使用情况（MB）
             memory_info = process.memory_info()
             memory_mb = memory_info.rss / 1024 / 1024
-            self.memory_usage.append(memory_mb)
             
-            # 获取CPU使用情况（百分比）
-            cpu_percent = process.cpu_percent(interval=0.1)
+            # 获取CPU使用情况（百分比，自上次采样以来的平均值）
+            cpu_percent = process.cpu_percent(interval=None)
+            
+            self.sample_times.append(time.time())
+            self.memory_usage.append(memory_mb)
             self.cpu_usage.append(cpu_percent)
             
             logger.debug(f"资源使用 - CPU: {cpu_percent:.1f}%, 内存: {memory_mb:.1f}MB")
@@ -143,6 +287,17 @@ class PerformanceMonitor:
         except Exception as e:
             logger.error(f"记录资源使用情况失败：{e}")
     
+    def get_latest_resource_usage(self):
+        """
+        获取最近一次采样的资源使用情况
+        Returns:
+            tuple: (采样时间, CPU使用率, 内存MB)，尚未采样时返回 None
+        """
+        try:
+            return self.sample_times[-1], self.cpu_usage[-1], self.memory_usage[-1]
+        except IndexError:
+            return None
+    
     def get_average_snapshot_time(self):
         """
         获取平均截图时间
@@ -169,9 +324,11 @@ class PerformanceMonitor:
         Returns:
             float: 平均内存使用量（MB）
         """
-        if not self.memory_usage:
+        # 采样线程可能同时写入，先取副本
+        samples = list(self.memory_usage)
+        if not samples:
             return 0.0
-        return sum(self.memory_usage) / len(self.memory_usage)
+        return sum(samples) / len(samples)
     
     def get_average_cpu_usage(self):
         """
@@ -179,9 +336,11 @@ class PerformanceMonitor:
         Returns:
             float: 平均CPU使用率（百分比）
         """
-        if not self.cpu_usage:
+        # 采样线程可能同时写入，先取副本
+        samples = list(self.cpu_usage)
+        if not samples:
             return 0.0
-        return sum(self.cpu_usage) / len(self.cpu_usage)
+        return sum(samples) / len(samples)
     
     def generate_report(self, total_time):
         """
@@ -211,6 +370,12 @@ class PerformanceMonitor:
             f"  平均内存使用：{self.get_average_memory_usage():.1f}MB",
             f"  平均CPU使用率：{self.get_average_cpu_usage():.1f}%",
             "",
+            "模型请求：",
+            *self._format_request_lines(),
+            "",
+            "延迟分布（毫秒）：",
+            *self._format_latency_lines(),
+            "",
             "性能评分：",
             f"  截图性能：{self._calculate_snapshot_performance()}",
             f"  点击性能：{self._calculate_touch_performance()}",
@@ -221,6 +386,38 @@ class PerformanceMonitor:
         
         return "\n".join(report_lines)
     
+    def _format_request_lines(self):
+        """
+        模型请求体报告行（估算 prompt token 数与上传字节数）
+        Returns:
+            list: 报告行
+        """
+        requests = self.get_counter_total("llm_requests")
+        if not requests:
+            return ["  （无记录）"]
+        tokens = self.get_counter_total("llm_estimated_prompt_tokens")
+        upload = self.get_counter_total("llm_upload_bytes")
+        return [
+            f"  请求次数：{requests}",
+            f"  平均估算 prompt tokens：{tokens / requests:.0f}",
+            f"  平均上传：{upload / requests / 1024:.1f}KB"
+        ]
+    
+    def _format_latency_lines(self):
+        """
+        延迟分位数报告行
+        Returns:
+            list: 每个操作一行
+        """
+        summary = self.get_latency_summary()
+        if not summary:
+            return ["  （无记录）"]
+        return [
+            f"  {operation:<8} 次数 {stats['count']:>6}  p50 {stats['p50'] * 1000:8.1f}  p90 {stats['p90'] * 1000:8.1f}"
+            f"  p99 {stats['p99'] * 1000:8.1f}  max {stats['max'] * 1000:8.1f}"
+            for operation, stats in summary.items()
+        ]
+    
     def _calculate_snapshot_performance(self):
         """
         计算截图性能评分
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+AI 响应缓存模块
+以 "画面感知哈希 + 系统提示" 为键缓存 AIBrain.analyze 的动作结果，
+相似画面直接复用之前的动作 JSON，省去一次网络往返
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+import numpy as np
+
+from frame_diff import dhash, hamming_distance
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'response_cache.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('response_cache')
+
+
+class ResponseCache:
+    """
+    感知哈希响应缓存
+
+    - LRU + TTL 淘汰
+    - 汉明距离不超过 max_distance 的画面视为同一画面
+    - 置信度低于 min_confidence 的结果不写入也不命中
+    - 可选持久化到 JSON 文件，重启后继续生效
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 512, ttl_seconds: float = 86400.0,
+                 max_distance: int = 6, min_confidence: float = 0.6, hash_size: int = 16,
+                 save_interval: float = 30.0):
+        """
+        Args:
+            path: 持久化文件路径，None 表示仅内存
+            max_entries: 最大条目数（LRU）
+            ttl_seconds: 条目有效期（秒），0 表示不过期
+            max_distance: 判定为相同画面的最大汉明距离
+            min_confidence: 置信度下限
+            hash_size: 感知哈希边长（hash_size^2 位）
+            save_interval: 两次写盘之间的最小间隔（秒）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.hash_size = hash_size
+        self.save_interval = save_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 串行化写盘，避免多个线程同时替换同一文件
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+        if path:
+            self._load()
+
+    @staticmethod
+    def prompt_key(system_prompt: str) -> str:
+        """系统提示的短摘要"""
+        return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+    def frame_hash(self, frame: np.ndarray) -> int:
+        """计算画面的感知哈希"""
+        return dhash(frame, hash_size=self.hash_size)
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return bool(self.ttl_seconds) and now - entry["created"] > self.ttl_seconds
+
+    def get(self, frame_hash: int, system_prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        查找相似画面的缓存结果
+
+        Args:
+            frame_hash: 画面感知哈希
+            system_prompt: 系统提示
+
+        Returns:
+            缓存条目（包含 data / content / model），未命中返回 None
+        """
+        pkey = self.prompt_key(system_prompt)
+        now = time.time()
+        with self._lock:
+            best_key = None
+            best_distance = self.max_distance + 1
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry, now):
+                    del self._entries[key]
+                    self._dirty = True
+                    continue
+                if key[0] != pkey:
+                    continue
+                distance = hamming_distance(key[1], frame_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            entry["hits"] = entry.get("hits", 0) + 1
+            self.hits += 1
+            logger.debug(f"缓存命中，汉明距离: {best_distance}")
+            return entry
+
+    def put(self, frame_hash: int, system_prompt: str, data: Dict[str, Any], content: str, model: str = ""):
+        """
+        写入缓存
+
+        Args:
+            frame_hash: 画面感知哈希
+            system_prompt: 系统提示
+            data: 解析后的动作 JSON
+            content: 模型原始回复
+            model: 模型名称
+        """
+        try:
+            confidence = float(data.get("confidence", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        if confidence < self.min_confidence:
+            self.bypassed += 1
+            return
+
+        key = (self.prompt_key(system_prompt), frame_hash)
+        with self._lock:
+            self._entries[key] = {
+                "data": data,
+                "content": content,
+                "model": model,
+                "created": time.time(),
+                "hits": 0
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+        if self.path and time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            now = time.time()
+            for item in items:
+                entry = item["entry"]
+                if self._expired(entry, now):
+                    continue
+                self._entries[(item["prompt_key"], int(item["hash"], 16))] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"已加载 AI 响应缓存: {len(self._entries)} 条")
+        except Exception as e:
+            logger.error(f"加载 AI 响应缓存失败: {e}")
+
+    def save(self) -> bool:
+        """
+        写盘（仅在有改动时）
+
+        在锁内序列化，写入同目录下的临时文件后用 os.replace 原子替换，
+        写到一半崩溃或多个写入方并发时不会留下截断的 JSON
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return True
+            items = [
+                {"prompt_key": key[0], "hash": format(key[1], "x"), "entry": entry}
+                for key, entry in self._entries.items()
+            ]
+            payload = json.dumps(items, ensure_ascii=False)
+            self._dirty = False
+            self._last_save = time.time()
+
+        with self._save_lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(prefix=".response_cache.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(temp_path, self.path)
+                return True
+            except Exception as e:
+                logger.error(f"保存 AI 响应缓存失败: {e}")
+                with self._lock:
+                    self._dirty = True
+                return False
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
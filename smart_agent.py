@@ -1,52 +1,129 @@
 import threading
-import base64
-import io
 import json
-from PIL import Image
 import numpy as np
-import win32gui
 from typing import Optional, Dict, Any
 from game_window import GameWindow
 from mouse_controller import MouseController
 from ai_brain import AIBrain
 from config_manager import ConfigManager
 import time
-from vision_core import VisionCore
+from vision_registry import vision_registry
+from frame_diff import FrameChangeDetector
+from agent_pipeline import FramePacket, LatestFrameSlot
+from frame_context import FrameContext
+from loop_scheduler import AdaptiveScheduler
+from frame_encoder import FrameEncoder
+from template_matcher import TemplateMatcher
+from performance_monitor import performance_monitor
+from tracing import tracer
+
+# Windows 专用依赖：回放模式下允许缺失
+try:
+    import win32gui
+except ImportError:
+    win32gui = None
 
 class SmartAgent:
-    def __init__(self, ui_queue: Optional[Any] = None, game_window: Optional[GameWindow] = None):
+    def __init__(self, ui_queue: Optional[Any] = None, game_window: Optional[GameWindow] = None,
+                 ai_brain: Optional[AIBrain] = None, template_matcher: Optional[TemplateMatcher] = None):
+        """
+        Args:
+            ui_queue: UI 消息队列
+            game_window: 游戏窗口，默认新建
+            ai_brain: AI 大脑，默认新建（多窗口时由编排器传入共享客户端与响应缓存的实例）
+            template_matcher: 已加载的模板匹配器，默认按配置加载（多窗口时共享同一份模板）
+        """
         self.game_window = game_window if game_window else GameWindow()
         self.mouse_controller = MouseController()
-        self.ai_brain = AIBrain()
+        self.ai_brain = ai_brain if ai_brain is not None else AIBrain()
         self.config_manager = ConfigManager()
         self.ui_queue = ui_queue
         self.running = False
+        # 自适应调度：按动作类型、画面变化率和模型延迟调整截图间隔
+        self.scheduler = AdaptiveScheduler(
+            min_interval=float(self.config_manager.get("agent.scheduler.min_interval", 0.05)),
+            max_interval=float(self.config_manager.get("agent.scheduler.max_interval", 5.0)),
+            base_interval=float(self.config_manager.get("agent.scheduler.base_interval", 0.2)),
+            wait_backoff=float(self.config_manager.get("agent.scheduler.wait_backoff", 2.0)),
+            static_backoff=float(self.config_manager.get("agent.scheduler.static_backoff", 1.5)),
+            latency_ratio=float(self.config_manager.get("agent.scheduler.latency_ratio", 0.25))
+        )
+        # 流水线：待推理帧超过该时长视为过期；点击后等待画面响应的时间，之前截取的帧一律丢弃
+        self.max_frame_age = float(self.config_manager.get("agent.pipeline.max_frame_age", 2.0))
+        self.action_settle = float(self.config_manager.get("agent.pipeline.action_settle", 0.3))
+        self.frame_slot = LatestFrameSlot()
+        # 帧编码器：单次缩放 + 编码，缓冲区复用
+        self.frame_encoder = FrameEncoder.from_config(self.config_manager, max_size=1024)
+        # 模板快速路径：vision.templates.buttons 中显式列出的按钮直接点击，不调用模型；
+        # 列表为空时不启用（常驻画面的 logo / HUD 模板不能被当成按钮反复点击）
+        self.template_matcher = template_matcher if template_matcher is not None else TemplateMatcher.from_config(self.config_manager)
+        self.template_buttons = list(self.config_manager.get("vision.templates.buttons", []) or [])
+        # 鼠标动作锁：多窗口共用同一个系统光标时由编排器替换为共享锁
+        self.action_lock = threading.Lock()
+        self._action_barrier = 0.0
+        self._frame_seq = 0
+        
+        # 帧差门控：画面无实质变化时跳过 AI 分析
+        self.frame_gate_enabled = self.config_manager.get("agent.frame_gate.enabled", True)
+        self.change_detector = FrameChangeDetector(
+            method=self.config_manager.get("agent.frame_gate.method", "luma"),
+            threshold=float(self.config_manager.get("agent.frame_gate.threshold", 2.0)),
+            masks=[tuple(m) for m in self.config_manager.get("agent.frame_gate.masks", [])],
+            max_static_seconds=float(self.config_manager.get("agent.frame_gate.max_static_seconds", 30.0))
+        )
+        
+        # 配置热更新：调度、流水线、帧差门控与模板按钮列表修改后，在截图循环的下一轮开始时生效
+        self._config_lock = threading.Lock()
+        self._pending_config_keys = []
+        self.config_manager.subscribe(self._on_config_changed, "agent")
+        self.config_manager.subscribe(self._on_config_changed, "vision.templates.buttons")
+    
+    def _on_config_changed(self, keys):
+        """配置变更回调（由配置存储在监视线程中派发）：只记录变更，由截图循环在下一轮开始时应用"""
+        with self._config_lock:
+            self._pending_config_keys.extend(keys)
+    
+    def _apply_pending_config(self):
+        """把排队的 agent.* 与模板按钮列表变更应用到组件（在截图线程中、帧差检测之前调用）"""
+        with self._config_lock:
+            keys, self._pending_config_keys = self._pending_config_keys, []
+        if not keys:
+            return
+        config = self.config_manager
+        self.scheduler.configure(
+            min_interval=float(config.get("agent.scheduler.min_interval", 0.05)),
+            max_interval=float(config.get("agent.scheduler.max_interval", 5.0)),
+            base_interval=float(config.get("agent.scheduler.base_interval", 0.2)),
+            wait_backoff=float(config.get("agent.scheduler.wait_backoff", 2.0)),
+            static_backoff=float(config.get("agent.scheduler.static_backoff", 1.5)),
+            latency_ratio=float(config.get("agent.scheduler.latency_ratio", 0.25))
+        )
+        self.max_frame_age = float(config.get("agent.pipeline.max_frame_age", 2.0))
+        self.action_settle = float(config.get("agent.pipeline.action_settle", 0.3))
+        self.frame_gate_enabled = config.get("agent.frame_gate.enabled", True)
+        detector = self.change_detector
+        detector.method = config.get("agent.frame_gate.method", "luma")
+        detector.threshold = float(config.get("agent.frame_gate.threshold", 2.0))
+        detector.masks = [tuple(m) for m in config.get("agent.frame_gate.masks", [])]
+        detector.max_static_seconds = float(config.get("agent.frame_gate.max_static_seconds", 30.0))
+        detector.reset()
+        self.template_buttons = list(config.get("vision.templates.buttons", []) or [])
+        if self.ui_queue:
+            self.ui_queue.put({"title": "配置已更新", "type": "SYSTEM", "detail": "\n".join(keys)})
     
-    def _image_to_base64(self, image_array: np.ndarray, max_size: int = 1024) -> str:
+    @tracer.traced("image_to_base64")
+    def _image_to_base64(self, image_array: np.ndarray) -> str:
         """将图像数组转换为base64编码
         
         Args:
-            image_array: numpy 图像数组
-            max_size: 最大边长，用于压缩以节省 Token（默认 1024）
+            image_array: numpy 图像数组（RGB），缩放与编码由 frame_encoder 完成（最大边长 1024，节省 Token）
         """
         try:
-            # 转换为PIL图像
-            img = Image.fromarray(image_array)
-            
-            # 缩放图片以节省 Token（复用 vision_core.py 的逻辑）
-            if max(img.size) > max_size:
-                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            
-            # 保存到内存缓冲区
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=85)
-            
-            # 编码为base64
-            base64_data = base64.b64encode(buffer.getvalue()).decode("utf-8")
-            return base64_data
+            return self.frame_encoder.encode_base64(image_array)
         except Exception:
             return ""
     
+    @tracer.traced("normalize_to_pixel")
     def _normalize_to_pixel(self, norm_x: float, norm_y: float) -> tuple[int, int]:
         """将归一化坐标转换为屏幕绝对坐标
         
@@ -91,13 +168,15 @@ class SmartAgent:
                     self.ui_queue.put({"title": f"无法找到游戏窗口: {window_title}", "type": "ERROR", "detail": f"窗口标题: {window_title}"})
                 return False
         else:
-            # 如果window_title为None，信任现有的self.game_window.hwnd
-            if not self.game_window.hwnd:
+            # 如果window_title为None，信任现有的self.game_window.hwnd（使用外部帧源回放时无需句柄）
+            if not self.game_window.hwnd and self.game_window.frame_source is None:
                 if self.ui_queue:
                     self.ui_queue.put({"title": "游戏窗口未初始化，请先连接窗口", "type": "ERROR", "detail": "hwnd 为空，请在左侧面板中选择并连接游戏窗口"})
                 return False
         
         self.running = True
+        self.change_detector.reset()
+        self.scheduler.reset()
         self.agent_thread = threading.Thread(target=self.run, daemon=True)
         self.agent_thread.start()
         
@@ -114,43 +193,169 @@ class SmartAgent:
         self.running = False
         if hasattr(self, "agent_thread") and self.agent_thread.is_alive():
             self.agent_thread.join(timeout=2)
+        self.ai_brain.flush_cache()
         
         if self.ui_queue:
             self.ui_queue.put({"title": "智能代理已停止", "type": "SYSTEM", "detail": "代理线程已终止"})
     
     def run(self):
-        """代理主循环"""
+        """代理主循环（推理/执行阶段）
+        
+        截图与编码在独立的截图线程中进行，与本线程的 AI 推理重叠：
+        推理第 N 帧的同时准备第 N+1 帧。点击之前截取的帧和超龄帧会被显式丢弃。
+        """
+        capture_thread = self.start_capture()
+        
         while self.running:
             try:
-                # 获取游戏窗口截图
-                screenshot = self.game_window.snapshot()
-                if screenshot is None:
-                    if self.ui_queue:
-                        self.ui_queue.put({"title": "无法获取游戏窗口截图", "type": "WARNING", "detail": "可能是窗口最小化或权限不足"})
+                packet = self.frame_slot.get(timeout=0.5)
+                if packet is None:
                     continue
+                self.process_packet(packet)
                 
-                # 分析游戏状态
-                analysis = self.step(screenshot)
+            except Exception as e:
+                import traceback
+                if self.ui_queue:
+                    self.ui_queue.put({"title": f"代理运行出错: {str(e)}", "type": "ERROR", "detail": traceback.format_exc()})
+        
+        self.frame_slot.clear()
+        capture_thread.join(timeout=2)
+    
+    def start_capture(self) -> threading.Thread:
+        """只启动截图/编码阶段，推理阶段由调用方驱动（本类的 run 或 AgentOrchestrator）
+        
+        调用前需将 self.running 置为 True
+        """
+        self.frame_slot.clear()
+        self._action_barrier = 0.0
+        self._apply_pending_config()
+        capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        capture_thread.start()
+        return capture_thread
+    
+    @tracer.traced("process_packet")
+    def process_packet(self, packet: FramePacket) -> Optional[Dict[str, Any]]:
+        """推理/执行阶段：分析一帧并执行动作
+        
+        Returns:
+            step() 的分析结果，帧已过期被丢弃时返回 None
+        """
+        # 编排器的工作线程轮流处理多个窗口，每帧重新打窗口标签
+        tracer.set_window(self.game_window.hwnd)
+        # 丢弃过期帧：截于上次点击生效之前，或在槽中等待过久
+        if packet.captured_at < self._action_barrier or packet.age > self.max_frame_age:
+            self.frame_slot.mark_stale()
+            # 过期帧已更新了帧差参考却未被分析，重置以确保下一帧被分析
+            self.change_detector.reset()
+            return None
+        
+        step_start = time.perf_counter()
+        # 分析游戏状态
+        analysis = self.step(packet.frame, image_base64=packet.image_base64, context=packet.context)
+        
+        # 反馈给调度器：模型动作与真实调用延迟（缓存命中不计入）
+        ai_analysis = analysis.get("ai_analysis", {})
+        self.scheduler.record_action((ai_analysis.get("data") or {}).get("action"))
+        if not ai_analysis.get("cached") and analysis.get("ai_latency") is not None:
+            self.scheduler.record_latency(analysis["ai_latency"])
+        
+        # 计数：每窗口的分析帧数与执行的动作（按来源区分：模型 / OCR 兜底 / 模板）
+        window = self.game_window.hwnd
+        performance_monitor.increment("agent_steps", window=window)
+        
+        # 根据分析结果执行相应的操作
+        action_type = analysis.get("action_type")
+        if action_type:
+            performance_monitor.increment("agent_actions", window=window, action=action_type,
+                                          source=analysis.get("action_source", "model"))
+        if action_type == "click":
+            target = analysis.get("target")
+            if target:
+                self.execute_action("click", target[0], target[1])
+                self._action_barrier = time.time() + self.action_settle
+                self.frame_slot.discard_before(self._action_barrier)
+        
+        performance_monitor.record_latency("step", time.perf_counter() - step_start)
+        return analysis
+    
+    def _capture_loop(self):
+        """截图/编码阶段：截图 -> 帧差门控 -> base64 编码 -> 放入帧槽"""
+        tracer.set_window(self.game_window.hwnd)
+        while self.running:
+            try:
+                self._apply_pending_config()
+                # 点击后等待画面响应，期间截图没有意义
+                wait = self._action_barrier - time.time()
+                if wait > 0:
+                    time.sleep(wait)
                 
-                # 根据分析结果执行相应的操作
-                action_type = analysis.get("action_type")
-                if action_type == "click":
-                    target = analysis.get("target")
-                    if target:
-                        self.execute_action("click", target[0], target[1])
+                captured_at = time.time()
+                capture_start = time.perf_counter()
+                with tracer.span("capture"):
+                    screenshot = self.game_window.snapshot()
+                performance_monitor.record_snapshot(time.perf_counter() - capture_start)
+                if screenshot is None:
+                    performance_monitor.increment("capture_failures", window=self.game_window.hwnd, reason="empty")
+                    if self.ui_queue:
+                        self.ui_queue.put({"title": "无法获取游戏窗口截图", "type": "WARNING", "detail": "可能是窗口最小化或权限不足"})
+                elif self.frame_gate_enabled and not self.change_detector.has_changed(screenshot):
+                    # 画面与上次分析时相比没有变化，跳过本轮 AI 调用
+                    self.scheduler.record_frame(False)
+                else:
+                    self.scheduler.record_frame(True)
+                    # 截图返回的是帧源轮换复用的缓冲区，推理期间截图循环仍在抓取会覆盖它；
+                    # 进入流水线的帧复制一份，保证 OCR 兜底与点击坐标使用的正是送给模型的那一帧
+                    screenshot = screenshot.copy()
+                    encode_start = time.perf_counter()
+                    image_base64 = self._image_to_base64(screenshot)
+                    performance_monitor.record_latency("encode", time.perf_counter() - encode_start)
+                    if image_base64:
+                        self._frame_seq += 1
+                        context = FrameContext(screenshot, captured_at, self._frame_seq, self.game_window.hwnd)
+                        context.set_encoding("ai", image_base64)
+                        context.forced = self.frame_gate_enabled and self.change_detector.last_forced
+                        self.frame_slot.put(FramePacket(self._frame_seq, screenshot, image_base64, captured_at, context))
+                        # 等待推理阶段取走该帧；超过帧龄上限仍未取走则重新截图替换
+                        self.frame_slot.wait_consumed(timeout=self.max_frame_age)
+                    elif self.ui_queue:
+                        self.ui_queue.put({"title": "无法转换图像为base64", "type": "ERROR", "detail": "图像数据无效或转换失败"})
                 
             except Exception as e:
                 import traceback
+                performance_monitor.increment("capture_failures", window=self.game_window.hwnd, reason="error")
                 if self.ui_queue:
-                    self.ui_queue.put({"title": f"代理运行出错: {str(e)}", "type": "ERROR", "detail": traceback.format_exc()})
+                    self.ui_queue.put({"title": f"截图线程出错: {str(e)}", "type": "ERROR", "detail": traceback.format_exc()})
             
-            # 控制循环频率
-            time.sleep(1)
+            # 控制截图频率（选定的间隔与调度状态计入性能监控，供指标导出）
+            interval = self.scheduler.next_interval()
+            performance_monitor.set_gauge("loop_interval_seconds", interval, window=self.game_window.hwnd)
+            performance_monitor.increment("scheduler_decisions", window=self.game_window.hwnd, state=self.scheduler.state)
+            if interval > 0:
+                time.sleep(interval)
     
-    def step(self, image_data: np.ndarray) -> Dict[str, Any]:
-        """执行单步分析和决策"""
+    @tracer.traced("step")
+    def step(self, image_data: np.ndarray, image_base64: Optional[str] = None,
+             context: Optional[FrameContext] = None) -> Dict[str, Any]:
+        """执行单步分析和决策
+        
+        Args:
+            image_data: numpy 图像数组
+            image_base64: 已编码的图像（流水线截图阶段预先编码），为 None 时在此编码
+            context: 本帧的上下文，为 None 时新建；OCR 兜底复用其中的图像与识别结果
+        """
+        if context is None:
+            context = FrameContext(image_data, hwnd=self.game_window.hwnd)
+        
+        # 0. 模板快速路径：命中已知按钮时直接点击
+        template_result = self._template_step(context)
+        if template_result is not None:
+            return template_result
+        
         # 1. 将图像转换为base64
-        image_base64 = self._image_to_base64(image_data)
+        if image_base64 is None:
+            image_base64 = context.get_encoding("ai") or self._image_to_base64(image_data)
+            if image_base64:
+                context.set_encoding("ai", image_base64)
         if not image_base64:
             if self.ui_queue:
                     self.ui_queue.put({"title": "无法转换图像为base64", "type": "ERROR", "detail": "图像数据无效或转换失败"})
@@ -161,11 +366,17 @@ class SmartAgent:
             }
         
         # 2. 使用AI分析图像
-        ai_result = self.ai_brain.analyze(image_base64)
+        ai_start = time.perf_counter()
+        ai_result = self.ai_brain.analyze(image_base64, frame=image_data, on_complete=self._on_analysis_complete,
+                                          use_cache=not context.forced)
+        ai_latency = time.perf_counter() - ai_start
+        if not ai_result.get("cached"):
+            performance_monitor.record_latency("llm", ai_latency)
         
         # 3. 解析AI结果
         result = {
             "ai_analysis": ai_result,
+            "ai_latency": ai_latency,
             "ocr_results": [],
             "timestamp": time.time(),
             "action_type": None,
@@ -213,6 +424,7 @@ class SmartAgent:
                 
                 # 更新结果
                 result["action_type"] = "click"
+                result["action_source"] = "model"
                 result["target"] = [px, py]
                 
             elif action_type == "wait":
@@ -240,20 +452,22 @@ class SmartAgent:
                     if self.ui_queue:
                         self.ui_queue.put({"title": f"OCR识别目标: {ocr_targets}", "type": "SYSTEM", "detail": f"识别目标列表: {ocr_targets}"})
                     
-                    # 创建视觉核心实例
-                    vision = VisionCore(hwnd=self.game_window.hwnd)
+                    # 获取该窗口共享的视觉核心实例（OCR 模型只加载一次）
+                    vision = vision_registry.get_vision(self.game_window.hwnd)
                     
-                    # 查找第一个匹配的文本
-                    for target_text in ocr_targets:
-                        ocr_result = vision.find_text(target_text)
-                        if ocr_result:
-                            x, y, conf = ocr_result
-                            if self.ui_queue:
-                                self.ui_queue.put({"title": f"OCR识别成功: '{target_text}' at ({x}, {y}), 置信度: {conf:.2f}", "type": "VISION", "detail": f"目标文本: '{target_text}'\n坐标: ({x}, {y})\n置信度: {conf:.2f}"})
-                            # 更新结果
-                            result["action_type"] = "click"
-                            result["target"] = [x, y]
-                            break
+                    # 在模型分析的同一帧上识别一次，按顺序查找第一个匹配的文字
+                    with tracer.span("ocr_fallback", targets=len(ocr_targets)):
+                        ocr_match = context.find_texts(vision, ocr_targets)
+                    if ocr_match:
+                        target_text, (x, y, conf) = ocr_match
+                        # OCR 坐标是帧内（客户区）像素坐标，归一化后转换为屏幕坐标
+                        px, py = self._normalize_to_pixel(*context.normalize(x, y))
+                        if self.ui_queue:
+                            self.ui_queue.put({"title": f"OCR识别成功: '{target_text}' at ({px}, {py}), 置信度: {conf:.2f}", "type": "VISION", "detail": f"目标文本: '{target_text}'\n帧内坐标: ({x}, {y})\n屏幕坐标: ({px}, {py})\n置信度: {conf:.2f}"})
+                        # 更新结果
+                        result["action_type"] = "click"
+                        result["action_source"] = "ocr"
+                        result["target"] = [px, py]
                 
         else:
             if self.ui_queue:
@@ -265,6 +479,61 @@ class SmartAgent:
         
         return result
     
+    @tracer.traced("template_match")
+    def _template_step(self, context: FrameContext) -> Optional[Dict[str, Any]]:
+        """在本帧中查找已知按钮模板，命中时返回与 step() 相同结构的点击结果，否则返回 None"""
+        if self.template_matcher is None or not self.template_buttons:
+            return None
+        try:
+            match = self.template_matcher.match_any(context.frame, self.template_buttons)
+        except Exception as e:
+            if self.ui_queue:
+                self.ui_queue.put({"title": f"模板匹配出错: {e}", "type": "WARNING", "detail": str(e)})
+            return None
+        if match is None:
+            return None
+        
+        norm_x, norm_y = context.normalize(match.x, match.y)
+        px, py = self._normalize_to_pixel(norm_x, norm_y)
+        if self.ui_queue:
+            self.ui_queue.put({
+                "type": "VISION",
+                "title": f"模板命中: {match.name} -> ({px}, {py})",
+                "detail": f"模板: {match.name}\n得分: {match.score:.3f}\n尺度: {match.scale}\n帧内坐标: ({match.x}, {match.y})\n屏幕坐标: ({px}, {py})"
+            })
+        
+        return {
+            "ai_analysis": {
+                "success": True,
+                "source": "template",
+                "data": {"action": "click", "target": [norm_x, norm_y], "confidence": match.score,
+                         "thought": f"模板匹配命中已知按钮: {match.name}"}
+            },
+            "ai_latency": None,
+            "template_match": match.to_dict(),
+            "ocr_results": [],
+            "timestamp": time.time(),
+            "action_type": "click",
+            "action_source": "template",
+            "target": [px, py]
+        }
+    
+    def _on_analysis_complete(self, ai_result: Dict[str, Any]):
+        """流式模式下完整回复接收完毕（后台线程），把完整思考补发到日志面板"""
+        if not self.ui_queue:
+            return
+        if ai_result.get("success"):
+            ai_data = ai_result.get("data") or {}
+            thought = ai_data.get("thought", "")
+            formatted_data = json.dumps(ai_data, indent=2, ensure_ascii=False)
+            self.ui_queue.put({
+                "type": "THOUGHT",
+                "title": f"AI 思考完成: {thought[:20]}..." if thought else "AI 思考完成",
+                "detail": f"完整思考:\n{thought}\n\n原始数据:\n{formatted_data}"
+            })
+        else:
+            self.ui_queue.put({"title": "AI 流式回复接收失败", "type": "WARNING", "detail": ai_result.get("error", "")})
+    
     def execute_action(self, action: str, x: int, y: int) -> bool:
         """执行操作
         
@@ -278,16 +547,19 @@ class SmartAgent:
         
         try:
             # 传入 None 作为 hwnd，表示坐标已经是屏幕绝对坐标
-            if action == "click":
-                success = self.mouse_controller.click(x, y, None)
-            elif action == "double_click":
-                success = self.mouse_controller.double_click(x, y, None)
-            elif action == "right_click":
-                success = self.mouse_controller.right_click(x, y, None)
-            elif action == "move":
-                success = self.mouse_controller.move(x, y, None)
-            else:
-                success = False
+            with self.action_lock:
+                action_start = time.perf_counter()
+                if action == "click":
+                    success = self.mouse_controller.click(x, y, None)
+                elif action == "double_click":
+                    success = self.mouse_controller.double_click(x, y, None)
+                elif action == "right_click":
+                    success = self.mouse_controller.right_click(x, y, None)
+                elif action == "move":
+                    success = self.mouse_controller.move(x, y, None)
+                else:
+                    success = False
+                performance_monitor.record_touch(time.perf_counter() - action_start)
             
             if self.ui_queue:
                     if success:
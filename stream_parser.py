@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+流式 JSON 动作解析模块
+逐块接收模型输出，在顶层 JSON 对象的字段值完整时立即解析，
+使调用方在 action / target 到达后即可行动，无需等待整段回复
+"""
+
+import json
+from typing import Dict, Any, Iterable
+
+
+class StreamingActionParser:
+    """
+    增量解析模型回复中的第一个 JSON 对象
+
+    - 跳过第一个 "{" 之前的文本（如 Markdown 代码块标记）
+    - 只解析顶层字段；嵌套的数组/对象作为整体值解析
+    - 字段值完整（遇到顶层的 "," 或 "}"）后写入 fields
+    """
+
+    def __init__(self, required: Iterable[str] = ("action", "target")):
+        """
+        Args:
+            required: 视为"可以行动"所需的字段
+        """
+        self.required = tuple(required)
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+
+        self.text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._key = None
+        self._value_start = -1
+
+    @property
+    def ready(self) -> bool:
+        """required 中的字段是否都已完整"""
+        return all(name in self.fields for name in self.required)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        送入一段增量文本
+
+        Returns:
+            是否有新的字段完成解析
+        """
+        if not chunk:
+            return False
+        self.text += chunk
+        text = self.text
+        before = len(self.fields)
+
+        i = self._pos
+        while i < len(text) and not self.done:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._value_start < 0:
+                        # 顶层字段名结束
+                        try:
+                            self._key = json.loads(text[self._string_start:i + 1])
+                        except json.JSONDecodeError:
+                            self._key = None
+            elif not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._complete_value(text, i)
+                    self.done = True
+                self._depth -= 1
+            elif self._depth == 1:
+                if ch == ":" and self._key is not None:
+                    self._value_start = i + 1
+                elif ch == ",":
+                    self._complete_value(text, i)
+            i += 1
+        self._pos = i
+
+        return len(self.fields) > before
+
+    def _complete_value(self, text: str, end: int):
+        """解析顶层字段值 text[_value_start:end]"""
+        if self._key is not None and self._value_start >= 0:
+            raw = text[self._value_start:end].strip()
+            try:
+                self.fields[self._key] = json.loads(raw)
+            except json.JSONDecodeError:
+                pass
+        self._key = None
+        self._value_start = -1
+
+
+if __name__ == "__main__":
+    parser = StreamingActionParser()
+    for piece in ['```json\n{"act', 'ion": "click", "tar', 'get": [0.5, 0.', '3], "thought": "点击确认"}```']:
+        if parser.feed(piece):
+            print(f"字段完成: {parser.fields}, ready={parser.ready}")
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+模板索引模块
+把一个脚本目录中全部模板的灰度/彩色金字塔、掩码与元数据编译为单个索引文件，
+启动时以内存映射方式加载（不解码 PNG），多个代理进程映射同一文件时共享操作系统页缓存。
+索引按文件 mtime/大小与内容哈希增量重建，只重新解码变化的模板
+
+文件布局: MAGIC(8) | 头部长度 uint64 LE(8) | 头部 JSON | 对齐填充 | 数据区（uint8 数组，按 64 字节对齐）
+"""
+
+import os
+import mmap
+import json
+import struct
+import hashlib
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from template_matcher import (TemplateMatcher, Template, TemplateLevel, read_manifest, scan_directory,
+                              load_template_images)
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'template_index.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('template_index')
+
+INDEX_FILE = "templates.idx"
+MAGIC = b"TPLIDX01"
+ALIGNMENT = 64
+LEVEL_ARRAYS = ("gray", "mask", "coarse_gray", "coarse_mask", "color")
+
+
+def index_path_for(directory: str) -> str:
+    """模板目录对应的默认索引文件路径"""
+    return os.path.join(directory, INDEX_FILE)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _file_state(path: Optional[str]) -> Optional[List[int]]:
+    """文件的 [mtime_ns, 大小]，路径为 None 时返回 None"""
+    if not path:
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _content_hash(path: str, mask_path: Optional[str]) -> str:
+    """模板与掩码文件内容的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    for file_path in (path, mask_path):
+        if file_path:
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _read_index(index_path: str) -> Tuple[Dict[str, Any], mmap.mmap, int]:
+    """
+    映射索引文件并解析头部
+
+    Returns:
+        (头部, 映射对象, 数据区起始偏移)
+    """
+    with open(index_path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        buffer.close()
+        raise ValueError(f"不是有效的模板索引: {index_path}")
+    header_start = len(MAGIC) + 8
+    header_length = struct.unpack("<Q", buffer[len(MAGIC):header_start])[0]
+    header = json.loads(buffer[header_start:header_start + header_length].decode("utf-8"))
+    return header, buffer, _align(header_start + header_length)
+
+
+def _view(buffer: mmap.mmap, data_start: int, spec: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """按 {"offset", "shape"} 取数据区中的只读数组视图（零拷贝）"""
+    if spec is None:
+        return None
+    shape = tuple(spec["shape"])
+    count = int(np.prod(shape))
+    return np.frombuffer(buffer, dtype=np.uint8, count=count, offset=data_start + spec["offset"]).reshape(shape)
+
+
+def _template_arrays(template: Template) -> Dict[str, Any]:
+    """模板的全部数组: {"gray", "mask", "color", "levels": [{"gray", ...}, ...]}"""
+    return {
+        "gray": template.gray,
+        "mask": template.mask,
+        "color": template.color,
+        "levels": [{"scale": level.scale, **{key: getattr(level, key) for key in LEVEL_ARRAYS}}
+                   for level in template.levels]
+    }
+
+
+def _entry_arrays(entry: Dict[str, Any], buffer: mmap.mmap, data_start: int, copy: bool = False) -> Dict[str, Any]:
+    """索引条目的全部数组（内存映射视图；copy 为 True 时复制出来，以便关闭映射）"""
+    def get(spec):
+        array = _view(buffer, data_start, spec)
+        return array.copy() if copy and array is not None else array
+
+    return {
+        "gray": get(entry["gray"]),
+        "mask": get(entry["mask"]),
+        "color": get(entry["color"]),
+        "levels": [{"scale": level["scale"], **{key: get(level[key]) for key in LEVEL_ARRAYS}}
+                   for level in entry["levels"]]
+    }
+
+
+def load_index(index_path: str) -> Tuple[Dict[str, Any], Dict[str, Template]]:
+    """
+    以内存映射方式加载索引
+
+    Returns:
+        (头部, 模板名 -> Template)，模板中的数组为只读映射视图
+    """
+    header, buffer, data_start = _read_index(index_path)
+    directory = os.path.dirname(os.path.abspath(index_path))
+    templates = {}
+    for name, entry in header["templates"].items():
+        arrays = _entry_arrays(entry, buffer, data_start)
+        template = Template(name, arrays["gray"], arrays["mask"], entry.get("roi"), entry.get("threshold"),
+                            os.path.join(directory, entry["file"]), arrays["color"])
+        template.levels = [TemplateLevel(level["scale"], level["gray"], level["mask"], level["coarse_gray"],
+                                         level["coarse_mask"], level["color"]) for level in arrays["levels"]]
+        templates[name] = template
+    return header, templates
+
+
+def _write_index(index_path: str, header: Dict[str, Any], entries: Dict[str, Dict[str, Any]]):
+    """写入索引：先写临时文件再原子替换，正在读取旧索引的进程不受影响"""
+    blobs = []
+    offset = 0
+
+    def place(array: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        nonlocal offset
+        if array is None:
+            return None
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+        offset = _align(offset)
+        spec = {"offset": offset, "shape": list(array.shape)}
+        blobs.append((offset, array))
+        offset += array.nbytes
+        return spec
+
+    for name, entry in entries.items():
+        arrays = entry.pop("arrays")
+        entry["gray"] = place(arrays["gray"])
+        entry["mask"] = place(arrays["mask"])
+        entry["color"] = place(arrays["color"])
+        entry["levels"] = [{"scale": level["scale"], **{key: place(level[key]) for key in LEVEL_ARRAYS}}
+                           for level in arrays["levels"]]
+    header["templates"] = entries
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_start = len(MAGIC) + 8
+    data_start = _align(header_start + len(header_bytes))
+
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * (data_start - header_start - len(header_bytes)))
+            position = 0
+            for blob_offset, array in blobs:
+                f.write(b"\0" * (blob_offset - position))
+                f.write(array.tobytes())
+                position = blob_offset + array.nbytes
+        # Windows 下其他进程正在映射旧索引时替换会失败，由调用方回退为逐个加载
+        os.replace(temp_path, index_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def build_index(directory: str, matcher: TemplateMatcher, index_path: Optional[str] = None,
+                force: bool = False) -> Dict[str, Any]:
+    """
+    增量构建模板索引
+
+    - mtime 与大小未变的模板直接沿用旧索引中的数据
+    - mtime 变化但内容哈希相同的模板同样沿用
+    - 其余模板重新解码并按 matcher 的尺度参数计算金字塔
+    - 尺度参数变化或 force 时全部重建；没有任何变化时不改写文件
+
+    Returns:
+        {"templates", "reused", "rebuilt", "removed", "written"}
+    """
+    index_path = index_path or index_path_for(directory)
+    params = {"scales": list(matcher.scales), "coarse_factor": matcher.coarse_factor}
+
+    old_entries: Dict[str, Dict[str, Any]] = {}
+    buffer, data_start = None, 0
+    stale = True
+    if not force and os.path.exists(index_path):
+        try:
+            header, buffer, data_start = _read_index(index_path)
+            if all(header.get(key) == value for key, value in params.items()):
+                old_entries = header["templates"]
+                stale = False
+            else:
+                logger.info("模板尺度参数已变化，重建全部模板")
+        except Exception as e:
+            logger.warning(f"读取旧模板索引失败，将全部重建: {e}")
+
+    manifest = read_manifest(directory)
+    entries: Dict[str, Dict[str, Any]] = {}
+    reused = rebuilt = 0
+    changed = False
+    for name, path, mask_path in scan_directory(directory):
+        options = manifest.get(name, {})
+        entry = {
+            "file": os.path.basename(path),
+            "mask_file": os.path.basename(mask_path) if mask_path else None,
+            "state": _file_state(path),
+            "mask_state": _file_state(mask_path),
+            "hash": None,
+            "roi": options.get("roi"),
+            "threshold": options.get("threshold")
+        }
+        old = old_entries.get(name)
+        if old is not None and old["mask_file"] == entry["mask_file"] and \
+                old["state"] == entry["state"] and old["mask_state"] == entry["mask_state"]:
+            entry["hash"] = old["hash"]
+        else:
+            entry["hash"] = _content_hash(path, mask_path)
+            changed = True
+            if old is not None and old["mask_file"] != entry["mask_file"]:
+                old = None
+        if old is not None and old["hash"] == entry["hash"]:
+            # 复制而非引用映射视图：写入新索引前必须关闭旧映射（Windows 下映射中的文件无法被替换）
+            entry["arrays"] = _entry_arrays(old, buffer, data_start, copy=True)
+            changed = changed or old["roi"] != entry["roi"] or old["threshold"] != entry["threshold"]
+            reused += 1
+        else:
+            image, mask = load_template_images(path, mask_path)
+            if image is None:
+                continue
+            entry["arrays"] = _template_arrays(matcher.build_template(name, image, mask, path=path))
+            rebuilt += 1
+        entries[name] = entry
+
+    if buffer is not None:
+        buffer.close()
+
+    removed = len(set(old_entries) - set(entries))
+    written = bool(stale or rebuilt or removed or changed)
+    if written:
+        _write_index(index_path, dict(params), entries)
+        logger.info(f"模板索引已更新: {index_path}（沿用 {reused}，重建 {rebuilt}，移除 {removed}）")
+    return {"templates": len(entries), "reused": reused, "rebuilt": rebuilt, "removed": removed, "written": written}
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+模板匹配模块
+加载脚本目录（games/<游戏>/<脚本>/）中由截图工具保存的按钮模板（如 back.png、confirm.png、skip.png），
+预先计算多尺度灰度金字塔，在声明的 ROI 内用 OpenCV 归一化互相关做由粗到精的匹配，
+已知按钮无需调用多模态模型即可直接点击
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Sequence
+
+import cv2
+import numpy as np
+
+from tiled_ocr import crop_roi
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'template_matcher.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('template_matcher')
+
+# 模板目录中的清单文件：{"back": {"roi": [x1, y1, x2, y2], "threshold": 0.9}}，ROI 为归一化坐标
+MANIFEST_FILE = "templates.json"
+# 掩码文件后缀：back_mask.png 为 back.png 的掩码（白色为参与匹配的像素）
+MASK_SUFFIX = "_mask"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def read_image(path: str, flags: int = cv2.IMREAD_UNCHANGED) -> Optional[np.ndarray]:
+    """读取图像文件（cv2.imread 不支持中文路径，改用 imdecode）"""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, flags)
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    """读取模板目录中的清单文件，不存在或格式错误时返回空字典"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"读取模板清单失败 {manifest_path}: {e}")
+        return {}
+
+
+def scan_directory(directory: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    列出目录中的模板文件（不递归）
+
+    Returns:
+        [(模板名, 模板路径, 掩码路径或 None), ...]，按文件名排序
+    """
+    entries = []
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() not in IMAGE_EXTENSIONS or name.endswith(MASK_SUFFIX):
+            continue
+        mask_path = os.path.join(directory, name + MASK_SUFFIX + ext)
+        entries.append((name, os.path.join(directory, filename), mask_path if os.path.exists(mask_path) else None))
+    return entries
+
+
+def load_template_images(path: str, mask_path: Optional[str] = None) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    读取模板图像与掩码
+
+    Returns:
+        (图像, 掩码)，图像无法读取时为 (None, None)；掩码尺寸不一致时忽略
+    """
+    image = read_image(path)
+    if image is None:
+        logger.warning(f"无法读取模板: {path}")
+        return None, None
+    mask = None
+    if mask_path:
+        mask = read_image(mask_path, cv2.IMREAD_GRAYSCALE)
+        if mask is not None and mask.shape[:2] != image.shape[:2]:
+            logger.warning(f"掩码尺寸与模板不一致，已忽略: {mask_path}")
+            mask = None
+    return image, mask
+
+
+def to_gray(image: np.ndarray, color_order: str = "RGB") -> np.ndarray:
+    """转换为单通道灰度图（帧为 RGB，cv2 读入的模板为 BGR）"""
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        code = cv2.COLOR_RGBA2GRAY if color_order == "RGB" else cv2.COLOR_BGRA2GRAY
+    else:
+        code = cv2.COLOR_RGB2GRAY if color_order == "RGB" else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code)
+
+
+def _resize(image: np.ndarray, factor: float, interpolation: int = cv2.INTER_AREA) -> np.ndarray:
+    if factor == 1.0:
+        return image
+    height, width = image.shape[:2]
+    size = (max(1, int(round(width * factor))), max(1, int(round(height * factor))))
+    return cv2.resize(image, size, interpolation=interpolation)
+
+
+class TemplateLevel:
+    """模板在某一尺度下的预计算数据（全分辨率与粗搜索分辨率）"""
+
+    __slots__ = ("scale", "gray", "mask", "coarse_gray", "coarse_mask", "color")
+
+    def __init__(self, scale: float, gray: np.ndarray, mask: Optional[np.ndarray],
+                 coarse_gray: Optional[np.ndarray], coarse_mask: Optional[np.ndarray],
+                 color: Optional[np.ndarray] = None):
+        self.scale = scale
+        self.gray = gray
+        self.mask = mask
+        self.coarse_gray = coarse_gray
+        self.coarse_mask = coarse_mask
+        # 该尺度的 BGR 彩色模板（灰度匹配成功后用于颜色校验，可为 None）
+        self.color = color
+
+
+class Template:
+    """
+    一个按钮模板
+
+    - roi: 归一化搜索区域 (x1, y1, x2, y2)，None 表示整帧
+    - threshold: 匹配得分阈值，None 时使用匹配器的默认值
+    - levels: 按 scales 预计算的金字塔
+    """
+
+    def __init__(self, name: str, gray: np.ndarray, mask: Optional[np.ndarray] = None,
+                 roi: Optional[Tuple[float, float, float, float]] = None, threshold: Optional[float] = None,
+                 path: Optional[str] = None, color: Optional[np.ndarray] = None):
+        self.name = name
+        self.gray = gray
+        self.mask = mask
+        self.color = color
+        self.roi = tuple(roi) if roi else None
+        self.threshold = threshold
+        self.path = path
+        self.levels: List[TemplateLevel] = []
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """原始尺寸 (宽, 高)"""
+        return self.gray.shape[1], self.gray.shape[0]
+
+    def build_levels(self, scales: Sequence[float], coarse_factor: float, min_coarse_size: int = 8):
+        """预计算各尺度的模板与掩码；缩小后过小的层不做粗搜索"""
+        self.levels = []
+        for scale in scales:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            gray = _resize(self.gray, scale, interpolation)
+            mask = _resize(self.mask, scale, cv2.INTER_NEAREST) if self.mask is not None else None
+            color = _resize(self.color, scale, interpolation) if self.color is not None else None
+            coarse_gray = coarse_mask = None
+            if coarse_factor < 1.0 and min(gray.shape[:2]) * coarse_factor >= min_coarse_size:
+                coarse_gray = _resize(gray, coarse_factor)
+                coarse_mask = _resize(mask, coarse_factor, cv2.INTER_NEAREST) if mask is not None else None
+            self.levels.append(TemplateLevel(scale, gray, mask, coarse_gray, coarse_mask, color))
+
+
+class TemplateMatch:
+    """一次匹配结果，坐标为帧内像素坐标"""
+
+    __slots__ = ("name", "x", "y", "score", "scale", "bounds")
+
+    def __init__(self, name: str, x: int, y: int, score: float, scale: float, bounds: Tuple[int, int, int, int]):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.score = score
+        self.scale = scale
+        self.bounds = bounds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "x": self.x,
+            "y": self.y,
+            "score": self.score,
+            "scale": self.scale,
+            "bounds": list(self.bounds)
+        }
+
+
+class TemplateMatcher:
+    """
+    多尺度模板匹配器
+
+    - 每个模板按 scales 预计算金字塔，掩码同步缩放
+    - 先在 coarse_factor 倍缩小的画面上搜索所有尺度，再在全分辨率下只对最佳尺度、最佳位置附近精确匹配
+    - 使用 TM_CCOEFF_NORMED（有掩码时只统计掩码内像素；TM_CCORR_NORMED 在明亮或低对比区域上得分也很高，会误匹配）
+    - 灰度匹配成功后比较掩码内的平均颜色，偏差超过 color_tolerance 判定未匹配（形状相同、颜色不同的按钮，或被遮罩压暗的按钮）
+    - 只在模板声明的 ROI 内搜索
+    - 加载完成后只读，可被多个线程同时调用
+    """
+
+    def __init__(self, scales: Sequence[float] = (0.8, 0.9, 1.0, 1.1, 1.2), threshold: float = 0.85,
+                 coarse_factor: float = 0.5, refine_margin: int = 4, coarse_slack: float = 0.15,
+                 color_tolerance: Optional[float] = 40.0):
+        """
+        Args:
+            scales: 模板缩放尺度（应对窗口分辨率与截图时不同）
+            threshold: 默认匹配得分阈值
+            coarse_factor: 粗搜索时画面与模板的缩小倍数，>= 1 表示不做粗搜索
+            refine_margin: 精确匹配时在粗搜索位置四周额外搜索的像素数
+            coarse_slack: 粗搜索得分低于 threshold - coarse_slack 时直接判定未匹配
+            color_tolerance: 匹配位置与模板的平均颜色允许的最大通道差（0-255），None 表示不做颜色校验
+        """
+        self.scales = tuple(float(s) for s in scales) or (1.0,)
+        self.threshold = threshold
+        self.coarse_factor = coarse_factor
+        self.refine_margin = refine_margin
+        self.coarse_slack = coarse_slack
+        self.color_tolerance = color_tolerance
+        self.templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        self.matches = 0
+        self.hits = 0
+        self.match_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config_manager) -> Optional["TemplateMatcher"]:
+        """按配置 vision.templates.* 创建匹配器并加载模板目录；未启用或目录不存在时返回 None"""
+        if not config_manager.get("vision.templates.enabled", False):
+            return None
+        directory = config_manager.get("vision.templates.directory", "")
+        if directory and not os.path.isabs(directory):
+            directory = os.path.join(config_manager.root_dir, directory)
+        if not directory or not os.path.isdir(directory):
+            logger.warning(f"模板目录不存在，模板快速路径未启用: {directory}")
+            return None
+        matcher = cls(
+            scales=config_manager.get("vision.templates.scales", [0.8, 0.9, 1.0, 1.1, 1.2]),
+            threshold=float(config_manager.get("vision.templates.threshold", 0.85)),
+            coarse_factor=float(config_manager.get("vision.templates.coarse_factor", 0.5)),
+            color_tolerance=config_manager.get("vision.templates.color_tolerance", 40.0)
+        )
+        if config_manager.get("vision.templates.use_index", True):
+            # 增量更新索引后内存映射加载，多个代理进程共享同一份页缓存
+            from template_index import build_index, index_path_for
+            index_path = index_path_for(directory)
+            try:
+                build_index(directory, matcher, index_path)
+                matcher.load_index(index_path)
+                return matcher
+            except Exception as e:
+                logger.warning(f"模板索引不可用，改为逐个加载模板: {e}")
+        matcher.load_directory(directory)
+        return matcher
+
+    @property
+    def names(self) -> List[str]:
+        """已加载的模板名称"""
+        return list(self.templates.keys())
+
+    def build_template(self, name: str, image: np.ndarray, mask: Optional[np.ndarray] = None,
+                       roi: Optional[Sequence[float]] = None, threshold: Optional[float] = None,
+                       color_order: str = "BGR", path: Optional[str] = None) -> Template:
+        """
+        按本匹配器的尺度参数构造模板并预计算金字塔（不加入匹配器）
+
+        Args:
+            image: 模板图像（灰度 / BGR / BGRA，带 alpha 通道且未给出掩码时以 alpha 作为掩码）
+            mask: 掩码，非零像素参与匹配
+            roi: 归一化搜索区域 (x1, y1, x2, y2)
+            threshold: 该模板的得分阈值
+            color_order: image 的通道顺序，cv2 读入的为 BGR
+        """
+        if mask is None and image.ndim == 3 and image.shape[2] == 4 and image[:, :, 3].min() < 255:
+            mask = image[:, :, 3]
+        if mask is not None:
+            mask = to_gray(mask, color_order)
+            mask = np.where(mask > 0, 255, 0).astype(np.uint8)
+        color = None
+        if image.ndim == 3:
+            color = image[:, :, :3]
+            if color_order == "RGB":
+                color = cv2.cvtColor(color, cv2.COLOR_RGB2BGR)
+            color = np.ascontiguousarray(color)
+        template = Template(name, to_gray(image, color_order), mask, roi, threshold, path, color)
+        template.build_levels(self.scales, self.coarse_factor)
+        return template
+
+    def add_template(self, name: str, image: np.ndarray, mask: Optional[np.ndarray] = None,
+                     roi: Optional[Sequence[float]] = None, threshold: Optional[float] = None,
+                     color_order: str = "BGR", path: Optional[str] = None) -> Template:
+        """添加一个模板并预计算金字塔，参数同 build_template"""
+        template = self.build_template(name, image, mask, roi, threshold, color_order, path)
+        with self._lock:
+            self.templates[name] = template
+        return template
+
+    def load_directory(self, directory: str) -> int:
+        """
+        逐个解码并加载目录中的全部模板（不递归）
+
+        Returns:
+            加载的模板数
+        """
+        manifest = read_manifest(directory)
+        count = 0
+        for name, path, mask_path in scan_directory(directory):
+            image, mask = load_template_images(path, mask_path)
+            if image is None:
+                continue
+            options = manifest.get(name, {})
+            self.add_template(name, image, mask, roi=options.get("roi"), threshold=options.get("threshold"), path=path)
+            count += 1
+
+        logger.info(f"已加载 {count} 个模板: {directory}")
+        return count
+
+    def load_index(self, index_path: str) -> int:
+        """
+        从编译好的模板索引加载全部模板（内存映射，不解码 PNG）
+
+        索引的尺度参数与本匹配器不一致时抛出 ValueError
+
+        Returns:
+            加载的模板数
+        """
+        from template_index import load_index
+        header, templates = load_index(index_path)
+        if tuple(header["scales"]) != self.scales or header["coarse_factor"] != self.coarse_factor:
+            raise ValueError(f"模板索引的尺度参数与匹配器不一致: {index_path}")
+        with self._lock:
+            self.templates.update(templates)
+        logger.info(f"已从索引加载 {len(templates)} 个模板: {index_path}")
+        return len(templates)
+
+    def _search(self, region: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]) -> Tuple[float, Tuple[int, int]]:
+        """在 region 中匹配 template，返回 (最高得分, 左上角位置)"""
+        if mask is not None:
+            result = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+        else:
+            result = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+        # 画面或模板区域方差为零（纯色）时会产生 inf / nan，视为不匹配
+        result = np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+        _, score, _, location = cv2.minMaxLoc(result)
+        return float(score), location
+
+    def _color_matches(self, frame: np.ndarray, level: TemplateLevel, left: int, top: int) -> bool:
+        """匹配位置（RGB 帧）与模板（BGR）掩码内的平均颜色是否在 color_tolerance 以内"""
+        if self.color_tolerance is None or level.color is None or frame is None or frame.ndim != 3:
+            return True
+        level_h, level_w = level.gray.shape[:2]
+        patch = np.ascontiguousarray(frame[top:top + level_h, left:left + level_w, :3])
+        if patch.shape[:2] != (level_h, level_w):
+            return True
+        frame_mean = cv2.mean(patch, mask=level.mask)[:3][::-1]
+        template_mean = cv2.mean(level.color, mask=level.mask)[:3]
+        return max(abs(a - b) for a, b in zip(frame_mean, template_mean)) <= self.color_tolerance
+
+    def _match_template(self, gray: np.ndarray, template: Template, threshold: float,
+                        frame: Optional[np.ndarray] = None) -> Optional[TemplateMatch]:
+        height, width = gray.shape[:2]
+        if template.roi:
+            x1, y1, x2, y2 = template.roi
+            region, dx, dy = crop_roi(gray, (x1 * width, y1 * height, x2 * width, y2 * height))
+        else:
+            region, dx, dy = gray, 0, 0
+        region_h, region_w = region.shape[:2]
+
+        # 1. 粗搜索：在缩小的画面上比较所有尺度，取得分最高者
+        coarse_region = None
+        candidate = None
+        for level in template.levels:
+            level_h, level_w = level.gray.shape[:2]
+            if level_w > region_w or level_h > region_h:
+                continue
+            if level.coarse_gray is None:
+                # 模板过小，无法粗搜索：直接在全分辨率下匹配
+                score, location = self._search(region, level.gray, level.mask)
+                if candidate is None or score > candidate[0]:
+                    candidate = (score, level, location, True)
+                continue
+            if coarse_region is None:
+                coarse_region = _resize(region, self.coarse_factor)
+            coarse_h, coarse_w = level.coarse_gray.shape[:2]
+            if coarse_w > coarse_region.shape[1] or coarse_h > coarse_region.shape[0]:
+                continue
+            score, location = self._search(coarse_region, level.coarse_gray, level.coarse_mask)
+            if candidate is None or score > candidate[0]:
+                candidate = (score, level, location, False)
+
+        if candidate is None:
+            return None
+        score, level, location, exact = candidate
+        level_h, level_w = level.gray.shape[:2]
+
+        # 2. 精确匹配：在粗搜索位置附近的全分辨率窗口内重新匹配
+        if not exact:
+            if score < threshold - self.coarse_slack:
+                return None
+            margin = self.refine_margin + int(np.ceil(1.0 / self.coarse_factor))
+            cx = int(location[0] / self.coarse_factor)
+            cy = int(location[1] / self.coarse_factor)
+            wx1, wy1 = max(0, cx - margin), max(0, cy - margin)
+            wx2, wy2 = min(region_w, cx + level_w + margin), min(region_h, cy + level_h + margin)
+            if wx2 - wx1 < level_w or wy2 - wy1 < level_h:
+                return None
+            score, (lx, ly) = self._search(region[wy1:wy2, wx1:wx2], level.gray, level.mask)
+            location = (wx1 + lx, wy1 + ly)
+
+        if score < threshold:
+            return None
+        left, top = dx + location[0], dy + location[1]
+        if not self._color_matches(frame, level, left, top):
+            return None
+        bounds = (left, top, left + level_w, top + level_h)
+        return TemplateMatch(template.name, left + level_w // 2, top + level_h // 2, score, level.scale, bounds)
+
+    def match(self, frame: np.ndarray, name: str, gray: Optional[np.ndarray] = None) -> Optional[TemplateMatch]:
+        """
+        在帧中查找指定模板
+
+        Args:
+            frame: RGB 帧
+            name: 模板名称
+            gray: 已转换的灰度帧（多次匹配时复用）
+        """
+        template = self.templates.get(name)
+        if template is None:
+            return None
+        if gray is None:
+            gray = to_gray(frame)
+        start = time.perf_counter()
+        threshold = template.threshold if template.threshold is not None else self.threshold
+        found = self._match_template(gray, template, threshold, frame)
+        with self._lock:
+            self.matches += 1
+            self.hits += 1 if found else 0
+            self.match_seconds += time.perf_counter() - start
+        return found
+
+    def match_any(self, frame: np.ndarray, names: Optional[Sequence[str]] = None) -> Optional[TemplateMatch]:
+        """
+        按 names 的优先级顺序查找，返回第一个匹配的模板
+
+        Args:
+            names: 候选模板名称，None 表示全部已加载的模板，空列表不匹配任何模板
+        """
+        gray = to_gray(frame)
+        for name in (names if names is not None else self.names):
+            found = self.match(frame, name, gray)
+            if found:
+                return found
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取匹配统计"""
+        with self._lock:
+            return {
+                "templates": len(self.templates),
+                "matches": self.matches,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.matches if self.matches else 0.0,
+                "average_ms": self.match_seconds / self.matches * 1000 if self.matches else 0.0
+            }
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+多窗口编排测试脚本
+用不截图、不调用模型的假代理驱动 AgentOrchestrator 的推理线程池，
+验证公平轮转、同一窗口同时只有一帧在推理、连续出错后停止窗口
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_pipeline import FramePacket, LatestFrameSlot
+from loop_scheduler import AdaptiveScheduler
+from agent_orchestrator import AgentOrchestrator, WindowEntry, WindowState
+
+
+class FakeDetector:
+    def reset(self):
+        pass
+
+
+class FakeBrain:
+    def flush_cache(self):
+        pass
+
+
+class FakeAgent:
+    """
+    代替 SmartAgent：启动时放入一帧，每处理完一帧立即放入下一帧（截图阶段总有新帧），
+    直到全体代理合计处理了 budget 帧
+    """
+
+    def __init__(self, name, log, budget, duration=0.002, fail=False):
+        self.name = name
+        self.log = log
+        self.budget = budget
+        self.duration = duration
+        self.fail = fail
+        self.running = False
+        self.frame_slot = LatestFrameSlot()
+        self.scheduler = AdaptiveScheduler()
+        self.change_detector = FakeDetector()
+        self.ai_brain = FakeBrain()
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _put_frame(self):
+        self._seq += 1
+        self.frame_slot.put(FramePacket(self._seq, None, "", time.time()))
+
+    def start_capture(self):
+        self._put_frame()
+        return None
+
+    def process_packet(self, packet):
+        with self._lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(self.duration)
+            if self.fail:
+                raise RuntimeError("模拟推理失败")
+            with self.log["lock"]:
+                self.log["served"].append(self.name)
+                more = len(self.log["served"]) < self.budget
+            if more:
+                self._put_frame()
+            return {"action_type": "click"}
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+def make_orchestrator(names, max_workers, budget=60, **agent_kwargs):
+    orchestrator = AgentOrchestrator(max_workers=max_workers)
+    log = {"lock": threading.Lock(), "served": []}
+    for name in names:
+        agent = FakeAgent(name, log, budget, **agent_kwargs)
+        entry = WindowEntry(name, agent)
+        # 与 add_window 相同的接线：新帧放入时通知编排器
+        agent.frame_slot.on_put = lambda slot, entry=entry: orchestrator._on_frame_ready(entry)
+        orchestrator.windows[name] = entry
+    return orchestrator, log
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_round_robin_with_one_worker():
+    """一个推理线程、所有窗口都有待推理帧时，严格按最久未服务轮转"""
+    names = ["a", "b", "c"]
+    orchestrator, log = make_orchestrator(names, max_workers=1, budget=30)
+    orchestrator.start()
+    try:
+        assert wait_until(lambda: len(log["served"]) >= 30)
+    finally:
+        orchestrator.stop()
+    served = log["served"][:30]
+    for i in range(0, 30, 3):
+        assert sorted(served[i:i + 3]) == names, served
+    # 达到预算时其他窗口已排队的帧仍会被处理，各窗口服务次数最多相差 1
+    stats = orchestrator.get_stats()["windows"]
+    counts = [stats[name]["served"] for name in names]
+    assert max(counts) - min(counts) <= 1, counts
+    assert all(stats[name]["actions"] == stats[name]["served"] for name in names)
+
+
+def test_one_frame_per_window_in_flight():
+    """推理线程多于窗口时，同一窗口仍然同时只有一帧在推理，且各窗口都被服务"""
+    orchestrator, log = make_orchestrator(["a", "b"], max_workers=4, budget=80)
+    orchestrator.start()
+    try:
+        assert wait_until(lambda: len(log["served"]) >= 80)
+    finally:
+        orchestrator.stop()
+    for entry in orchestrator.windows.values():
+        assert entry.agent.max_inflight == 1
+        assert entry.served_count >= 20
+        assert entry.state == WindowState.STOPPED
+
+
+def test_stops_window_after_consecutive_errors():
+    orchestrator, log = make_orchestrator(["broken"], max_workers=1, fail=True)
+    orchestrator.max_consecutive_errors = 3
+    entry = orchestrator.windows["broken"]
+    # 出错后截图阶段继续放帧
+    entry.agent.process_packet = lambda packet, original=entry.agent.process_packet: (
+        entry.agent._put_frame(), original(packet))
+    orchestrator.start()
+    try:
+        assert wait_until(lambda: entry.state == WindowState.STOPPED)
+    finally:
+        orchestrator.stop()
+    assert entry.error_count == 3
+    assert not entry.agent.running
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
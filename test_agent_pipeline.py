@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+代理流水线测试脚本
+验证 LatestFrameSlot 的替换旧帧、阻塞交接、过期丢弃，以及生产者/消费者并发时帧序号单调递增
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_pipeline import FramePacket, LatestFrameSlot
+
+
+def make_packet(seq, captured_at=None):
+    return FramePacket(seq, None, f"frame-{seq}", time.time() if captured_at is None else captured_at)
+
+
+def test_put_replaces_unconsumed():
+    """未被取走的旧帧被新帧替换，消费者只拿到最新帧"""
+    notified = []
+    slot = LatestFrameSlot(on_put=notified.append)
+    slot.put(make_packet(1))
+    slot.put(make_packet(2))
+    assert slot.get(timeout=0).seq == 2
+    assert slot.get(timeout=0) is None
+    assert (slot.put_count, slot.replaced_count) == (2, 1)
+    assert notified == [slot, slot]
+
+
+def test_get_waits_for_producer():
+    slot = LatestFrameSlot()
+    threading.Timer(0.05, slot.put, args=(make_packet(7),)).start()
+    start = time.perf_counter()
+    packet = slot.get(timeout=2.0)
+    assert packet is not None and packet.seq == 7
+    assert time.perf_counter() - start < 1.0
+
+
+def test_wait_consumed():
+    """生产者等到消费者取走后返回 True，超时仍未取走返回 False"""
+    slot = LatestFrameSlot()
+    slot.put(make_packet(1))
+    assert not slot.wait_consumed(timeout=0.01)
+    threading.Timer(0.05, slot.get).start()
+    assert slot.wait_consumed(timeout=2.0)
+    assert not slot.has_packet()
+
+
+def test_discard_before():
+    """只丢弃截图时间早于给定时刻的帧，并唤醒等待中的生产者"""
+    slot = LatestFrameSlot()
+    now = time.time()
+    slot.put(make_packet(1, now))
+    assert not slot.discard_before(now - 1)
+    assert slot.has_packet()
+
+    threading.Timer(0.05, slot.discard_before, args=(now + 1,)).start()
+    assert slot.wait_consumed(timeout=2.0)
+    assert slot.stale_count == 1
+    assert slot.get(timeout=0) is None
+
+
+def test_packet_age():
+    packet = make_packet(1, time.time() - 2.0)
+    assert 2.0 <= packet.age < 3.0
+
+
+def test_concurrent_handoff():
+    """生产者连续放帧、消费者慢速取帧：取到的帧序号严格递增，取到的 + 被替换的 = 放入的"""
+    slot = LatestFrameSlot()
+    total = 500
+    received = []
+
+    def consume():
+        while True:
+            packet = slot.get(timeout=1.0)
+            if packet is None:
+                return
+            received.append(packet.seq)
+            if packet.seq == total:
+                return
+            time.sleep(0.0005)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for seq in range(1, total + 1):
+        slot.put(make_packet(seq))
+    consumer.join(timeout=10)
+    assert not consumer.is_alive()
+    assert received == sorted(set(received))
+    assert received[-1] == total
+    assert len(received) + slot.replaced_count == slot.put_count == total
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+异步 AI 大脑测试脚本
+对本地模拟服务（tools/mock_openai_server.py）验证 AsyncAIBrain 的并发上限、超时、取消、
+按窗口分组的短期记忆，以及客户端在同一事件循环内复用、换事件循环后重建
+"""
+
+import sys
+import os
+import io
+import time
+import base64
+import asyncio
+import threading
+
+# 添加当前目录与 tools 目录到 Python 路径
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from PIL import Image
+
+from mock_openai_server import create_server
+from async_ai_brain import AsyncAIBrain
+
+
+def make_image_base64():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 36), (40, 80, 120)).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+IMAGE = make_image_base64()
+
+
+class MockServer:
+    """在后台线程中运行模拟服务"""
+
+    def __init__(self, delay=0.0):
+        self.server = create_server(port=0, delay=delay)
+        self.state = self.server.RequestHandlerClass.state
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def make_brain(server, max_concurrency=2, request_timeout=5.0):
+    brain = AsyncAIBrain(max_concurrency=max_concurrency, request_timeout=request_timeout, base_url=server.base_url)
+    brain.api_key = "test-key"
+    return brain
+
+
+def request(history_key="default", **kwargs):
+    return dict(image_base64=IMAGE, history_key=history_key, use_cache=False, **kwargs)
+
+
+def test_concurrency_limit():
+    """6 个请求、并发上限 2：服务端同时在途不超过 2，总耗时约 3 轮延迟"""
+    with MockServer(delay=0.2) as server:
+        brain = make_brain(server, max_concurrency=2)
+
+        async def run():
+            start = time.perf_counter()
+            results = await brain.analyze_many([request(f"window-{i}") for i in range(6)])
+            elapsed = time.perf_counter() - start
+            await brain.aclose()
+            return results, elapsed
+
+        results, elapsed = asyncio.run(run())
+    assert all(result["success"] for result in results), results
+    assert all(result["data"]["action"] == "click" for result in results)
+    assert server.state.max_in_flight == 2
+    assert 0.6 <= elapsed < 3.0, elapsed
+    assert brain.in_flight == 0
+
+
+def test_timeout():
+    with MockServer(delay=1.0) as server:
+        brain = make_brain(server)
+
+        async def run():
+            result = await brain.analyze(**request(timeout=0.1))
+            await brain.aclose()
+            return result
+
+        result = asyncio.run(run())
+    assert not result["success"]
+    assert "超时" in result["error"]
+    assert brain.in_flight == 0
+
+
+def test_cancel():
+    """取消的任务抛出 CancelledError，在途计数与客户端引用计数恢复"""
+    with MockServer(delay=1.0) as server:
+        brain = make_brain(server)
+
+        async def run():
+            task = asyncio.ensure_future(brain.analyze(**request()))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                cancelled = True
+            else:
+                cancelled = False
+            await brain.aclose()
+            return cancelled
+
+        assert asyncio.run(run())
+    assert brain.in_flight == 0
+    assert not brain._client_users
+
+
+def test_history_per_key():
+    with MockServer() as server:
+        brain = make_brain(server)
+
+        async def run():
+            await brain.analyze(**request("a"))
+            await brain.analyze(**request("a"))
+            await brain.analyze(**request("b"))
+            await brain.aclose()
+
+        asyncio.run(run())
+    assert brain.get_history_count("a") == 2
+    assert brain.get_history_count("b") == 1
+    brain.clear_history("a")
+    assert brain.get_history_count("a") == 0 and brain.get_history_count("b") == 1
+
+
+def test_client_reused_within_loop_and_rebuilt_across_loops():
+    """同一事件循环内只创建一个客户端；再次 asyncio.run 时旧客户端作废并重建"""
+    with MockServer() as server:
+        brain = make_brain(server)
+        created = []
+        original = brain._create_client
+
+        def counting_create():
+            client = original()
+            created.append(client)
+            return client
+
+        brain._create_client = counting_create
+
+        async def run():
+            results = await brain.analyze_many([request(f"window-{i}") for i in range(4)])
+            return all(result["success"] for result in results)
+
+        assert asyncio.run(run())
+        assert len(created) == 1
+        assert asyncio.run(run())
+        assert len(created) == 2
+        assert brain._semaphore_loop is not None
+
+        asyncio.run(brain.aclose())
+    assert server.state.request_count == 8
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
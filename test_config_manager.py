@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+配置管理测试脚本
+用临时配置文件验证 _ConfigStore 的按文件变化重新加载、检查节流、写到一半的文件保留上次配置、
+环境变量覆盖、订阅回调在监视线程中派发，以及 ConfigManager 原子写入与 set_many 单次通知
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config_manager import ConfigManager, _ConfigStore
+
+DEFAULTS = {"ai": {"model": "default-model", "temperature": 0.7}, "agent": {"interval": 1.0}}
+
+
+def write_config(path, data):
+    """写入配置并把 mtime 推后，保证同一时钟刻度内的连续写入也能被发现"""
+    stat = os.stat(path) if os.path.exists(path) else None
+    with open(path, "w", encoding="utf-8") as f:
+        if isinstance(data, str):
+            f.write(data)
+        else:
+            json.dump(data, f)
+    if stat is not None:
+        os.utime(path, ns=(stat.st_atime_ns, max(os.stat(path).st_mtime_ns, stat.st_mtime_ns + 1_000_000)))
+
+
+def make_config(model="model-a", temperature=0.5, interval=1.0):
+    return {"ai": {"model": model, "temperature": temperature}, "agent": {"interval": interval}}
+
+
+def make_manager(directory):
+    """指向临时目录的 ConfigManager（不读写项目的 user_data）"""
+    manager = ConfigManager.__new__(ConfigManager)
+    manager.root_dir = directory
+    manager.user_data_dir = directory
+    manager.config_path = os.path.join(directory, "config.json")
+    manager.default_config = DEFAULTS
+    manager._ensure_config_exists()
+    manager._store = _ConfigStore(manager.config_path, manager.default_config, check_interval=0.0)
+    return manager
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_reloads_when_file_changes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=0.0)
+        assert store.get("ai.model") == "model-a"
+        assert store.get("ai.missing", "fallback") == "fallback"
+        assert not store.refresh()
+
+        write_config(path, make_config(model="model-b"))
+        assert store.get("ai.model") == "model-b"
+        assert store.reloads == 2
+
+
+def test_missing_file_uses_defaults():
+    with tempfile.TemporaryDirectory() as directory:
+        store = _ConfigStore(os.path.join(directory, "config.json"), DEFAULTS)
+        assert store.get("ai.model") == "default-model"
+        snapshot = store.snapshot()
+        snapshot["ai"]["model"] = "changed"
+        assert store.get("ai.model") == "default-model"
+        assert DEFAULTS["ai"]["model"] == "default-model"
+
+
+def test_check_interval_throttles_stat():
+    """检查间隔内不重新检查文件，reload(force) 立即生效"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=60.0)
+        assert store.get("ai.model") == "model-a"
+        write_config(path, make_config(model="model-b"))
+        assert store.get("ai.model") == "model-a"
+        assert store.refresh(force=True)
+        assert store.get("ai.model") == "model-b"
+
+
+def test_keeps_last_good_config_on_parse_error():
+    """写到一半的文件不替换已加载的配置，同一损坏文件不反复解析，文件修好后重新加载"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=0.0)
+        assert store.get("ai.model") == "model-a"
+
+        write_config(path, '{"ai": {"model": "model-b"')
+        assert not store.refresh()
+        assert store.get("ai.model") == "model-a"
+        reads = []
+        original_read = store._read
+        store._read = lambda: reads.append(1) or original_read()
+        assert not store.refresh()
+        assert not reads
+
+        write_config(path, make_config(model="model-c"))
+        assert store.refresh()
+        assert store.get("ai.model") == "model-c"
+
+
+def test_parse_error_before_first_load_uses_defaults():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, "{broken")
+        store = _ConfigStore(path, DEFAULTS, check_interval=0.0)
+        assert store.get("ai.model") == "default-model"
+        write_config(path, make_config())
+        assert store.get("ai.model") == "model-a"
+
+
+def test_environment_override():
+    """环境变量优先于配置文件，结果按键缓存，重新加载时重新读取环境变量"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=60.0)
+        os.environ["AI_MODEL"] = "model-env"
+        try:
+            assert store.get("ai.model") == "model-env"
+            del os.environ["AI_MODEL"]
+            assert store.get("ai.model") == "model-env"
+            store.refresh(force=True)
+            assert store.get("ai.model") == "model-a"
+        finally:
+            os.environ.pop("AI_MODEL", None)
+
+
+def test_subscribers_notified_on_watcher_thread():
+    """外部编辑与其他线程发现的变化都在监视线程中派发，且只把前缀下的键交给订阅者"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=0.05)
+        store.get("ai.model")
+        calls = []
+        store.subscribe(lambda keys: calls.append(("all", keys, threading.current_thread().name)))
+        store.subscribe(lambda keys: calls.append(("agent", keys, threading.current_thread().name)), prefix="agent")
+
+        write_config(path, make_config(model="model-b", temperature=0.9))
+        assert wait_until(lambda: calls)
+        assert calls == [("all", ["ai.model", "ai.temperature"], "config-watcher")]
+
+        # 在主线程中由 get 发现变化，回调仍在监视线程中执行
+        calls.clear()
+        store.check_interval = 60.0
+        write_config(path, make_config(model="model-b", temperature=0.9, interval=2.0))
+        store.refresh(force=True)
+        assert wait_until(lambda: len(calls) == 2)
+        assert sorted(calls) == [("agent", ["agent.interval"], "config-watcher"),
+                                 ("all", ["agent.interval"], "config-watcher")]
+
+
+def test_bound_method_subscriber_is_weak():
+    """订阅的绑定方法只保存弱引用，对象被回收后自动退订，监视线程随之退出"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, make_config())
+        store = _ConfigStore(path, DEFAULTS, check_interval=0.02)
+
+        class Listener:
+            def on_change(self, keys):
+                pass
+
+        listener = Listener()
+        store.subscribe(listener.on_change)
+        watcher = store._watcher
+        assert watcher.is_alive()
+        del listener
+        watcher.join(timeout=2.0)
+        assert not watcher.is_alive()
+        assert not store._subscribers
+
+
+def test_set_many_writes_once_and_notifies_once():
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory)
+        assert manager.get("ai.model") == "default-model"
+        calls = []
+        manager.subscribe(calls.append)
+        assert manager.set_many({"ai.model": "model-x", "agent.interval": 0.5, "new.section.value": 1})
+        assert wait_until(lambda: calls)
+        time.sleep(0.1)
+        assert calls == [["agent.interval", "ai.model", "new.section.value"]]
+        assert manager.get("new.section.value") == 1
+
+        with open(manager.config_path, "r", encoding="utf-8") as f:
+            assert json.load(f)["ai"]["model"] == "model-x"
+        # 临时文件已被替换或清理
+        assert os.listdir(directory) == ["config.json"]
+        manager.unsubscribe(calls.append)
+
+
+def test_readers_never_see_partial_writes():
+    """一个线程反复保存配置时，其他线程读到的总是某一次完整写入的值"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = make_manager(directory)
+        reader_store = _ConfigStore(manager.config_path, DEFAULTS, check_interval=0.0)
+        written = {"default-model"}
+        seen = set()
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                seen.add(reader_store.get("ai.model"))
+
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        for thread in readers:
+            thread.start()
+        try:
+            for i in range(100):
+                model = f"model-{i}-" + "x" * (i * 37 % 500)
+                written.add(model)
+                assert manager.set("ai.model", model)
+        finally:
+            stop.set()
+            for thread in readers:
+                thread.join()
+        assert seen <= written, seen - written
+        assert reader_store.get("ai.model") == f"model-99-" + "x" * (99 * 37 % 500)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+帧差门控测试脚本
+验证 FrameChangeDetector 的阈值、屏蔽区域、静止超时强制分析与感知哈希
+"""
+
+import sys
+import os
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from frame_diff import FrameChangeDetector, dhash, hamming_distance
+
+
+def make_frame(value=0, width=160, height=90):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_threshold():
+    """平均亮度差不超过阈值视为未变化，超过时放行并成为新的参考帧"""
+    detector = FrameChangeDetector(method="luma", threshold=2.0, max_static_seconds=0)
+    assert detector.has_changed(make_frame(0))
+    assert not detector.has_changed(make_frame(0))
+    assert not detector.has_changed(make_frame(1))
+    assert detector.has_changed(make_frame(10))
+    # 参考帧已更新为亮度 10
+    assert not detector.has_changed(make_frame(11))
+    assert detector.get_stats()["skipped"] == 3
+
+
+def test_masks():
+    """屏蔽区域内的变化被忽略，区域外的变化仍会放行"""
+    detector = FrameChangeDetector(method="luma", threshold=2.0, masks=[(0.0, 0.0, 0.5, 1.0)], max_static_seconds=0)
+    assert detector.has_changed(make_frame(0))
+    left = make_frame(0)
+    left[:, :80] = 255
+    assert not detector.has_changed(left)
+    right = make_frame(0)
+    right[:, 80:] = 255
+    assert detector.has_changed(right)
+
+
+def test_forced_after_static_timeout():
+    """画面静止超过 max_static_seconds 时强制放行一次，并标记为强制"""
+    detector = FrameChangeDetector(method="luma", threshold=2.0, max_static_seconds=30.0)
+    assert detector.has_changed(make_frame(0))
+    assert not detector.last_forced
+    assert not detector.has_changed(make_frame(0))
+    detector._reference_time -= 31.0
+    assert detector.has_changed(make_frame(0))
+    assert detector.last_forced
+    # 强制放行后重新计时
+    assert not detector.has_changed(make_frame(0))
+    assert not detector.last_forced
+
+
+def test_reset():
+    """reset 之后的下一帧必定放行"""
+    detector = FrameChangeDetector(max_static_seconds=0)
+    assert detector.has_changed(make_frame(0))
+    detector.reset()
+    assert detector.has_changed(make_frame(0))
+
+
+def test_dhash():
+    """相同画面哈希相同，亮度梯度反向时汉明距离最大"""
+    gradient = np.tile(np.linspace(0, 255, 160, dtype=np.uint8)[None, :, None], (90, 1, 3))
+    assert hamming_distance(dhash(gradient), dhash(gradient.copy())) == 0
+    assert hamming_distance(dhash(gradient), dhash(gradient[:, ::-1].copy())) == 64
+
+    detector = FrameChangeDetector(method="dhash", threshold=4, max_static_seconds=0)
+    assert detector.has_changed(gradient)
+    assert not detector.has_changed(np.clip(gradient.astype(np.int16) + 5, 0, 255).astype(np.uint8))
+    assert detector.has_changed(gradient[:, ::-1].copy())
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
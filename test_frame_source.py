@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+帧源测试脚本
+验证 ReplayFrameSource 的顺序回放、循环、限速、预加载，GameWindow 外部帧源与 RGB 转换缓冲区的复用
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+
+from frame_source import ReplayFrameSource, RGBBufferRing, create_frame_source
+from game_window import GameWindow
+
+
+def make_recording(directory, count=3):
+    """写入 count 帧 .npy 录制，第 i 帧所有像素为 i"""
+    for i in range(count):
+        np.save(os.path.join(directory, f"frame_{i:06d}.npy"), np.full((4, 6, 3), i, dtype=np.uint8))
+    # 非帧文件被忽略
+    with open(os.path.join(directory, "notes.txt"), "w", encoding="utf-8") as f:
+        f.write("not a frame")
+
+
+def test_plays_in_order_and_loops():
+    with tempfile.TemporaryDirectory() as directory:
+        make_recording(directory)
+        source = ReplayFrameSource(directory)
+        assert len(source) == 3
+        assert [int(source.grab()[0, 0, 0]) for _ in range(5)] == [0, 1, 2, 0, 1]
+        assert source.grab().shape == (4, 6, 3)
+
+
+def test_stops_without_loop_and_reset():
+    with tempfile.TemporaryDirectory() as directory:
+        make_recording(directory)
+        source = ReplayFrameSource(directory, loop=False)
+        assert [int(source.grab()[0, 0, 0]) for _ in range(3)] == [0, 1, 2]
+        assert source.grab() is None
+        source.reset()
+        assert int(source.grab()[0, 0, 0]) == 0
+
+
+def test_preload_matches_disk():
+    with tempfile.TemporaryDirectory() as directory:
+        make_recording(directory)
+        from_disk = ReplayFrameSource(directory)
+        preloaded = ReplayFrameSource(directory, preload=True)
+        for _ in range(3):
+            assert np.array_equal(from_disk.grab(), preloaded.grab())
+
+
+def test_fps_throttle():
+    """限速时相邻两帧的间隔不小于 1 / fps"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_recording(directory)
+        source = ReplayFrameSource(directory, fps=50)
+        source.grab()
+        start = time.perf_counter()
+        for _ in range(4):
+            source.grab()
+        assert time.perf_counter() - start >= 4 / 50 - 0.005
+
+
+def test_invalid_paths():
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            ReplayFrameSource(directory)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("空目录应抛出 ValueError")
+        try:
+            ReplayFrameSource(os.path.join(directory, "missing"))
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError("不存在的路径应抛出 FileNotFoundError")
+
+
+def test_game_window_uses_frame_source():
+    """GameWindow 设置外部帧源后 snapshot 直接取帧，不需要窗口句柄"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_recording(directory)
+        window = GameWindow(frame_source=create_frame_source("replay", path=directory))
+        assert window.hwnd is None
+        assert int(window.snapshot()[0, 0, 0]) == 0
+        assert int(window.snapshot()[0, 0, 0]) == 1
+    try:
+        create_frame_source("unknown")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的帧源类型应抛出 ValueError")
+
+
+def make_bgra(blue, width=6, height=4):
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    frame[:] = (blue, 10, 20, 255)
+    return frame
+
+
+def test_rgb_ring_lifetime():
+    """返回的帧在之后 count - 1 次转换内保持不变，第 count 次转换时被复用覆盖"""
+    ring = RGBBufferRing(3)
+    frames = [ring.convert(make_bgra(i), cv2.COLOR_BGRA2RGB) for i in range(3)]
+    assert not any(np.shares_memory(a, b) for a, b in ((frames[0], frames[1]), (frames[1], frames[2]), (frames[0], frames[2])))
+    assert [tuple(frame[0, 0]) for frame in frames] == [(20, 10, 0), (20, 10, 1), (20, 10, 2)]
+
+    held = frames[0].copy()
+    fourth = ring.convert(make_bgra(3), cv2.COLOR_BGRA2RGB)
+    assert np.shares_memory(fourth, frames[0])
+    assert tuple(frames[0][0, 0]) == (20, 10, 3)
+    # 调用方复制的帧不受影响
+    assert tuple(held[0, 0]) == (20, 10, 0)
+    assert ring.allocations == 1
+
+
+def test_rgb_ring_reallocates_on_resize():
+    ring = RGBBufferRing(2)
+    ring.convert(make_bgra(0), cv2.COLOR_BGRA2RGB)
+    resized = ring.convert(make_bgra(1, width=8), cv2.COLOR_BGRA2RGB)
+    assert resized.shape == (4, 8, 3)
+    assert ring.allocations == 2
+    ring.clear()
+    assert ring.convert(make_bgra(2, width=8), cv2.COLOR_BGRA2RGB).shape == (4, 8, 3)
+    assert ring.allocations == 3
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
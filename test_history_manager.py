@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+历史压缩测试脚本
+验证 HistoryManager 的 token 估算、压缩策略与按预算从最旧轮次降级
+"""
+
+import sys
+import os
+import io
+import json
+import base64
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from history_manager import HistoryManager, estimate_text_tokens, estimate_image_tokens
+
+
+def make_image_base64(width=640, height=360):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 80, 120)).save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def make_history(count=3):
+    image_base64 = make_image_base64()
+    response = json.dumps({"action": "click", "target": [0.5, 0.5], "thought": "点击确认按钮"}, ensure_ascii=False)
+    return [{"image_base64": image_base64, "ai_response": response} for _ in range(count)]
+
+
+def test_text_token_estimate():
+    """中文约 1 token/字，ASCII 约 4 字符/token"""
+    assert estimate_text_tokens("") == 0
+    assert estimate_text_tokens("abcd") == 1
+    assert estimate_text_tokens("abcde") == 2
+    assert estimate_text_tokens("中文abcde") == 4
+
+
+def test_image_token_estimate():
+    """按 28x28 像素块计数，另加固定开销"""
+    assert estimate_image_tokens(28, 28) == 1 + 4
+    assert estimate_image_tokens(640, 360) == 23 * 13 + 4
+
+    manager = HistoryManager()
+    message = {"role": "user", "content": [
+        {"type": "text", "text": "abcd"},
+        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{make_image_base64()}"}}
+    ]}
+    tokens, size = manager.estimate([message])
+    assert tokens == 4 + 1 + estimate_image_tokens(640, 360)
+    assert size == 4 + len(message["content"][1]["image_url"]["url"])
+
+
+def test_hybrid_strategy():
+    """hybrid: 最近一轮为缩略图，更早的轮次为文本摘要"""
+    manager = HistoryManager(strategy="hybrid", thumbnail_size=320)
+    messages = manager.format(make_history(3))
+    assert len(messages) == 6
+    assert isinstance(messages[0]["content"], str) and isinstance(messages[2]["content"], str)
+    assert messages[1]["content"].startswith("动作: click")
+    image_part = messages[4]["content"][1]
+    assert image_part["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    # 640x360 缩小到最长边 320
+    assert manager.estimate([messages[4]])[0] == 4 + estimate_text_tokens("[历史] 请分析游戏画面。") + estimate_image_tokens(320, 180)
+
+
+def test_budget_drops_oldest_first():
+    """超出预算时从最旧的轮次开始降级，最新的轮次保留"""
+    history = make_history(3)
+    manager = HistoryManager(strategy="text", token_budget=0)
+    turn_cost = manager.estimate(manager.format(history[-1:]))[0]
+    reserved = 500
+
+    manager.token_budget = reserved + 3 * turn_cost
+    assert len(manager.format(history, reserved)) == 6
+
+    manager.token_budget = reserved + 2 * turn_cost
+    assert manager.format(history, reserved) == manager.format(history[1:], reserved)
+
+    manager.token_budget = reserved + turn_cost
+    assert manager.format(history, reserved) == manager.format(history[-1:], reserved)
+
+    # 预算连当前请求都放不下时，历史全部丢弃
+    manager.token_budget = reserved
+    assert manager.format(history, reserved) == []
+
+
+def test_budget_downgrades_full_to_thumbnail():
+    """full 策略超出预算时先把旧轮次降级为缩略图"""
+    history = make_history(2)
+    manager = HistoryManager(strategy="full", token_budget=0)
+    full = manager.format(history)
+    full_cost = manager.estimate(full)[0]
+
+    manager.token_budget = full_cost - 1
+    messages = manager.format(history)
+    assert manager.estimate(messages)[0] <= manager.token_budget
+    # 旧轮次为缩略图，最新一轮仍为原图
+    assert messages[0]["content"][1]["image_url"]["url"] != full[0]["content"][1]["image_url"]["url"]
+    assert messages[2] == full[2]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+延迟直方图测试脚本
+验证 LatencyHistogram 的百分位精度、边界值、合并与快照清零
+"""
+
+import sys
+import os
+import math
+import random
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from latency_histogram import LatencyHistogram, merge_histograms
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(1, int(math.ceil(len(ordered) * q / 100.0))) - 1]
+
+
+def test_empty():
+    histogram = LatencyHistogram()
+    assert histogram.count == 0
+    assert histogram.percentile(50) == 0.0
+    assert histogram.mean == 0.0
+
+
+def test_percentiles_within_precision():
+    """百分位与精确值的相对误差不超过 precision"""
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-2.0, 1.0) for _ in range(20000)]
+    histogram = LatencyHistogram(precision=0.02)
+    for value in values:
+        histogram.record(value)
+    for q in (50, 90, 99, 99.9):
+        exact = exact_percentile(values, q)
+        assert abs(histogram.percentile(q) - exact) / exact <= 0.02, q
+    assert histogram.percentile(100) == max(values)
+    assert histogram.max == max(values)
+    assert abs(histogram.mean - sum(values) / len(values)) < 1e-9
+
+
+def test_out_of_range_values():
+    """超出可分辨范围的值计入首/末桶，百分位不超出实际观测范围"""
+    histogram = LatencyHistogram(min_value=1e-3, max_value=1.0)
+    histogram.record(1e-6)
+    assert histogram.percentile(50) == 1e-6
+    histogram.record(50.0)
+    # 末桶没有代表值，取观测到的最大值
+    assert histogram.percentile(99) == 50.0
+    assert histogram.percentile(100) == 50.0
+    assert histogram.min == 1e-6 and histogram.max == 50.0
+    histogram.record(-1.0)
+    assert histogram.min == 0.0
+
+
+def test_merge():
+    """合并后的计数与分位数等同于把全部样本记入一个直方图"""
+    a, b, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 501):
+        a.record(i / 1000.0)
+        combined.record(i / 1000.0)
+    for i in range(501, 1001):
+        b.record(i / 1000.0, count=2)
+        combined.record(i / 1000.0, count=2)
+    merged = merge_histograms([a, b])
+    assert merged.count == combined.count == 1500
+    assert abs(merged.total - combined.total) < 1e-9
+    for q in (50, 90, 99):
+        assert merged.percentile(q) == combined.percentile(q)
+    # 合并不修改输入
+    assert a.count == 500 and b.count == 1000
+    assert merge_histograms([]) is None
+
+    try:
+        a.merge(LatencyHistogram(precision=0.05))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("布局不同的直方图不应允许合并")
+
+
+def test_cumulative_buckets():
+    """只列出非空桶，累计计数递增，末尾为 (+Inf, count)；同布局的桶边界一致"""
+    histogram = LatencyHistogram(min_value=1e-3, max_value=1.0)
+    for value in (0.01, 0.01, 0.2, 5.0):
+        histogram.record(value)
+    buckets = histogram.cumulative_buckets()
+    assert [count for _, count in buckets] == [2, 3, 4]
+    assert buckets[-1][0] == math.inf
+    assert 0.01 <= buckets[0][0] <= 0.01 * 1.02
+    other = LatencyHistogram(min_value=1e-3, max_value=1.0)
+    other.record(0.2)
+    assert other.cumulative_buckets()[0][0] == buckets[1][0]
+    assert LatencyHistogram().cumulative_buckets() == [(math.inf, 0)]
+
+
+def test_snapshot_reset():
+    """snapshot(reset=True) 返回当前状态并清零"""
+    histogram = LatencyHistogram()
+    histogram.record(0.25)
+    snapshot = histogram.snapshot(reset=True)
+    assert snapshot.count == 1 and snapshot.max == 0.25
+    assert histogram.count == 0 and histogram.percentile(50) == 0.0
+
+
+def test_invalid_layout():
+    for kwargs in ({"min_value": 0}, {"min_value": 1.0, "max_value": 0.5}, {"precision": 0}):
+        try:
+            LatencyHistogram(**kwargs)
+        except ValueError:
+            continue
+        raise AssertionError(f"应拒绝参数 {kwargs}")
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
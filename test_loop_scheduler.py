@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+自适应调度器测试脚本
+验证 AdaptiveScheduler 的点击连拍、wait / 静止退避、背压下限、上下限钳制、状态记录与并发热更新
+"""
+
+import sys
+import os
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loop_scheduler import AdaptiveScheduler
+
+
+def make_scheduler(**kwargs):
+    params = dict(min_interval=0.05, max_interval=5.0, base_interval=0.2, wait_backoff=2.0,
+                  static_backoff=1.5, click_burst=3, latency_ratio=0.25)
+    params.update(kwargs)
+    return AdaptiveScheduler(**params)
+
+
+def test_default_interval():
+    scheduler = make_scheduler()
+    assert scheduler.next_interval() == 0.2
+    assert scheduler.state == "active"
+
+
+def test_click_burst():
+    """点击后 click_burst 次使用最小间隔，之后恢复默认"""
+    scheduler = make_scheduler()
+    scheduler.record_action("click")
+    assert [scheduler.next_interval() for _ in range(4)] == [0.05, 0.05, 0.05, 0.2]
+    scheduler.record_action("click")
+    scheduler.next_interval()
+    assert scheduler.state == "burst"
+
+
+def test_wait_backoff():
+    """连续 wait 指数退避，其他动作立即恢复，结果不超过 max_interval"""
+    scheduler = make_scheduler()
+    scheduler.record_action("wait")
+    scheduler.record_action("wait")
+    assert abs(scheduler.next_interval() - 0.8) < 1e-9
+    assert scheduler.state == "idle"
+    for _ in range(10):
+        scheduler.record_action("wait")
+    assert scheduler.next_interval() == 5.0
+    scheduler.record_action("swipe")
+    assert scheduler.next_interval() == 0.2
+
+
+def test_static_backoff():
+    """画面连续静止时退避，画面一变立即恢复"""
+    scheduler = make_scheduler()
+    scheduler.record_frame(False)
+    scheduler.record_frame(False)
+    assert abs(scheduler.next_interval() - 0.2 * 1.5 ** 2) < 1e-9
+    scheduler.record_frame(True)
+    assert scheduler.next_interval() == 0.2
+    assert abs(scheduler.change_rate - 1 / 3) < 1e-9
+
+
+def test_backpressure():
+    """间隔不低于 (模型延迟 + 排队等待) * latency_ratio"""
+    scheduler = make_scheduler()
+    scheduler.record_latency(2.0)
+    assert abs(scheduler.next_interval() - 0.5) < 1e-9
+    assert scheduler.state == "backpressure"
+    scheduler.record_backlog(2.0)
+    assert abs(scheduler.next_interval() - 1.0) < 1e-9
+    # 滑动平均
+    scheduler.record_latency(0.0)
+    assert abs(scheduler.latency_ewma - 0.7 * 2.0) < 1e-9
+
+    no_pressure = make_scheduler(latency_ratio=0)
+    no_pressure.record_latency(100.0)
+    assert no_pressure.next_interval() == 0.2
+
+
+def test_stats_and_reset():
+    scheduler = make_scheduler()
+    scheduler.record_action("wait")
+    scheduler.next_interval()
+    stats = scheduler.get_stats()
+    assert stats["state"] == "idle" and stats["current_interval"] == 0.4
+    scheduler.reset()
+    assert scheduler.state == "active"
+    assert scheduler.next_interval() == 0.2
+
+
+def test_configure():
+    scheduler = make_scheduler()
+    scheduler.configure(base_interval=1.0, max_interval=0.5)
+    assert scheduler.next_interval() == 0.5
+    try:
+        scheduler.configure(unknown=1)
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("未知参数应抛出 AttributeError")
+
+
+def test_configure_is_atomic():
+    """热更新与 next_interval 并发时，每次决策只会看到完整的一组参数"""
+    scheduler = make_scheduler()
+    fast = dict(min_interval=0.05, max_interval=5.0, base_interval=0.2)
+    slow = dict(min_interval=2.0, max_interval=3.0, base_interval=10.0)
+    stop = threading.Event()
+
+    def reconfigure():
+        while not stop.is_set():
+            scheduler.configure(**fast)
+            scheduler.configure(**slow)
+
+    thread = threading.Thread(target=reconfigure)
+    thread.start()
+    try:
+        seen = {scheduler.next_interval() for _ in range(20000)}
+    finally:
+        stop.set()
+        thread.join()
+    # 参数混用时会出现 2.0 或 5.0
+    assert seen <= {0.2, 3.0}, seen
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+指标导出测试脚本
+验证 render_openmetrics 的计数器、瞬时值、延迟直方图、标签转义与 /metrics HTTP 端点
+"""
+
+import sys
+import os
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from performance_monitor import PerformanceMonitor
+from metrics_exporter import MetricsExporter, render_openmetrics, CONTENT_TYPE
+
+
+def make_monitor():
+    monitor = PerformanceMonitor(sample_interval=60)
+    monitor.increment("agent_steps", window=1234)
+    monitor.increment("agent_steps", window=1234)
+    monitor.increment("agent_steps", window=5678)
+    monitor.increment("llm_tokens", 850, type="prompt")
+    monitor.set_gauge("loop_interval_seconds", 0.5, window=1234)
+    monitor.record_latency("llm", 0.5)
+    monitor.record_latency("llm", 1.5)
+    return monitor
+
+
+def test_counters():
+    """计数器按 <前缀><名称>_total{标签} 输出，每个名称只有一组 TYPE / HELP"""
+    lines = render_openmetrics(make_monitor()).splitlines()
+    assert 'game_agent_agent_steps_total{window="1234"} 2' in lines
+    assert 'game_agent_agent_steps_total{window="5678"} 1' in lines
+    assert 'game_agent_llm_tokens_total{type="prompt"} 850' in lines
+    assert lines.count("# TYPE game_agent_agent_steps counter") == 1
+    assert lines.count("# HELP game_agent_agent_steps Frames analysed by the agent loop") == 1
+    # TYPE 在该组样本之前
+    assert lines.index("# TYPE game_agent_agent_steps counter") < lines.index('game_agent_agent_steps_total{window="1234"} 2')
+
+
+def test_label_escaping():
+    """标签值中的反斜杠、引号与换行被转义"""
+    monitor = PerformanceMonitor(sample_interval=60)
+    monitor.increment("capture_failures", title='a\\b"c\nd')
+    assert 'game_agent_capture_failures_total{title="a\\\\b\\"c\\nd"} 1' in render_openmetrics(monitor).splitlines()
+
+
+def test_gauges():
+    """瞬时值以 gauge 输出，再次设置时覆盖；调度间隔不混入延迟直方图"""
+    monitor = make_monitor()
+    monitor.set_gauge("loop_interval_seconds", 0.25, window=1234)
+    lines = render_openmetrics(monitor).splitlines()
+    assert "# TYPE game_agent_loop_interval_seconds gauge" in lines
+    assert 'game_agent_loop_interval_seconds{window="1234"} 0.25' in lines
+    assert not any('operation="loop_interval"' in line for line in lines)
+
+
+def test_latency_histogram():
+    """延迟以 histogram 输出累计 _bucket{le} 与 _sum / _count，另有 _max gauge"""
+    lines = render_openmetrics(make_monitor()).splitlines()
+    assert lines.count("# TYPE game_agent_latency_seconds histogram") == 1
+    buckets = [line for line in lines if line.startswith('game_agent_latency_seconds_bucket{operation="llm",')]
+    bounds = [line.split('le="')[1].split('"')[0] for line in buckets]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    # 两个样本各占一个桶，累计计数递增，+Inf 桶等于总数
+    assert counts == [1, 2, 2]
+    assert bounds[-1] == "+Inf"
+    assert 0.5 <= float(bounds[0]) <= 0.5 * 1.02 and 1.5 <= float(bounds[1]) <= 1.5 * 1.02
+    assert 'game_agent_latency_seconds_sum{operation="llm"} 2.0' in lines
+    assert 'game_agent_latency_seconds_count{operation="llm"} 2' in lines
+    assert 'game_agent_latency_max_seconds{operation="llm"} 1.5' in lines
+    # 没有样本的操作也会输出，只有 +Inf 桶且计数为 0
+    assert 'game_agent_latency_seconds_bucket{operation="ocr",le="+Inf"} 0' in lines
+    assert 'game_agent_latency_seconds_count{operation="ocr"} 0' in lines
+
+
+def test_eof():
+    """文本以 # EOF 结尾"""
+    text = render_openmetrics(make_monitor())
+    assert text.endswith("\n# EOF\n")
+    assert text.count("# EOF") == 1
+
+
+def test_http_endpoint():
+    """GET /metrics 返回 200 与 OpenMetrics 内容类型，其他路径返回 404"""
+    exporter = MetricsExporter(make_monitor(), port=0).start()
+    try:
+        assert exporter.port != 0
+        with urlopen(exporter.url) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert 'game_agent_agent_steps_total{window="1234"} 2' in response.read().decode("utf-8")
+        try:
+            urlopen(f"http://{exporter.host}:{exporter.port}/other")
+        except HTTPError as e:
+            assert e.code == 404
+        else:
+            raise AssertionError("非 /metrics 路径应返回 404")
+    finally:
+        exporter.stop()
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
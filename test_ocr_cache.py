@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 结果缓存测试脚本
+验证帧哈希、结果格式统一、在缓存结果中查找文字，以及 OCRResultCache 的按帧龄 / 条目数淘汰与并发读写
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import ocr_cache
+from ocr_cache import (OCRResultCache, frame_key, normalize_results, offset_results,
+                       find_best, find_fuzzy, to_text_list)
+
+
+def make_results():
+    return [
+        ("开始游戏", [[10, 10], [50, 10], [50, 30], [10, 30]], 0.95),
+        ("开始", [[100, 100], [120, 100], [120, 110], [100, 110]], 0.6),
+        ("设置", [[200, 50], [240, 50], [240, 70], [200, 70]], 0.4),
+    ]
+
+
+def test_frame_key():
+    """内容相同的帧键相同，像素或尺寸不同键不同，非连续视图与其副本键相同"""
+    frame = np.zeros((4, 6, 3), dtype=np.uint8)
+    assert frame_key(frame) == frame_key(frame.copy())
+    changed = frame.copy()
+    changed[0, 0, 0] = 1
+    assert frame_key(changed) != frame_key(frame)
+    assert frame_key(np.zeros((6, 4, 3), dtype=np.uint8)) != frame_key(frame)
+
+    big = np.arange(8 * 8 * 3, dtype=np.uint8).reshape(8, 8, 3)
+    view = big[2:6, 1:7]
+    assert frame_key(view) == frame_key(view.copy())
+
+
+def test_normalize_results():
+    """兼容 [box, text, score] 与 [box, (text, score)] 两种格式"""
+    box = [[0, 0], [4, 0], [4, 2], [0, 2]]
+    results = normalize_results([[box, "甲", 0.9], [box, ("乙", "0.8")]])
+    assert [(text, confidence) for text, _, confidence in results] == [("甲", 0.9), ("乙", 0.8)]
+    assert results[0][1] == [[0.0, 0.0], [4.0, 0.0], [4.0, 2.0], [0.0, 2.0]]
+    assert normalize_results(None) == []
+
+
+def test_find_in_results():
+    results = make_results()
+    # 包含目标文字的结果中取置信度最高者
+    assert find_best(results, "开始") == (30, 20, 0.95, "开始游戏")
+    assert find_best(results, "设置") is None
+    assert find_best(results, "设置", confidence_threshold=0.3)[3] == "设置"
+
+    fuzzy = find_fuzzy(results, "开始游", fuzzy_threshold=0.8)
+    assert fuzzy[3] == "开始游戏" and fuzzy[4] >= 0.8
+    assert find_fuzzy(results, "退出") is None
+
+    assert [text for text, _, _ in to_text_list(results)] == ["开始游戏", "开始"]
+    assert to_text_list(results)[0][1] == (10, 10, 50, 30)
+
+
+def test_offset_results():
+    results = make_results()
+    shifted = offset_results(results, 5, -3)
+    assert shifted[0][1][0] == [15, 7]
+    assert results[0][1][0] == [10, 10]
+    assert offset_results(results, 0, 0) == results
+
+
+def test_get_put_and_stats():
+    cache = OCRResultCache(max_entries=4, max_age=10.0)
+    assert cache.get("a") is None
+    cache.put("a", make_results())
+    assert cache.get("a") == make_results()
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_evicts_least_recently_used():
+    """超过 max_entries 时淘汰最久未使用的条目，get 会刷新使用顺序"""
+    cache = OCRResultCache(max_entries=2, max_age=10.0)
+    cache.put("a", [])
+    cache.put("b", [])
+    assert cache.get("a") == []
+    cache.put("c", [])
+    assert cache.get("b") is None
+    assert cache.get("a") == [] and cache.get("c") == []
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_expires_by_age():
+    """条目超过 max_age 后查询未命中并被删除，写入时顺带淘汰头部过期条目"""
+    clock = [1000.0]
+    original_time = ocr_cache.time.time
+    ocr_cache.time.time = lambda: clock[0]
+    try:
+        cache = OCRResultCache(max_entries=8, max_age=1.0)
+        cache.put("old", [])
+        clock[0] += 0.5
+        cache.put("new", [])
+        assert cache.get("old") == []
+        clock[0] += 0.8
+        # old 刚被使用过，已移到尾部；new 在头部但未过期
+        assert cache.get("old") is None
+        assert cache.get_stats()["entries"] == 1
+        clock[0] += 1.0
+        cache.put("newest", [])
+        assert cache.get_stats()["entries"] == 1
+        assert cache.get("newest") == []
+    finally:
+        ocr_cache.time.time = original_time
+
+
+def test_concurrent_access():
+    """多线程同时读写：不抛异常，条目数不超过上限，命中 + 未命中 = 查询次数"""
+    cache = OCRResultCache(max_entries=8, max_age=10.0)
+    threads = 8
+    rounds = 2000
+    errors = []
+
+    def worker(index):
+        try:
+            for i in range(rounds):
+                key = f"frame-{(index + i) % 16}"
+                if cache.get(key) is None:
+                    cache.put(key, [(key, [[0, 0]], 1.0)])
+                assert len(cache._entries) <= 8
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert not errors, errors
+    stats = cache.get_stats()
+    assert stats["hits"] + stats["misses"] == threads * rounds
+    assert stats["entries"] <= 8
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 引擎池测试脚本
+用假引擎验证 OCREnginePool 的按需创建、会话数上限、并发下的独占签出、签出超时与创建失败后的名额回收
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ocr_engine_pool import OCREnginePool, OCRPoolTimeout
+
+
+class FakeEngine:
+    """记录同时使用它的线程数"""
+
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.users = 0
+        self.max_users = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, image):
+        with self._lock:
+            self.users += 1
+            self.max_users = max(self.max_users, self.users)
+        try:
+            time.sleep(self.duration)
+            self.calls += 1
+            return [], None
+        finally:
+            with self._lock:
+                self.users -= 1
+
+
+def make_pool(size=2, duration=0.0, **kwargs):
+    engines = []
+    lock = threading.Lock()
+
+    def factory():
+        engine = FakeEngine(duration)
+        with lock:
+            engines.append(engine)
+        return engine
+
+    return OCREnginePool(size=size, factory=factory, **kwargs), engines
+
+
+def test_sessions_created_lazily():
+    """空闲会话被复用，只有都在忙时才创建新会话"""
+    pool, engines = make_pool(size=3)
+    assert pool.live_sessions == 0
+    for _ in range(5):
+        with pool.session() as engine:
+            engine(None)
+    assert pool.live_sessions == 1 and len(engines) == 1
+
+    with pool.session() as first:
+        with pool.session() as second:
+            assert first is not second
+    assert pool.live_sessions == 2
+    stats = pool.get_stats()
+    assert (stats["live"], stats["idle"], stats["checkouts"]) == (2, 2, 7)
+
+
+def test_concurrent_checkout_is_exclusive():
+    """多线程并发签出：会话数不超过上限，每个引擎同一时刻只被一个线程使用"""
+    pool, engines = make_pool(size=3, duration=0.002)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                with pool.session(timeout=10.0) as engine:
+                    engine(None)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert len(engines) == pool.live_sessions == 3
+    assert all(engine.max_users == 1 for engine in engines)
+    assert sum(engine.calls for engine in engines) == 160
+    stats = pool.get_stats()
+    assert stats["checkouts"] == 160 and stats["idle"] == 3
+    assert sum(session["uses"] for session in stats["sessions"]) == 160
+    assert not any(session["busy"] for session in stats["sessions"])
+
+
+def test_checkout_timeout():
+    """全部会话在忙且已达上限时，等待超时抛出 OCRPoolTimeout"""
+    pool, _ = make_pool(size=1)
+    held = pool.acquire()
+    start = time.perf_counter()
+    try:
+        pool.acquire(timeout=0.1)
+    except OCRPoolTimeout:
+        pass
+    else:
+        raise AssertionError("应抛出 OCRPoolTimeout")
+    assert time.perf_counter() - start >= 0.09
+    assert pool.get_stats()["timeouts"] == 1
+
+    # 等待中的签出在会话归还后立即拿到
+    threading.Timer(0.05, pool.release, args=(held,)).start()
+    session = pool.acquire(timeout=2.0)
+    assert session is held
+    pool.release(session)
+
+
+def test_failed_creation_frees_slot():
+    """引擎创建失败时异常传给调用方，预占的名额被释放"""
+    attempts = []
+
+    def flaky_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("模型加载失败")
+        return FakeEngine()
+
+    pool = OCREnginePool(size=1, factory=flaky_factory, checkout_timeout=1.0)
+    try:
+        pool.acquire()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("应抛出创建引擎时的异常")
+    assert pool._creating == 0
+    with pool.session() as engine:
+        assert isinstance(engine, FakeEngine)
+    assert pool.live_sessions == 1
+
+
+def test_ensure_started():
+    pool, engines = make_pool(size=2)
+    pool.ensure_started(5)
+    assert pool.live_sessions == 2 and len(engines) == 2
+    assert pool.get_stats()["idle"] == 2
+    pool.ensure_started(1)
+    assert pool.live_sessions == 2
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
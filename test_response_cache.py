@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+AI 响应缓存测试脚本
+验证 ResponseCache 的汉明距离匹配、置信度过滤、TTL、LRU 淘汰与原子写盘
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache
+
+PROMPT = "system prompt"
+FRAME = int("f0" * 32, 16)
+ACTION = {"action": "click", "target": [0.5, 0.5], "confidence": 0.9}
+
+
+def flip_bits(value, count):
+    """翻转最低的 count 位"""
+    return value ^ ((1 << count) - 1)
+
+
+def test_distance():
+    """汉明距离不超过 max_distance 的画面命中，超过则未命中"""
+    cache = ResponseCache(max_distance=6)
+    cache.put(FRAME, PROMPT, ACTION, "{}")
+    assert cache.get(FRAME, PROMPT)["data"] == ACTION
+    assert cache.get(flip_bits(FRAME, 6), PROMPT) is not None
+    assert cache.get(flip_bits(FRAME, 7), PROMPT) is None
+    # 系统提示不同视为不同的任务
+    assert cache.get(FRAME, "other prompt") is None
+    assert cache.get_stats()["hits"] == 2
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_nearest_entry_wins():
+    """多个条目都在距离内时返回最近的一个"""
+    cache = ResponseCache(max_distance=6)
+    cache.put(flip_bits(FRAME, 4), PROMPT, dict(ACTION, target=[0.1, 0.1]), "{}")
+    cache.put(flip_bits(FRAME, 1), PROMPT, dict(ACTION, target=[0.9, 0.9]), "{}")
+    assert cache.get(FRAME, PROMPT)["data"]["target"] == [0.9, 0.9]
+
+
+def test_min_confidence():
+    """置信度低于下限的结果不写入"""
+    cache = ResponseCache(min_confidence=0.6)
+    cache.put(FRAME, PROMPT, dict(ACTION, confidence=0.5), "{}")
+    assert cache.get(FRAME, PROMPT) is None
+    assert cache.get_stats()["bypassed"] == 1
+
+
+def test_ttl():
+    """过期条目不命中，并在查询时被删除"""
+    cache = ResponseCache(ttl_seconds=10)
+    cache.put(FRAME, PROMPT, ACTION, "{}")
+    assert cache.get(FRAME, PROMPT) is not None
+    for entry in cache._entries.values():
+        entry["created"] -= 11
+    assert cache.get(FRAME, PROMPT) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_lru():
+    """超出容量时淘汰最久未使用的条目"""
+    cache = ResponseCache(max_entries=2, max_distance=0)
+    cache.put(1, PROMPT, ACTION, "a")
+    cache.put(2, PROMPT, ACTION, "b")
+    assert cache.get(1, PROMPT)["content"] == "a"
+    cache.put(4, PROMPT, ACTION, "c")
+    assert cache.get(2, PROMPT) is None
+    assert cache.get(1, PROMPT) is not None
+    assert cache.get(4, PROMPT) is not None
+
+
+def test_save_and_load():
+    """写盘为完整 JSON（不残留临时文件），重新加载后仍可命中"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ai_response_cache.json")
+        cache = ResponseCache(path=path, save_interval=3600)
+        cache.put(FRAME, PROMPT, ACTION, "{}", model="test-model")
+        assert cache.save()
+        assert os.listdir(directory) == ["ai_response_cache.json"]
+        with open(path, "r", encoding="utf-8") as f:
+            assert len(json.load(f)) == 1
+
+        loaded = ResponseCache(path=path)
+        entry = loaded.get(FRAME, PROMPT)
+        assert entry["data"] == ACTION
+        assert entry["model"] == "test-model"
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+流式动作解析测试脚本
+验证 StreamingActionParser 在任意分块下的增量解析结果
+"""
+
+import sys
+import os
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stream_parser import StreamingActionParser
+
+REPLY = '```json\n{"action": "click", "target": [0.5, 0.3], "confidence": 0.9, "thought": "点击\\"确认\\", 进入下一关"}\n```'
+
+
+def feed_in_pieces(text, size):
+    parser = StreamingActionParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_fields_ready_before_thought():
+    """action / target 完整后即 ready，thought 尚未到达"""
+    parser = StreamingActionParser()
+    parser.feed('```json\n{"action": "click", "target": [0.5, 0.')
+    assert parser.fields == {"action": "click"}
+    assert not parser.ready
+    parser.feed('3], "thought": "点')
+    assert parser.fields == {"action": "click", "target": [0.5, 0.3]}
+    assert parser.ready
+    assert not parser.done
+
+
+def test_any_chunking_gives_same_fields():
+    """逐字符、小块、整段送入，解析结果一致，且与完整 JSON 相同"""
+    expected = {"action": "click", "target": [0.5, 0.3], "confidence": 0.9, "thought": '点击"确认", 进入下一关'}
+    for size in (1, 2, 7, len(REPLY)):
+        parser = feed_in_pieces(REPLY, size)
+        assert parser.done, size
+        assert parser.fields == expected, size
+        assert parser.text == REPLY
+
+
+def test_nested_values_and_separators_in_strings():
+    """嵌套对象与字符串中的 , } 不会提前结束字段"""
+    parser = feed_in_pieces('{"target": {"xy": [1, 2]}, "thought": "a, b}", "action": "wait"}', 3)
+    assert parser.fields == {"target": {"xy": [1, 2]}, "thought": "a, b}", "action": "wait"}
+    assert parser.done
+
+
+def test_null_target_and_text_after_object():
+    """target 为 null 也算完整；对象结束后的文本被忽略"""
+    parser = feed_in_pieces('{"action": "wait", "target": null} 以上是结果 {"action": "click"}', 4)
+    assert parser.ready
+    assert parser.fields == {"action": "wait", "target": None}
+
+
+def test_no_json():
+    """没有 JSON 对象时不产生字段"""
+    parser = feed_in_pieces("画面在加载中，无法判断。", 5)
+    assert parser.fields == {}
+    assert not parser.ready
+    assert not parser.done
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+模板索引测试脚本
+验证 build_index 的增量重建（未变化沿用、仅 mtime 变化沿用、内容变化重建、删除、清单与尺度参数变化），
+以及 load_index 加载的模板与逐个解码的结果一致
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+
+from template_matcher import TemplateMatcher, MANIFEST_FILE
+from template_index import build_index, load_index, index_path_for
+
+
+def make_image(seed):
+    """40x30 的 BGR 按钮图案：底色与白色方块位置随 seed 变化，右侧一条黑色横条"""
+    image = np.empty((30, 40, 3), dtype=np.uint8)
+    image[:] = (seed * 37 % 256, 80, 160)
+    image[8:22, 2 + seed % 10:14 + seed % 10] = 255
+    image[12:18, 28:38] = 0
+    return image
+
+
+def make_frame(image, x=100, y=60):
+    """把 BGR 模板图案放入 RGB 帧"""
+    frame = np.full((200, 300, 3), 30, dtype=np.uint8)
+    frame[y:y + image.shape[0], x:x + image.shape[1]] = image[:, :, ::-1]
+    return frame
+
+
+def write_png(path, image):
+    cv2.imencode(".png", image)[1].tofile(path)
+
+
+def make_directory(directory):
+    write_png(os.path.join(directory, "confirm.png"), make_image(1))
+    write_png(os.path.join(directory, "cancel.png"), make_image(2))
+    mask = np.full((30, 40), 255, dtype=np.uint8)
+    mask[:5, :5] = 0
+    write_png(os.path.join(directory, "back.png"), make_image(3))
+    write_png(os.path.join(directory, "back_mask.png"), mask)
+
+
+def make_matcher(**kwargs):
+    params = dict(scales=(0.9, 1.0), coarse_factor=0.5)
+    params.update(kwargs)
+    return TemplateMatcher(**params)
+
+
+def summary(stats):
+    return stats["reused"], stats["rebuilt"], stats["removed"], stats["written"]
+
+
+def test_first_build_and_load():
+    """首次构建重建全部模板；加载结果与逐个解码一致，数组为只读映射视图"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        matcher = make_matcher()
+        stats = build_index(directory, matcher)
+        assert stats["templates"] == 3
+        assert summary(stats) == (0, 3, 0, True)
+
+        header, templates = load_index(index_path_for(directory))
+        assert sorted(templates) == ["back", "cancel", "confirm"]
+        assert header["scales"] == [0.9, 1.0]
+
+        decoded = make_matcher()
+        decoded.load_directory(directory)
+        for name, template in templates.items():
+            expected = decoded.templates[name]
+            assert np.array_equal(template.gray, expected.gray)
+            assert (template.mask is None) == (expected.mask is None)
+            assert len(template.levels) == len(expected.levels)
+            for level, expected_level in zip(template.levels, expected.levels):
+                assert level.scale == expected_level.scale
+                assert np.array_equal(level.gray, expected_level.gray)
+                assert np.array_equal(level.coarse_gray, expected_level.coarse_gray)
+        assert templates["back"].mask is not None
+        assert not templates["confirm"].gray.flags.writeable
+
+        loaded = make_matcher()
+        assert loaded.load_index(index_path_for(directory)) == 3
+        found = loaded.match(make_frame(make_image(1)), "confirm")
+        assert found is not None and (found.x, found.y) == (120, 75)
+
+
+def test_unchanged_directory_is_not_rewritten():
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        build_index(directory, make_matcher())
+        index_path = index_path_for(directory)
+        stamp = os.stat(index_path).st_mtime_ns
+        assert summary(build_index(directory, make_matcher())) == (3, 0, 0, False)
+        assert os.stat(index_path).st_mtime_ns == stamp
+
+
+def test_touched_file_reuses_data():
+    """只有 mtime 变化、内容哈希不变的模板沿用旧数据，索引记录新的文件状态"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        build_index(directory, make_matcher())
+        path = os.path.join(directory, "confirm.png")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        assert summary(build_index(directory, make_matcher())) == (3, 0, 0, True)
+        assert summary(build_index(directory, make_matcher())) == (3, 0, 0, False)
+
+
+def test_changed_and_removed_files():
+    """内容变化的模板重建、其余沿用；删除的模板从索引移除"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        build_index(directory, make_matcher())
+        path = os.path.join(directory, "cancel.png")
+        stat = os.stat(path)
+        write_png(path, make_image(20))
+        # 文件大小可能不变，确保 mtime 也变化（同一时钟刻度内写入时 mtime 可能相同）
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        assert summary(build_index(directory, make_matcher())) == (2, 1, 0, True)
+        _, templates = load_index(index_path_for(directory))
+        expected = make_matcher().build_template("cancel", make_image(20))
+        assert np.array_equal(templates["cancel"].gray, expected.gray)
+
+        os.remove(os.path.join(directory, "confirm.png"))
+        stats = build_index(directory, make_matcher())
+        assert summary(stats) == (2, 0, 1, True)
+        assert sorted(load_index(index_path_for(directory))[1]) == ["back", "cancel"]
+
+        # 删除掩码后该模板重建为无掩码
+        os.remove(os.path.join(directory, "back_mask.png"))
+        assert summary(build_index(directory, make_matcher())) == (1, 1, 0, True)
+        assert load_index(index_path_for(directory))[1]["back"].mask is None
+
+
+def test_manifest_change_rewrites_without_rebuild():
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        build_index(directory, make_matcher())
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"confirm": {"threshold": 0.95, "roi": [0, 0, 0.5, 0.5]}}, f)
+        assert summary(build_index(directory, make_matcher())) == (3, 0, 0, True)
+        confirm = load_index(index_path_for(directory))[1]["confirm"]
+        assert confirm.threshold == 0.95
+        assert list(confirm.roi) == [0, 0, 0.5, 0.5]
+
+
+def test_full_rebuild():
+    """尺度参数变化、force 或旧索引损坏时全部重建"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_directory(directory)
+        build_index(directory, make_matcher())
+        assert summary(build_index(directory, make_matcher(scales=(1.0,)))) == (0, 3, 0, True)
+        assert summary(build_index(directory, make_matcher(scales=(1.0,)), force=True)) == (0, 3, 0, True)
+
+        with open(index_path_for(directory), "wb") as f:
+            f.write(b"not an index")
+        assert summary(build_index(directory, make_matcher())) == (0, 3, 0, True)
+        assert len(load_index(index_path_for(directory))[1]) == 3
+
+        try:
+            make_matcher(scales=(1.0, 1.1)).load_index(index_path_for(directory))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("尺度参数不一致时应抛出 ValueError")
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+模板匹配测试脚本
+验证 TemplateMatcher 的定位、明亮/纯色区域不误匹配、掩码匹配与颜色校验
+"""
+
+import sys
+import os
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from template_matcher import TemplateMatcher
+
+RED = (200, 40, 40)
+# 与 RED 灰度接近、颜色不同
+GREEN = (30, 130, 40)
+
+
+def make_button(fill=RED):
+    """60x30 的 RGB 按钮：白色边框、纯色底、中间一条黑色横条"""
+    button = np.empty((30, 60, 3), dtype=np.uint8)
+    button[:] = fill
+    button[:2, :] = button[-2:, :] = 255
+    button[:, :2] = button[:, -2:] = 255
+    button[12:18, 10:50] = 0
+    return button
+
+
+def make_frame(button=None, x=100, y=50, background=30):
+    frame = np.full((200, 300, 3), background, dtype=np.uint8)
+    if button is not None:
+        frame[y:y + button.shape[0], x:x + button.shape[1]] = button
+    return frame
+
+
+def make_matcher(**kwargs):
+    matcher = TemplateMatcher(scales=(1.0,), coarse_factor=1.0, **kwargs)
+    matcher.add_template("confirm", make_button(), color_order="RGB")
+    return matcher
+
+
+def test_locates_button():
+    """返回按钮中心的帧坐标"""
+    found = make_matcher().match(make_frame(make_button()), "confirm")
+    assert found is not None
+    assert (found.x, found.y) == (130, 65)
+    assert found.bounds == (100, 50, 160, 80)
+    assert found.score > 0.99
+
+
+def test_bright_region_does_not_match():
+    """明亮的纯色区域不应匹配（有掩码与无掩码都一样）"""
+    frame = make_frame(background=250)
+    assert make_matcher().match(frame, "confirm") is None
+
+    mask = np.full((30, 60), 255, dtype=np.uint8)
+    mask[:4, :4] = 0
+    matcher = TemplateMatcher(scales=(1.0,), coarse_factor=1.0)
+    matcher.add_template("confirm", make_button(), mask=mask, color_order="RGB")
+    assert matcher.match(frame, "confirm") is None
+    assert matcher.match(make_frame(make_button()), "confirm") is not None
+
+
+def test_color_check():
+    """形状相同、颜色不同的按钮被颜色校验拒绝；关闭校验后按灰度匹配"""
+    frame = make_frame(make_button(GREEN))
+    assert make_matcher().match(frame, "confirm") is None
+    assert make_matcher(color_tolerance=None).match(frame, "confirm") is not None
+
+
+def test_match_any_priority():
+    """按 names 顺序返回第一个匹配；空列表不匹配"""
+    matcher = make_matcher()
+    matcher.add_template("cancel", make_button(GREEN), color_order="RGB")
+    frame = make_frame(make_button())
+    assert matcher.match_any(frame, ["cancel", "confirm"]).name == "confirm"
+    assert matcher.match_any(frame, []) is None
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"全部通过 ({len(tests)} 项)")
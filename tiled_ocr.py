@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+分块增量 OCR 模块
+把画面划分为带重叠边距的网格块，只对像素发生变化的块重新识别，
+其余块沿用上一帧的结果，合并为整帧的文字表
+"""
+
+from typing import Callable, List, Tuple, Dict, Any, Optional
+
+import cv2
+import numpy as np
+
+from ocr_cache import OCRResult, box_center, offset_results
+
+
+def crop_roi(image: np.ndarray, roi: Tuple[int, int, int, int]) -> Tuple[np.ndarray, int, int]:
+    """
+    按 (x1, y1, x2, y2) 裁剪图像（越界部分自动截断）
+
+    Returns:
+        (裁剪结果, x 偏移, y 偏移)
+    """
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = roi
+    x1, y1 = max(0, int(x1)), max(0, int(y1))
+    x2, y2 = min(width, int(x2)), min(height, int(y2))
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"无效的 ROI: {roi}")
+    return image[y1:y2, x1:x2], x1, y1
+
+
+class TiledOCR:
+    """
+    分块增量识别
+
+    - 每块识别时向四周扩展 overlap 像素，减少文字被块边界截断
+    - 识别结果按文字框中心归属到所在的块，避免重叠区域重复
+    - 块（含扩展边距）内变化像素数超过 min_changed_pixels 时重新识别
+    - 尺寸变化或首帧时全部重新识别
+    """
+
+    def __init__(self, recognize: Callable[[np.ndarray], List[OCRResult]], tile_size: Tuple[int, int] = (480, 270),
+                 overlap: int = 48, pixel_threshold: int = 24, min_changed_pixels: int = 16):
+        """
+        Args:
+            recognize: 单张图像的识别函数，返回 (文字, 四点框, 置信度) 列表
+            tile_size: 块尺寸 (宽, 高)
+            overlap: 识别时每块向外扩展的像素数
+            pixel_threshold: 灰度差超过该值的像素视为变化
+            min_changed_pixels: 块内变化像素数达到该值才重新识别
+        """
+        self.recognize = recognize
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_pixels = min_changed_pixels
+
+        self._prev_gray: Optional[np.ndarray] = None
+        self._tiles: List[Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]] = []
+        self._tile_results: List[List[OCRResult]] = []
+        self.frames = 0
+        self.tiles_recognized = 0
+        self.tiles_reused = 0
+
+    def _layout(self, width: int, height: int):
+        """计算块的核心区域与扩展区域"""
+        tile_w, tile_h = self.tile_size
+        self._tiles = []
+        for y in range(0, height, tile_h):
+            for x in range(0, width, tile_w):
+                core = (x, y, min(width, x + tile_w), min(height, y + tile_h))
+                expanded = (max(0, core[0] - self.overlap), max(0, core[1] - self.overlap),
+                            min(width, core[2] + self.overlap), min(height, core[3] + self.overlap))
+                self._tiles.append((core, expanded))
+        self._tile_results = [[] for _ in self._tiles]
+
+    def _recognize_tile(self, image: np.ndarray, index: int) -> List[OCRResult]:
+        core, expanded = self._tiles[index]
+        crop, dx, dy = crop_roi(image, expanded)
+        results = offset_results(self.recognize(crop), dx, dy)
+        owned = []
+        for item in results:
+            x, y = box_center(item[1])
+            if core[0] <= x < core[2] and core[1] <= y < core[3]:
+                owned.append(item)
+        return owned
+
+    def update(self, image: np.ndarray) -> List[OCRResult]:
+        """
+        识别一帧：只重新识别变化的块
+
+        Args:
+            image: RGB numpy 图像
+
+        Returns:
+            整帧的 (文字, 四点框, 置信度) 列表，坐标为整帧像素坐标
+        """
+        if image.ndim == 3 and image.shape[2] == 4:
+            image = image[:, :, :3]
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        height, width = gray.shape
+
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            self._layout(width, height)
+            dirty = range(len(self._tiles))
+        else:
+            changed = cv2.absdiff(gray, self._prev_gray) > self.pixel_threshold
+            dirty = []
+            for index, (_, (x1, y1, x2, y2)) in enumerate(self._tiles):
+                if np.count_nonzero(changed[y1:y2, x1:x2]) >= self.min_changed_pixels:
+                    dirty.append(index)
+
+        for index in dirty:
+            self._tile_results[index] = self._recognize_tile(image, index)
+        self._prev_gray = gray
+
+        self.frames += 1
+        self.tiles_recognized += len(dirty)
+        self.tiles_reused += len(self._tiles) - len(dirty)
+        return [item for results in self._tile_results for item in results]
+
+    def reset(self):
+        """丢弃上一帧，下一帧全部重新识别"""
+        self._prev_gray = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取分块识别统计"""
+        total = self.tiles_recognized + self.tiles_reused
+        return {
+            "frames": self.frames,
+            "tiles": len(self._tiles),
+            "tiles_recognized": self.tiles_recognized,
+            "tiles_reused": self.tiles_reused,
+            "reuse_rate": self.tiles_reused / total if total else 0.0
+        }
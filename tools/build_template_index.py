@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板索引构建工具
+
+为 games/<游戏>/<脚本>/ 模板目录增量编译 templates.idx，
+尺度参数默认读取配置 vision.templates.*，与 SmartAgent 运行时一致。
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config_manager import ConfigManager
+from template_matcher import TemplateMatcher
+from template_index import build_index, index_path_for
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='增量编译模板索引')
+    parser.add_argument('directories', nargs='+', help='模板目录（可指定多个）')
+    parser.add_argument('--force', action='store_true', help='忽略旧索引，全部重建')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    config = ConfigManager()
+    matcher = TemplateMatcher(
+        scales=config.get("vision.templates.scales", [0.8, 0.9, 1.0, 1.1, 1.2]),
+        threshold=float(config.get("vision.templates.threshold", 0.85)),
+        coarse_factor=float(config.get("vision.templates.coarse_factor", 0.5))
+    )
+    for directory in args.directories:
+        stats = build_index(directory, matcher, force=args.force)
+        print(f"{index_path_for(directory)}: 模板 {stats['templates']}，沿用 {stats['reused']}，"
+              f"重建 {stats['rebuilt']}，移除 {stats['removed']}，{'已写入' if stats['written'] else '无变化'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧编码基准测试工具
+
+在录制好的帧序列上对比不同缩放滤波器、质量预设和输出格式的编码耗时、体积与画质（PSNR），
+并以旧实现（PIL LANCZOS 缩略图 + JPEG 85）作为基线。
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import argparse
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_source import ReplayFrameSource
+from frame_encoder import FrameEncoder, QUALITY_PRESETS
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='对比帧编码方案的耗时、体积与画质')
+    parser.add_argument('--path', required=True, help='录制目录（图片/npy 序列）或视频文件')
+    parser.add_argument('--frames', type=int, default=50, help='参与测试的帧数')
+    parser.add_argument('--max-size', type=int, default=1024, help='最大边长')
+    parser.add_argument('--formats', default='jpeg,webp,png', help='参与对比的输出格式，逗号分隔')
+    return parser.parse_args()
+
+
+def legacy_encode(frame: np.ndarray, max_size: int) -> str:
+    """旧实现：PIL LANCZOS 缩略图 + JPEG 85"""
+    img = Image.fromarray(frame)
+    if max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def psnr(encoded_base64: str, reference: np.ndarray) -> float:
+    """解码后与参考图（INTER_AREA 缩放的原图）比较 PSNR"""
+    data = np.frombuffer(base64.b64decode(encoded_base64), dtype=np.uint8)
+    decoded = cv2.cvtColor(cv2.imdecode(data, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+    if decoded.shape != reference.shape:
+        decoded = cv2.resize(decoded, (reference.shape[1], reference.shape[0]), interpolation=cv2.INTER_AREA)
+    return cv2.PSNR(decoded, reference)
+
+
+def run_variant(name, encode, frames, references):
+    """对一个方案计时并统计"""
+    timings, sizes, scores = [], [], []
+    for frame, reference in zip(frames, references):
+        t0 = time.perf_counter()
+        encoded = encode(frame)
+        timings.append(time.perf_counter() - t0)
+        sizes.append(len(encoded) * 3 / 4)
+        scores.append(psnr(encoded, reference))
+    ordered = sorted(timings)
+    avg = sum(ordered) / len(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {name:<22} 平均 {avg * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms  "
+          f"体积 {sum(sizes) / len(sizes) / 1024:7.1f}KB  PSNR {sum(scores) / len(scores):6.2f}dB")
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+
+    source = ReplayFrameSource(args.path, loop=False)
+    frames = []
+    for _ in range(args.frames):
+        frame = source.grab()
+        if frame is None:
+            break
+        frames.append(np.ascontiguousarray(frame))
+    source.close()
+    if not frames:
+        print("❌ 没有可用的帧")
+        return
+
+    sizer = FrameEncoder(max_size=args.max_size)
+    references = []
+    for frame in frames:
+        width, height = sizer.target_size(frame.shape[1], frame.shape[0])
+        references.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+
+    print("=" * 80)
+    print(f"帧编码基准测试: {args.path}")
+    print(f"帧数: {len(frames)}  原始尺寸: {frames[0].shape[1]}x{frames[0].shape[0]}  最大边长: {args.max_size}")
+    print("-" * 80)
+
+    run_variant("legacy(PIL lanczos)", lambda f: legacy_encode(f, args.max_size), frames, references)
+    for output_format in args.formats.split(','):
+        for preset in QUALITY_PRESETS:
+            encoder = FrameEncoder.from_preset(preset, max_size=args.max_size, output_format=output_format)
+            run_variant(f"{output_format}/{preset}", encoder.encode_base64, frames, references)
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 OpenAI 兼容模拟服务
+
+实现 POST /chat/completions（含 /v1 前缀），支持普通与 stream=true 的 SSE 返回，
+可配置固定延迟，用于在不访问真实模型的情况下测试 AIBrain / AsyncAIBrain 的并发与超时行为。
+
+示例:
+    python tools/mock_openai_server.py --port 8765 --delay 0.5
+    然后把配置 ai.base_url 设为 http://127.0.0.1:8765/v1
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_CONTENT = json.dumps({
+    "action": "click",
+    "target": [0.5, 0.5],
+    "confidence": 0.9,
+    "thought": "模拟服务：检测到确认按钮，点击继续。"
+}, ensure_ascii=False)
+
+
+class MockState:
+    """模拟服务的共享状态"""
+
+    def __init__(self, delay: float = 0.0, content: str = DEFAULT_CONTENT, chunk_size: int = 8):
+        self.delay = delay
+        self.content = content
+        self.chunk_size = chunk_size
+        self.request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/health"):
+            with self.state.lock:
+                payload = {
+                    "requests": self.state.request_count,
+                    "in_flight": self.state.in_flight,
+                    "max_in_flight": self.state.max_in_flight
+                }
+            self._send_json(200, payload)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", "mock-model")
+        state = self.state
+
+        with state.lock:
+            state.request_count += 1
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            if request.get("stream"):
+                self._stream(model)
+            else:
+                time.sleep(state.delay)
+                completion_tokens = len(state.content) // 2
+                self._send_json(200, {
+                    "id": f"mock-{state.request_count}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": state.content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": length // 4,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": length // 4 + completion_tokens
+                    }
+                })
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _stream(self, model: str):
+        """以 SSE 分块返回内容，首块前等待 delay，之后每块之间均匀分配 delay"""
+        state = self.state
+        chunks = [state.content[i:i + state.chunk_size] for i in range(0, len(state.content), state.chunk_size)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        time.sleep(state.delay)
+        per_chunk = state.delay / max(1, len(chunks))
+        for chunk in chunks:
+            payload = {
+                "id": f"mock-{state.request_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(per_chunk)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, delay: float = 0.0,
+                  content: str = DEFAULT_CONTENT) -> ThreadingHTTPServer:
+    """创建模拟服务（未启动），port 为 0 时自动分配端口"""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(delay, content)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='本地 OpenAI 兼容模拟服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--delay', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--content', default=DEFAULT_CONTENT, help='固定返回的回复内容')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    server = create_server(args.host, args.port, args.delay, args.content)
+    print(f"✅ 模拟服务已启动: http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
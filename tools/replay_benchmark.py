@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回放基准测试工具
+
+使用 ReplayFrameSource 回放录制好的帧序列，全速驱动 SmartAgent 的
+截图 -> 编码 -> 分析 流程，统计各阶段耗时。无需 Windows 与真实游戏窗口。
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_source import ReplayFrameSource
+from game_window import GameWindow
+from smart_agent import SmartAgent
+from tracing import tracer
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='回放录制帧，测量 SmartAgent 主循环性能')
+    parser.add_argument('--path', required=True, help='录制目录（图片/npy 序列）或视频文件')
+    parser.add_argument('--steps', type=int, default=100, help='执行的步数')
+    parser.add_argument('--fps', type=float, default=None, help='回放帧率，不指定则全速')
+    parser.add_argument('--preload', action='store_true', help='预先把帧解码到内存')
+    parser.add_argument('--no-ai', action='store_true', help='只测量截图与编码，不调用 AI 接口')
+    parser.add_argument('--trace', default=None, help='把各阶段区段导出为 Chrome trace JSON（可在 Perfetto 中查看）')
+    return parser.parse_args()
+
+
+def summarize(name, samples):
+    """输出单个阶段的统计"""
+    if not samples:
+        print(f"  {name:<8} 无数据")
+        return
+    ordered = sorted(samples)
+    avg = sum(ordered) / len(ordered)
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {name:<8} 平均 {avg * 1000:8.2f}ms  p50 {p50 * 1000:8.2f}ms  p99 {p99 * 1000:8.2f}ms  最大 {ordered[-1] * 1000:8.2f}ms")
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+
+    source = ReplayFrameSource(args.path, loop=True, fps=args.fps, preload=args.preload)
+    agent = SmartAgent(game_window=GameWindow(frame_source=source))
+    if args.trace:
+        tracer.enable()
+
+    timings = {"capture": [], "encode": [], "step": [], "total": []}
+    start = time.perf_counter()
+
+    for _ in range(args.steps):
+        t0 = time.perf_counter()
+        with tracer.span("capture"):
+            frame = agent.game_window.snapshot()
+        t1 = time.perf_counter()
+        timings["capture"].append(t1 - t0)
+        if frame is None:
+            continue
+
+        if args.no_ai:
+            agent._image_to_base64(frame)
+            timings["encode"].append(time.perf_counter() - t1)
+        else:
+            agent.step(frame)
+            timings["step"].append(time.perf_counter() - t1)
+
+        timings["total"].append(time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - start
+    source.close()
+
+    print("=" * 60)
+    print(f"回放基准测试: {args.path}")
+    print(f"步数: {len(timings['total'])}  总耗时: {elapsed:.2f}秒  吞吐: {len(timings['total']) / elapsed:.1f} 步/秒")
+    print("-" * 60)
+    for name, samples in timings.items():
+        if samples:
+            summarize(name, samples)
+    print("=" * 60)
+    if args.trace:
+        print(f"追踪数据: {tracer.save(args.trace)}")
+
+
+if __name__ == '__main__':
+    main()
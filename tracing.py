@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+轻量级追踪模块
+用上下文管理器 / 装饰器记录嵌套的耗时区段（截图、编码、模型调用、解析、OCR 兜底、坐标换算、点击），
+带线程与窗口标签，导出为 Chrome trace-event JSON，可直接拖入 Perfetto (ui.perfetto.dev) 查看。
+未启用时 span() 返回共享的空上下文管理器，开销只有一次属性判断
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from typing import Optional, Dict, Any, Callable
+
+log_dir = "log"
+if not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'tracing.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger('tracing')
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空区段"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """一个正在计时的区段，退出时写入追踪器"""
+
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._add(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """在区段结束前补充参数（如命中结果、token 数）"""
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    区段追踪器
+
+    - span(name, **args): 上下文管理器，记录一个完整区段（Chrome "X" 事件），同一线程内按时间自动嵌套
+    - traced(name): 装饰器，未启用时直接调用原函数
+    - set_window(hwnd): 为当前线程之后的区段打上窗口标签
+    - 事件保存在固定容量的环形缓冲区中，超出后丢弃最旧的事件
+    """
+
+    def __init__(self, max_events: int = 200000):
+        self.enabled = False
+        self.max_events = max_events
+        self._events = deque(maxlen=max_events)
+        self._threads: Dict[int, str] = {}
+        # 保护线程名登记与导出时的遍历（事件写入是 deque.append，无需加锁）
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def configure(self, config_manager):
+        """按配置 performance.tracing.* 设置容量并启用 / 停用"""
+        max_events = int(config_manager.get("performance.tracing.max_events", self.max_events))
+        if max_events != self.max_events:
+            self.max_events = max_events
+            self._events = deque(self._events, maxlen=max_events)
+        if config_manager.get("performance.tracing.enabled", False):
+            self.enable()
+        else:
+            self.disable()
+
+    def enable(self):
+        self.enabled = True
+        logger.info("追踪已启用")
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        """清空已记录的事件"""
+        self._events.clear()
+
+    def set_window(self, hwnd: Optional[int]):
+        """为当前线程设置窗口标签（多窗口时区分各代理）"""
+        if self.enabled:
+            self._local.window = hwnd
+
+    def span(self, name: str, **args):
+        """
+        记录一个区段
+
+        用法:
+            with tracer.span("ai.analyze", model=model):
+                ...
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, args)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """把函数调用记录为区段的装饰器，name 默认为函数的限定名"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, span_name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _add(self, name: str, start: int, end: int, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self._threads:
+            with self._lock:
+                self._threads.setdefault(tid, thread.name)
+        window = getattr(self._local, "window", None)
+        if window is not None:
+            args["window"] = window
+        # deque.append 是原子操作，多线程写入无需加锁
+        self._events.append((name, start, end - start, tid, args))
+
+    def export(self) -> Dict[str, Any]:
+        """生成 Chrome trace-event 格式的字典（时间单位：微秒）"""
+        events = []
+        with self._lock:
+            threads = list(self._threads.items())
+        for tid, thread_name in threads:
+            events.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                           "args": {"name": thread_name}})
+        for name, start, duration, tid, args in list(self._events):
+            event = {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (start - self._origin) / 1000.0,
+                "dur": duration / 1000.0,
+                "pid": self._pid,
+                "tid": tid
+            }
+            if args:
+                event["args"] = {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                                 for key, value in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Optional[str] = None) -> str:
+        """
+        导出为 JSON 文件
+
+        Args:
+            path: 输出路径，默认 log/trace_<时间>.json
+        """
+        if path is None:
+            path = os.path.join(log_dir, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.export(), f, ensure_ascii=False)
+        logger.info(f"追踪数据已导出: {path}（{len(self._events)} 个区段）")
+        return path
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "events": len(self._events), "max_events": self.max_events}
+
+
+# 全局追踪器
+tracer = Tracer()
@@ -4,17 +4,17 @@
 提供截图、OCR识别和网格标注功能
 """
 
-import base64
-import io
 import numpy as np
-import win32gui
-import win32con
-import win32ui
-import mss
-import ctypes
 from PIL import Image, ImageDraw, ImageFont
 from typing import Optional, Tuple, Dict, List
+import time
 import logging
+from frame_source import FrameSource, PrintWindowFrameSource, MSSFrameSource
+from frame_encoder import FrameEncoder
+from config_manager import ConfigManager
+from ocr_engine_pool import OCREnginePool, get_shared_pool
+from ocr_cache import OCRResultCache, OCRResult, get_shared_cache, frame_key, normalize_results, find_best, to_text_list
+from performance_monitor import performance_monitor
 
 log_dir = "log"
 import os
@@ -32,41 +32,66 @@ logging.basicConfig(
 logger = logging.getLogger('vision_core')
 
 
+def create_ocr_engine(intra_op_num_threads: Optional[int] = None, inter_op_num_threads: Optional[int] = None):
+    """
+    创建一个 RapidOCR 引擎（独立的 ONNX 推理会话）
+    
+    Args:
+        intra_op_num_threads: 单个算子内部的线程数，None 使用 onnxruntime 默认值
+        inter_op_num_threads: 算子之间的并行线程数，None 使用 onnxruntime 默认值
+    """
+    from rapidocr_onnxruntime import RapidOCR
+    kwargs = {}
+    if intra_op_num_threads:
+        kwargs["intra_op_num_threads"] = int(intra_op_num_threads)
+    if inter_op_num_threads:
+        kwargs["inter_op_num_threads"] = int(inter_op_num_threads)
+    return RapidOCR(**kwargs)
+
+
 class VisionCore:
     """
     视觉核心类，整合截图、OCR 和网格标注功能
     """
     
-    def __init__(self, hwnd: Optional[int] = None, grid_size: int = 4):
+    def __init__(self, hwnd: Optional[int] = None, grid_size: int = 4, frame_source: Optional[FrameSource] = None,
+                 ocr_cache: Optional[OCRResultCache] = None, ocr_pool: Optional[OCREnginePool] = None):
         """
         初始化视觉核心
         
         Args:
             hwnd: 目标窗口句柄，如果为 None 则截取主屏幕
             grid_size: 网格大小，默认 4x4
+            frame_source: 自定义帧源（如回放），为 None 时按 hwnd 选择 PrintWindow 或 MSS
+            ocr_cache: OCR 结果缓存，为 None 时使用进程内共享缓存
+            ocr_pool: OCR 会话池，为 None 时使用进程内共享会话池
         """
         self.hwnd = hwnd
         self.grid_size = grid_size
-        self._ocr_engine = None
-        self._ocr_initialized = False
+        if frame_source is None:
+            # 窗口截图沿用整个窗口尺寸（GetWindowRect），与 GameWindow 的客户区截图区分
+            frame_source = PrintWindowFrameSource(hwnd, client_area=False) if hwnd else MSSFrameSource(None)
+        self.frame_source = frame_source
+        # 共享帧编码器实现，最大边长 1280 以节省 Token
+        self.frame_encoder = FrameEncoder.from_config(ConfigManager(), max_size=1280)
+        # OCR 会话池：并发识别各自签出独立的会话，不再共用一个引擎加锁
+        self.ocr_pool = ocr_pool if ocr_pool is not None else get_shared_pool()
+        # 同一帧只识别一次，不同文字的查询复用结果
+        self.ocr_cache = ocr_cache if ocr_cache is not None else get_shared_cache()
         logger.info(f"视觉核心初始化完成，网格大小: {grid_size}x{grid_size}")
     
     def _ensure_ocr(self):
         """
-        确保 OCR 引擎已初始化（延迟加载）
+        确保 OCR 引擎已初始化（至少创建一个会话）
         """
-        if not self._ocr_initialized:
-            try:
-                from rapidocr_onnxruntime import RapidOCR
-                self._ocr_engine = RapidOCR()
-                self._ocr_initialized = True
-                logger.info("OCR 引擎初始化成功")
-            except ImportError:
-                logger.error("rapidocr_onnxruntime 未安装，请运行: pip install rapidocr_onnxruntime")
-                raise
-            except Exception as e:
-                logger.error(f"OCR 引擎初始化失败: {e}")
-                raise
+        try:
+            self.ocr_pool.ensure_started(1)
+        except ImportError:
+            logger.error("rapidocr_onnxruntime 未安装，请运行: pip install rapidocr_onnxruntime")
+            raise
+        except Exception as e:
+            logger.error(f"OCR 引擎初始化失败: {e}")
+            raise
     
     def _add_som_grid(self, image: Image.Image) -> Tuple[Image.Image, Dict]:
         """
@@ -136,108 +161,31 @@ class VisionCore:
         
         return image, grid_map
     
-    def _image_to_base64(self, image: Image.Image, max_size: int = 1280) -> str:
+    def _image_to_base64(self, image: Image.Image) -> str:
         """
-        将 PIL 图像转换为 Base64 字符串
+        将 PIL 图像转换为 Base64 字符串（不修改原图）
         
         Args:
             image: PIL 图像对象
-            max_size: 最大边长（用于压缩以节省 Token）
         
         Returns:
-            Base64 编码的 JPEG 图像字符串
+            Base64 编码的图像字符串，格式与最大边长由 frame_encoder 决定
         """
-        if max(image.size) > max_size:
-            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        return self.frame_encoder.encode_base64(image)
     
     def capture(self) -> Optional[np.ndarray]:
         """
         截取窗口或屏幕
         
         Returns:
-            numpy 数组格式的图像 (BGR)，失败返回 None
+            numpy 数组格式的图像 (RGB)，失败返回 None
         """
         try:
-            if self.hwnd:
-                return self._capture_window()
-            else:
-                return self._capture_screen()
+            return self.frame_source.grab()
         except Exception as e:
             logger.error(f"截图失败: {e}")
             return None
     
-    def _capture_window(self) -> Optional[np.ndarray]:
-        """
-        截取指定窗口
-        """
-        try:
-            left, top, right, bottom = win32gui.GetWindowRect(self.hwnd)
-            width = right - left
-            height = bottom - top
-            
-            if width <= 0 or height <= 0:
-                return None
-            
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-            
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, width, height)
-            saveDC.SelectObject(saveBitMap)
-            
-            result = ctypes.windll.user32.PrintWindow(self.hwnd, saveDC.GetSafeHdc(), 2)
-            if result == 0:
-                result = ctypes.windll.user32.PrintWindow(self.hwnd, saveDC.GetSafeHdc(), 0)
-            
-            if result == 0:
-                logger.error("PrintWindow API 调用失败")
-                win32gui.DeleteObject(saveBitMap.GetHandle())
-                saveDC.DeleteDC()
-                mfcDC.DeleteDC()
-                win32gui.ReleaseDC(self.hwnd, hwndDC)
-                return None
-            
-            bmpinfo = saveBitMap.GetInfo()
-            bmpstr = saveBitMap.GetBitmapBits(True)
-            
-            img = np.frombuffer(bmpstr, dtype='uint8')
-            img.shape = (height, width, 4)
-            
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
-            
-            img = img[..., :3]
-            img = img[..., ::-1]
-            
-            return img
-            
-        except Exception as e:
-            logger.error(f"窗口截图失败: {e}")
-            return None
-    
-    def _capture_screen(self) -> Optional[np.ndarray]:
-        """
-        截取主屏幕
-        """
-        try:
-            with mss.mss() as sct:
-                monitor = sct.monitors[1]
-                sct_img = sct.grab(monitor)
-                screen = np.array(sct_img)
-                if screen.shape[-1] >= 3:
-                    screen = screen[..., :3]
-                return screen
-        except Exception as e:
-            logger.error(f"屏幕截图失败: {e}")
-            return None
-    
     def get_annotated_screenshot(self, use_grid: bool = False) -> Optional[Tuple[str, Image.Image, Dict]]:
         """
         获取标注后的截图
@@ -271,6 +219,41 @@ class VisionCore:
             logger.error(f"获取标注截图失败: {e}")
             return None
     
+    def recognize(self, image: np.ndarray, engine=None, use_cache: bool = True) -> List[OCRResult]:
+        """
+        识别图像中的全部文字（按帧内容缓存，同一帧只运行一次 OCR）
+        
+        Args:
+            image: numpy 图像数组 (RGB 或 RGBA)
+            engine: 使用指定的 OCR 引擎（调用方保证其不被并发使用），None 时从会话池签出
+            use_cache: 是否使用整帧结果缓存；分块识别自己按块复用结果，块裁剪不应挤占整帧缓存
+        
+        Returns:
+            (文字, 四点框, 置信度) 列表
+        """
+        if len(image.shape) == 3 and image.shape[-1] == 4:
+            image = image[:, :, :3]
+        # ROI / 分块裁剪得到的是视图，统一为连续内存
+        image = np.ascontiguousarray(image)
+        
+        key = frame_key(image) if use_cache else None
+        results = self.ocr_cache.get(key) if use_cache else None
+        if results is not None:
+            performance_monitor.increment("ocr_cache_hits")
+        else:
+            performance_monitor.increment("ocr_calls")
+            ocr_start = time.perf_counter()
+            if engine is None:
+                with self.ocr_pool.session() as pooled_engine:
+                    raw, _ = pooled_engine(image)
+            else:
+                raw, _ = engine(image)
+            performance_monitor.record_latency("ocr", time.perf_counter() - ocr_start)
+            results = normalize_results(raw)
+            if use_cache:
+                self.ocr_cache.put(key, results)
+        return results
+    
     def find_text(self, text: str, confidence_threshold: float = 0.5) -> Optional[Tuple[int, int, float]]:
         """
         在当前截图中查找指定文字
@@ -282,45 +265,33 @@ class VisionCore:
         Returns:
             (x, y, confidence) 像素坐标，未找到返回 None
         """
-        self._ensure_ocr()
+        match = self.find_texts([text], confidence_threshold)
+        return match[1] if match else None
+    
+    def find_texts(self, texts: List[str], confidence_threshold: float = 0.5) -> Optional[Tuple[str, Tuple[int, int, float]]]:
+        """
+        截图一次并按顺序查找多个候选文字，返回第一个找到的
         
+        Args:
+            texts: 候选文字列表（按优先级排列）
+            confidence_threshold: 置信度阈值，默认 0.5
+        
+        Returns:
+            (候选文字, (x, y, confidence))，都未找到返回 None
+        """
         try:
             screenshot_array = self.capture()
             if screenshot_array is None:
                 return None
             
-            # 转换为 PIL 图像
-            image = Image.fromarray(screenshot_array)
-            
-            # 转换为 numpy 数组
-            img_array = np.array(image)
-            
-            if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
-                img_array = img_array[:, :, :3]
-            
-            # 调用 OCR
-            result, _ = self._ocr_engine(img_array)
-            
-            if not result:
-                return None
-            
-            # 查找匹配的文字
-            best_match = None
-            best_confidence = 0.0
-            
-            for item in result:
-                box, (ocr_text, confidence) = item[0], item[1]
-                
-                if text in ocr_text:
-                    if confidence > best_confidence and confidence >= confidence_threshold:
-                        best_confidence = confidence
-                        box_array = np.array(box)
-                        center_x = int(np.mean(box_array[:, 0]))
-                        center_y = int(np.mean(box_array[:, 1]))
-                        best_match = (center_x, center_y, confidence)
-                        logger.info(f"找到文字 '{text}' (识别为: '{ocr_text}') 坐标: ({center_x}, {center_y}) 置信度: {confidence:.2f}")
-            
-            return best_match
+            results = self.recognize(screenshot_array)
+            for text in texts:
+                match = find_best(results, text, confidence_threshold)
+                if match:
+                    center_x, center_y, confidence, ocr_text = match
+                    logger.info(f"找到文字 '{text}' (识别为: '{ocr_text}') 坐标: ({center_x}, {center_y}) 置信度: {confidence:.2f}")
+                    return text, (center_x, center_y, confidence)
+            return None
             
         except Exception as e:
             logger.error(f"查找文字失败: {e}")
@@ -336,39 +307,17 @@ class VisionCore:
         Returns:
             文字列表，每个元素为 (text, (x1, y1, x2, y2), confidence)
         """
-        self._ensure_ocr()
-        
         try:
             screenshot_array = self.capture()
             if screenshot_array is None:
                 return []
             
-            img_array = screenshot_array
-            if len(img_array.shape) == 3 and img_array.shape[-1] == 4:
-                img_array = img_array[:, :, :3]
-            
-            result, _ = self._ocr_engine(img_array)
-            
-            if not result:
-                return []
-            
-            text_list = []
-            for item in result:
-                box, (text, confidence) = item[0], item[1]
-                
-                if confidence >= confidence_threshold:
-                    box_array = np.array(box)
-                    x1, y1 = int(np.min(box_array[:, 0])), int(np.min(box_array[:, 1]))
-                    x2, y2 = int(np.max(box_array[:, 0])), int(np.max(box_array[:, 1]))
-                    text_list.append((text, (x1, y1, x2, y2), confidence))
-            
-            return text_list
+            return to_text_list(self.recognize(screenshot_array), confidence_threshold)
             
         except Exception as e:
             logger.error(f"识别文字失败: {e}")
             return []
 
-
 if __name__ == "__main__":
     print("视觉核心模块测试")
     print("使用示例:")
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+视觉服务注册表
+进程内按窗口句柄共享 VisionCore（截图 + OCR）与 OCRTool 实例，
+所有实例共用同一个 OCR 会话池与结果缓存，避免每次 OCR 兜底都重新加载模型
+"""
+
+import threading
+from typing import Optional, Dict, Any
+
+from vision_core import VisionCore
+from ocr_engine_pool import get_shared_pool, process_rss
+from ocr_cache import get_shared_cache
+
+
+class VisionRegistry:
+    """
+    视觉服务注册表
+
+    - get_vision(hwnd): 返回该窗口共享的 VisionCore（hwnd 为 None 时为全屏截图）
+    - get_ocr_tool(): 返回进程内共享的 OCRTool
+    - 服务本身线程安全：截图后端自带锁，OCR 通过会话池并发执行
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._visions: Dict[Optional[int], VisionCore] = {}
+        self._ocr_tool = None
+
+    def get_vision(self, hwnd: Optional[int] = None) -> VisionCore:
+        """获取（必要时创建）窗口对应的 VisionCore"""
+        vision = self._visions.get(hwnd)
+        if vision is None:
+            with self._lock:
+                vision = self._visions.get(hwnd)
+                if vision is None:
+                    vision = VisionCore(hwnd=hwnd)
+                    self._visions[hwnd] = vision
+        return vision
+
+    def get_ocr_tool(self):
+        """获取进程内共享的 OCRTool"""
+        if self._ocr_tool is None:
+            with self._lock:
+                if self._ocr_tool is None:
+                    from ocr_tool import OCRTool
+                    self._ocr_tool = OCRTool()
+        return self._ocr_tool
+
+    def release(self, hwnd: Optional[int]):
+        """释放窗口对应的 VisionCore（窗口关闭或解绑时调用）"""
+        with self._lock:
+            vision = self._visions.pop(hwnd, None)
+            ocr_tool = self._ocr_tool
+        if vision is not None:
+            vision.frame_source.close()
+        if ocr_tool is not None:
+            # 该窗口的分块 OCR 状态随之丢弃
+            ocr_tool.reset_tiled(hwnd)
+
+    def shutdown(self):
+        """释放全部服务"""
+        with self._lock:
+            visions = list(self._visions.values())
+            self._visions.clear()
+            ocr_tool, self._ocr_tool = self._ocr_tool, None
+        for vision in visions:
+            vision.frame_source.close()
+        if ocr_tool is not None:
+            ocr_tool.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存活的服务、OCR 引擎数量与内存占用"""
+        pool = get_shared_pool()
+        with self._lock:
+            hwnds = list(self._visions.keys())
+            has_ocr_tool = self._ocr_tool is not None
+        return {
+            "vision_services": len(hwnds),
+            "hwnds": hwnds,
+            "ocr_tool": has_ocr_tool,
+            "ocr_engines": pool.live_sessions,
+            "ocr_engine_memory_mb": pool.memory_bytes / 1024 / 1024,
+            "ocr_cache": get_shared_cache().get_stats(),
+            "process_rss_mb": process_rss() / 1024 / 1024
+        }
+
+
+# 全局注册表实例
+vision_registry = VisionRegistry()